@@ -1,9 +1,9 @@
 import os
-from flask import Flask, render_template, g, flash, redirect, url_for
+from flask import Flask, render_template, g, flash, redirect, url_for, jsonify
 from dotenv import load_dotenv
-from Routes.DRE_Rentabilidade import dre_blueprint
+from Routes.DRE_Rentabilidade import dre_blueprint, retencao_downloads
 from Routes.Menu import menu_blueprint
-from Db.Connection import Carregar_Mapeamento_Banco
+from Db.Connection import Carregar_Mapeamento_Banco, Invalidar_Mapeamentos, Status_Mapeamentos
 
 # Carregar variáveis de ambiente (do arquivo .env)
 load_dotenv()
@@ -38,14 +38,39 @@ def index_redirect():
     """
     return redirect(url_for('menu.index'))
 
+@app.route(f'{BASE_PREFIX}/mapeamentos/status')
+def status_mapeamentos():
+    """
+    Rota JSON: idade do snapshot de De-Paras, durações das cargas, falhas do cache e versão compartilhada.
+    """
+    return jsonify(Status_Mapeamentos())
+
+@app.route(f'{BASE_PREFIX}/mapeamentos/invalidar', methods=['POST'])
+def invalidar_mapeamentos():
+    """
+    Força a recarga dos De-Paras do banco na próxima requisição.
+    """
+    Invalidar_Mapeamentos()
+    return jsonify(Status_Mapeamentos())
+
+@app.before_request
+def iniciar_retencao_downloads():
+    """
+    Inicia a varredura da pasta de Downloads no processo que atende requisições (uma vez por processo).
+    Não é feito na importação para não subir a thread no processo do reloader; entre os workers,
+    só o que detém a trava de varredura remove arquivos (Services/DRE/ServicoRetencaoDownloads.py).
+    """
+    retencao_downloads.iniciar()
+
 @app.before_request
 def load_mappings_into_g():
     """
     Carrega os mapeamentos do banco ANTES de cada requisição
     e armazena no objeto 'g' do Flask.
     
-    A função Carregar_Mapeamento_Banco() usa cache,
-    então o banco só será consultado de 1 em 1 hora.
+    A função Carregar_Mapeamento_Banco() usa cache (Db/CacheMapeamentos.py),
+    então o banco só será consultado de 1 em 1 hora, por uma única requisição
+    (ou em segundo plano, antes de expirar).
     """
     try:
         # 'g' é um objeto global por requisição do Flask
@@ -0,0 +1,195 @@
+"""
+Benchmark do pipeline de Rentabilidade (ServicoRelatoriosDRE.consolidado) com dados sintéticos.
+
+Uso (a partir da raiz do projeto):
+    python -m Benchmarks.ExecutarBenchmark --linhas 10000 100000 --formato xlsx --repeticoes 3
+    python -m Benchmarks.ExecutarBenchmark --linhas 1000000 10000000 --formato parquet
+    python -m Benchmarks.ExecutarBenchmark --comparar Benchmarks/Resultados/A.json Benchmarks/Resultados/B.json
+
+Para cada escala: gera (ou reaproveita) os dados em Benchmarks/Dados, faz uma execução "fria"
+(cache de ingestão vazio e índices De-Para recém-montados) e N execuções "quentes", e grava
+o tempo total e as métricas por etapa (Services/DRE/ServicoInstrumentacao.py) em JSON.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+import statistics
+from datetime import datetime
+
+DIRETORIO_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+RAIZ_PROJETO = os.path.dirname(DIRETORIO_BENCHMARKS)
+
+# O benchmark usa um cache de ingestão próprio (definido antes de importar o Config,
+# para valer também nos processos filhos do modo "processos")
+os.environ["CACHE_ARQUIVOS_DIRETORIO"] = os.path.join(DIRETORIO_BENCHMARKS, "Cache")
+sys.path.insert(0, RAIZ_PROJETO)
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from Benchmarks.GeradorDadosSinteticos import carregar_dados
+from Services.DRE.ServicoCacheArquivos import obter_cache_arquivos
+from Services.DRE.ServicoEscritorExcel import ServicoEscritorExcel
+from Services.DRE.ServicoInstrumentacao import Instrumentacao, _pico_memoria_bytes
+from Services.DRE.ServicoRelatoriosDRE import ServicoRelatoriosDRE
+from Services.DRE.ServicoRelatoriosRateio import ServicoRelatoriosRateio
+
+
+def _versao_git():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=RAIZ_PROJETO, capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "assunto": git("log", "-1", "--format=%s"),
+                "alteracoes_pendentes": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "assunto": None, "alteracoes_pendentes": None}
+
+
+def _ambiente():
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": pa.__version__,
+        "sistema": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def executar_uma_vez(mapeamentos, caminhos, modo, max_workers, excel=False, motor=None):
+    """
+    Roda o consolidado uma vez e retorna o tempo total e as métricas por etapa.
+    :param excel: Se True, grava também o Excel de saída (etapa "Gerando Excel", fora do tempo total).
+    :param motor: Motor do Razão ("pandas" ou "duckdb"). Se None, usa Config.EXECUCAO["motor_razao"].
+    """
+    instrumentacao = Instrumentacao(ativo=True)
+    rateio_service = ServicoRelatoriosRateio(mapeamentos, caminhos, instrumentacao=instrumentacao)
+    dre_service = ServicoRelatoriosDRE(mapeamentos, caminhos, instrumentacao=instrumentacao)
+
+    inicio = time.perf_counter()
+    relatorios = dre_service.consolidado(rateio_service, modo=modo, max_workers=max_workers, motor=motor)
+    segundos = time.perf_counter() - inicio
+
+    exportacao = None
+    if excel:
+        with tempfile.TemporaryDirectory() as diretorio, instrumentacao.etapa("Gerando Excel") as registro:
+            registro.entrada(relatorios)
+            exportacao = ServicoEscritorExcel().escrever(relatorios, os.path.join(diretorio, "DRE_Rentabilidade.xlsx"))
+
+    return {
+        "segundos_total": round(segundos, 4),
+        "pico_rss_bytes": _pico_memoria_bytes(),
+        "linhas_saida": {nome: len(df) for nome, df in relatorios.items()},
+        "etapas": instrumentacao.resumo(),
+        "exportacao": exportacao,
+    }
+
+
+def executar_escala(linhas, formato, repeticoes, modo, max_workers, semente, excel=False, motor=None):
+    """
+    Gera/reaproveita os dados de uma escala e faz 1 execução fria + N quentes.
+    """
+    diretorio = os.path.join(DIRETORIO_BENCHMARKS, "Dados", f"{formato}_{linhas}_{semente}")
+    inicio = time.perf_counter()
+    caminhos, mapeamentos = carregar_dados(diretorio, linhas, formato, semente=semente)
+    print(f"Dados prontos em {time.perf_counter() - inicio:.1f}s: {diretorio}")
+
+    resultados = []
+    cache = obter_cache_arquivos()
+    for repeticao in range(repeticoes + 1):
+        fria = repeticao == 0
+        if fria:
+            cache.invalidar()
+            # Cópia rasa: DataFrames novos para o snapshot, então os índices De-Para são remontados
+            # (as execuções quentes reaproveitam este snapshot, como as requisições em produção)
+            mapeamentos_execucao = {chave: df.copy(deep=False) for chave, df in mapeamentos.items()}
+
+        medicao = executar_uma_vez(mapeamentos_execucao, caminhos, modo, max_workers, excel, motor)
+        medicao.update({"linhas_razao": linhas, "formato": formato, "modo": modo, "motor": motor,
+                        "execucao": "fria" if fria else "quente", "repeticao": repeticao})
+        resultados.append(medicao)
+        print(f"  {linhas} linhas | {formato} | {medicao['execucao']} #{repeticao}: {medicao['segundos_total']:.2f}s")
+    return resultados
+
+
+def _medianas(documento):
+    """
+    Retorna {(linhas, formato, modo, execucao, etapa): mediana dos segundos}. A etapa "TOTAL" é o consolidado inteiro.
+    """
+    tempos = {}
+    for medicao in documento["resultados"]:
+        base = (medicao["linhas_razao"], medicao["formato"], medicao["modo"], medicao["execucao"])
+        tempos.setdefault(base + ("TOTAL",), []).append(medicao["segundos_total"])
+        for etapa in medicao["etapas"]:
+            tempos.setdefault(base + (etapa["etapa"],), []).append(etapa["segundos"])
+    return {chave: statistics.median(valores) for chave, valores in tempos.items()}
+
+
+def comparar(caminho_a, caminho_b):
+    """
+    Imprime a diferença de tempo (mediana) por escala e etapa entre dois resultados.
+    """
+    with open(caminho_a, encoding="utf-8") as f:
+        documento_a = json.load(f)
+    with open(caminho_b, encoding="utf-8") as f:
+        documento_b = json.load(f)
+
+    print(f"A: {documento_a['git']['commit']} {documento_a['git']['assunto']}")
+    print(f"B: {documento_b['git']['commit']} {documento_b['git']['assunto']}")
+    medianas_a, medianas_b = _medianas(documento_a), _medianas(documento_b)
+
+    print(f"{'Linhas':>10} {'Formato':<8} {'Modo':<10} {'Execução':<8} {'Etapa':<32} {'A (s)':>9} {'B (s)':>9} {'Dif.':>8}")
+    for chave in sorted(set(medianas_a) & set(medianas_b), key=lambda c: (c[0], c[1], c[2], c[3], c[4] != "TOTAL", c[4])):
+        a, b = medianas_a[chave], medianas_b[chave]
+        diferenca = f"{(b - a) / a * 100:+.1f}%" if a else "-"
+        print(f"{chave[0]:>10} {chave[1]:<8} {chave[2]:<10} {chave[3]:<8} {chave[4][:32]:<32} {a:>9.3f} {b:>9.3f} {diferenca:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do consolidado de Rentabilidade com dados sintéticos.")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000], help="Linhas de Razão (uma ou mais escalas).")
+    parser.add_argument("--formato", choices=["xlsx", "parquet"], default="xlsx", help="Formato dos arquivos de entrada.")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções quentes após a execução fria.")
+    parser.add_argument("--modo", choices=["serial", "processos"], default="serial", help="Config.EXECUCAO['modo'].")
+    parser.add_argument("--max-workers", type=int, default=None, help="Processos no modo 'processos'.")
+    parser.add_argument("--motor", choices=["pandas", "duckdb"], default=None, help="Config.EXECUCAO['motor_razao'].")
+    parser.add_argument("--semente", type=int, default=0, help="Semente dos dados sintéticos.")
+    parser.add_argument("--excel", action="store_true", help="Mede também a gravação do Excel de saída.")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON de resultado (padrão: Benchmarks/Resultados/<data>_<commit>.json).")
+    parser.add_argument("--comparar", nargs=2, metavar=("A", "B"), help="Compara dois JSONs de resultado e sai.")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+
+    documento = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "git": _versao_git(),
+        "ambiente": _ambiente(),
+        "parametros": {"linhas": args.linhas, "formato": args.formato, "repeticoes": args.repeticoes,
+                       "modo": args.modo, "max_workers": args.max_workers, "semente": args.semente,
+                       "excel": args.excel, "motor": args.motor},
+        "resultados": [],
+    }
+    for linhas in args.linhas:
+        documento["resultados"].extend(
+            executar_escala(linhas, args.formato, args.repeticoes, args.modo, args.max_workers, args.semente, args.excel, args.motor))
+
+    saida = args.saida
+    if saida is None:
+        commit = (documento["git"]["commit"] or "sem_git")[:8]
+        saida = os.path.join(DIRETORIO_BENCHMARKS, "Resultados", f"{datetime.now():%Y%m%d_%H%M%S}_{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(documento, f, ensure_ascii=False, indent=2, default=str)
+    print(f"Resultado gravado em: {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+import os
+import json
+import copy
+import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from Config import CAMINHOS_ARQUIVOS
+
+# Versão do gerador: mudar sempre que o formato dos dados gerados mudar (invalida os dados já gerados)
+VERSAO_GERADOR = 1
+
+# Limite de linhas de uma aba do Excel (descontando o cabeçalho)
+LIMITE_LINHAS_EXCEL = 1_048_576 - 10
+
+# Linhas do Razão geradas por bloco (limita a memória nas escalas grandes)
+LINHAS_POR_BLOCO = 1_000_000
+
+UFS = ["SP", "SC", "RJ", "GO"]
+FILIAIS = ["Barueri", "Itajai", "Rio", "Goiania", "Desconhecida"] # A última não tem De-Para
+CLIENTES = [f"CLI{i}" for i in range(30)] + ["SEMMAP"] # SEMMAP não tem De-Para
+SIGLAS = [f"S{i}" for i in range(15)] + ["Desconhecido"]
+GRUPOS = ["PESSOAL OPER", "ISS", "PIS", "COFINS", "ICMS", "IMPOSTOS OPER", "TERCEIROS OPER", "INFORMATICA OPER",
+          "ARMAZENAGEM OPER", "OUTROS OPER", "INDEN.MERCADORIAS", "DESCONTOS", "SERVIÇOS", "ADMIN"]
+CONTAS = [f"603010{i:05d}" for i in range(60)] + ["60301020108", "60301020209"]
+CENTROS_CUSTO = [f"CC{i}" for i in range(20)]
+ITENS = [str(10000 + i) for i in range(40)] + ["10110", "10802", "10302", "10702", "11002"]
+TITULOS_CONTA = ["MATERIAL DE EMBALAGEM", "ALUGUEL", "ENERGIA", "SALARIOS"]
+
+
+def gerar_mapeamentos(rng):
+    """
+    Gera as tabelas De-Para (mesmas chaves de Db.Connection.MAPA_TABELAS), com colunas
+    compatíveis com o que os serviços usam. Parte das chaves fica de fora de propósito,
+    para exercitar os relatórios de De-Paras não encontrados.
+    """
+    centro_custo = pd.DataFrame({
+        "centro_de_custo_id": CENTROS_CUSTO[:18],
+        "centro_custo_desc": rng.choice(["Operação Armazenagem", "Transporte", "Adm"], 18),
+        "tipo_cc": rng.choice(["Oper", "Oper", "Adm"], 18),
+    })
+    itens = ITENS[:-3]
+    item_conta = pd.DataFrame({"item": itens, "nome": [f"Item {i}" for i in itens], "sigla": rng.choice(SIGLAS, len(itens))})
+    filial = pd.DataFrame({"filial_nome": FILIAIS[:4] + ["FARMA SP"], "filial_uf": UFS + ["SP"]})
+
+    # Contas Contábeis: uma linha genérica por conta (concat_razao nulo) e, para parte delas,
+    # uma linha específica de Conta + "Oper" (usada no casamento por conta + tipo de CC)
+    linhas = []
+    for conta in CONTAS[:55]:
+        linhas.append({"conta": conta, "concat_razao": None, "descricao_completa": "D " + conta, "descricao_resumida": "r",
+                       "grupo": rng.choice(GRUPOS),
+                       "grupo_financeiro": rng.choice(["DEPREC/AMORT", "CUSTOS FINANCEIROS", "OPER", "OPER", "OPER"])})
+        if rng.random() < 0.4:
+            linhas.append({"conta": conta, "concat_razao": conta + "Oper", "descricao_completa": "DO " + conta,
+                           "descricao_resumida": "ro", "grupo": rng.choice(GRUPOS),
+                           "grupo_financeiro": rng.choice(["DEPREC/AMORT", "OPER", "OPER"])})
+    linhas.append({"conta": "60301020108", "concat_razao": None, "descricao_completa": "ind", "descricao_resumida": "i",
+                   "grupo": "PESSOAL OPER", "grupo_financeiro": "OPER"})
+    linhas.append({"conta": "60301020209", "concat_razao": None, "descricao_completa": "tmp", "descricao_resumida": "t",
+                   "grupo": "TERCEIROS OPER", "grupo_financeiro": "OPER"})
+    contas = pd.DataFrame(linhas)
+
+    clientes = CLIENTES[:-1]
+    abreviacao = pd.DataFrame({"area": clientes, "grupo": rng.choice(SIGLAS[:-1], len(clientes))})
+    embalagens = pd.DataFrame({"nome_cliente": clientes, "filial_uf": rng.choice(UFS, len(clientes))})
+    depreciacao = pd.DataFrame({"item": ITENS[:20], "filial_uf": rng.choice(UFS + ["DESC"], 20)})
+
+    linhas = []
+    for uf in UFS:
+        for cliente in CLIENTES[:20]:
+            linhas.append({"cliente": cliente, "filial": uf, "area": "Armazem", "grupo": rng.choice(SIGLAS[:-1]), "item": "Pallet"})
+            linhas.append({"cliente": cliente.upper() + " TOTAL", "filial": uf, "area": "Armazem",
+                           "grupo": rng.choice(SIGLAS[:-1]), "item": "Pallet"})
+    ocupacao = pd.DataFrame(linhas)
+
+    # Tabelas que o pipeline de Rentabilidade não usa: só precisam existir
+    vazia = pd.DataFrame({"id": pd.Series([], dtype="int64")})
+
+    return {
+        "DRE_De_Para_Item_Conta": item_conta,
+        "DRE_De_Para_Centro_Custo": centro_custo,
+        "DRE_De_Para_Filial": filial,
+        "DRE_De_Para_Contas_Contabeis": contas,
+        "Volumes_De_Para_Abreviacao": abreviacao,
+        "Embalagens_De_Para_Clientes": embalagens,
+        "MO_Ade_Temp_Filial_UF": vazia,
+        "MO_Ade_Temp_Cli_Grupo": vazia,
+        "Item_De_Para_Filial_Depreciacao": depreciacao,
+        "De_Para_Grupos_Ocupacao": ocupacao,
+        "Volumes_De_Para_Abreviacao3": vazia,
+    }
+
+
+def _datas(rng, n):
+    return pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 300, n), unit="D")
+
+
+def _bloco_razao(rng, n):
+    """
+    Gera n linhas do Razão com as colunas de CAMINHOS_ARQUIVOS["DRE"]["colunas_dre"] mais
+    algumas colunas extras (que a leitura deve descartar).
+    """
+    return pd.DataFrame({
+        "Conta": rng.choice(CONTAS, n).astype(np.int64),
+        "Título Conta": rng.choice(TITULOS_CONTA, n),
+        "Data": _datas(rng, n),
+        "Descrição": "Lançamento",
+        "Filial": rng.choice(FILIAIS, n),
+        "Centro de Custo": rng.choice(CENTROS_CUSTO, n),
+        "Item": rng.choice(ITENS, n).astype(np.int64),
+        "saldo": rng.normal(1000, 500, n).round(2),
+        "Mês": 1,
+        "Grupo": "g",
+        "Lixo": "l",
+    })
+
+
+def _volumes(rng, n):
+    return pd.DataFrame({
+        "SITE": rng.choice(UFS + ["ITJ"], n), "CLIENTE": rng.choice(CLIENTES, n),
+        "DATAFIMPEDIDO": _datas(rng, n).strftime("%d/%m/%Y"), "CATEGORIAGRUPO": rng.choice(["A", "B"], n),
+        "VOLUMES": rng.integers(0, 50, n), "DEPOSITANTE": "d",
+    })
+
+
+def _adequacao(rng, n):
+    return pd.DataFrame({
+        "Filial": rng.choice(UFS, n), "Cliente": rng.choice(CLIENTES, n), "Qtde Real": rng.integers(0, 20, n),
+        "Nome Servico": rng.choice(["Etiq", "Kit"], n), "Serviço": rng.choice(["ADQ1", "ADQ2"], n),
+        "Data Fim": _datas(rng, n).strftime("%d/%m/%Y %H:%M:%S"),
+    })
+
+
+def _insumos(rng, n):
+    ids = np.char.add(np.char.add("2025", np.char.zfill(rng.integers(1, 13, n).astype(str), 2)),
+                      np.char.zfill(rng.integers(0, 9999, n).astype(str), 4))
+    return pd.DataFrame({
+        "ID": ids.astype(object), "Mês": rng.integers(1, 13, n), "Depositante": rng.choice(CLIENTES, n),
+        "NOMECLI": rng.choice(CLIENTES, n), "Custo": rng.integers(0, 100, n) * 1.5, "Insumo": rng.choice(["Caixa", "Fita"], n),
+    })
+
+
+def _faturamento(rng, n):
+    return pd.DataFrame({
+        "EMPRESA": rng.choice(["FARMA", "FARMA DIST", "OUTRA"], n), "FILIAL": rng.choice(FILIAIS, n),
+        "CLIENTE": rng.choice(SIGLAS, n), "RECEITA": rng.choice(["Serviços", "Outras"], n, p=[.8, .2]),
+        "VERSÃO": rng.choice(["Real", "Orçado"], n, p=[.8, .2]), "MÊS": rng.integers(1, 13, n),
+        "ANO": rng.choice([2024, 2025], n, p=[.1, .9]), "TIPO": rng.choice(["Armazenagem", "Transporte"], n),
+        "VALOR R$": np.where(rng.random(n) < 0.05, np.nan, rng.normal(5000, 100, n).round(2)),
+    })
+
+
+def _gravar_ocupacao(rng, caminho, abas, clientes_por_aba=12):
+    """
+    Grava o 'Acompanhamento Pallets' no layout da planilha real: título na linha 1,
+    cabeçalho em duas linhas (5 e 6, ou seja header=[4, 5]), meses nas linhas e clientes nas colunas.
+    Há clientes com uma subcoluna, com várias subcolunas e com subcolunas + "TOTAL <cliente>",
+    nomes com espaços duplicados e uma coluna toda zerada (que o processamento descarta).
+    """
+    wb = Workbook()
+    wb.remove(wb.active)
+    meses = [datetime.datetime(2025, m, 1) for m in range(1, 13)]
+    for aba in abas:
+        ws = wb.create_sheet(aba)
+        ws.cell(1, 1, "Acompanhamento Pallets " + aba)
+        ws.cell(6, 1, "Mês")
+        for r, mes in enumerate(meses):
+            ws.cell(7 + r, 1, mes)
+        # Linha final sem mês (como a linha de total da planilha real)
+
+        col = 2
+        for k, cliente in enumerate(CLIENTES[:clientes_por_aba]):
+            nome = cliente if k % 3 else "  " + cliente.replace("CLI", "CLI  ") + " "
+            if k % 4 == 0:
+                subcolunas = ["Seco", "Frio", "TOTAL " + cliente]
+            elif k % 4 == 1:
+                subcolunas = ["Seco", "Frio"]
+            else:
+                subcolunas = ["Pallets"]
+            for j, subcoluna in enumerate(subcolunas):
+                ws.cell(5, col, nome if j == 0 else None)
+                ws.cell(6, col, subcoluna)
+                zerada = k == 5
+                for r in range(12):
+                    ws.cell(7 + r, col, 0 if zerada else int(rng.integers(0, 100)))
+                ws.cell(7 + 12, col, int(rng.integers(0, 5)))
+                col += 1
+    wb.save(caminho)
+
+
+def _gravar_excel(df, caminho, sheet_name="Sheet1", startrow=0):
+    if len(df) > LIMITE_LINHAS_EXCEL:
+        raise ValueError(f"{len(df)} linhas não cabem em uma aba do Excel ({caminho}). Use formato='parquet'.")
+    with pd.ExcelWriter(caminho, engine="xlsxwriter") as writer:
+        df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=startrow)
+
+
+def _gravar_parquet(df, caminho):
+    df.to_parquet(caminho, index=False)
+
+
+def _gravar_razao(rng, destino, abas, linhas, formato, header):
+    """
+    Divide as linhas entre as abas do Razão. No formato parquet, 'destino' é uma pasta com um
+    '<aba>.parquet' por aba, gravado em blocos (memória constante mesmo com 10 milhões de linhas).
+    """
+    por_aba = [linhas // len(abas) + (1 if i < linhas % len(abas) else 0) for i in range(len(abas))]
+
+    if formato == "xlsx":
+        if max(por_aba) > LIMITE_LINHAS_EXCEL:
+            raise ValueError(f"{linhas} linhas de Razão não cabem em {len(abas)} abas do Excel. Use formato='parquet'.")
+        with pd.ExcelWriter(destino, engine="xlsxwriter") as writer:
+            for aba, n in zip(abas, por_aba):
+                _bloco_razao(rng, n).to_excel(writer, sheet_name=aba, index=False, startrow=header)
+        return
+
+    os.makedirs(destino, exist_ok=True)
+    for aba, n in zip(abas, por_aba):
+        escritor = None
+        try:
+            for inicio in range(0, max(n, 1), LINHAS_POR_BLOCO):
+                tabela = pa.Table.from_pandas(_bloco_razao(rng, min(LINHAS_POR_BLOCO, n - inicio)), preserve_index=False)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(os.path.join(destino, f"{aba}.parquet"), tabela.schema)
+                escritor.write_table(tabela)
+        finally:
+            if escritor is not None:
+                escritor.close()
+
+
+def gerar_dados(diretorio, linhas_razao, formato="xlsx", linhas_rateio=None, semente=0):
+    """
+    Gera um conjunto completo de entradas sintéticas para o pipeline de Rentabilidade.
+
+    :param diretorio: Pasta de destino (criada se não existir).
+    :param linhas_razao: Total de linhas do Razão (divididas entre as abas RAZÃO_FARMA e RAZÃO_FARMADIST).
+    :param formato: "xlsx" (mesmo caminho de leitura da produção, até ~2 milhões de linhas de Razão)
+                    ou "parquet" (escalas maiores; lido direto pelo ServicoCacheArquivos).
+                    A Ocupação é sempre xlsx, pois o cabeçalho duplo faz parte do que é medido.
+    :param linhas_rateio: Linhas de Volumes, Adequação, Insumos e Faturamento. Se None, 1/4 do Razão.
+    :param semente: Semente do gerador aleatório (mesma semente = mesmos dados).
+    :return: (caminhos, mapeamentos): cópia de Config.CAMINHOS_ARQUIVOS apontando para os arquivos
+             gerados e o dicionário de De-Paras (também gravado em '<diretorio>/De_Para').
+    """
+    if formato not in ("xlsx", "parquet"):
+        raise ValueError(f"Formato inválido: {formato}. Use 'xlsx' ou 'parquet'.")
+
+    rng = np.random.default_rng(semente)
+    linhas_rateio = linhas_rateio if linhas_rateio is not None else max(1000, linhas_razao // 4)
+    os.makedirs(diretorio, exist_ok=True)
+    caminhos = copy.deepcopy(CAMINHOS_ARQUIVOS)
+    extensao = ".xlsx" if formato == "xlsx" else ".parquet"
+
+    def destino(chave):
+        caminhos[chave]["path"] = os.path.join(diretorio, chave + extensao)
+        return caminhos[chave]["path"]
+
+    # 1. De-Paras
+    mapeamentos = gerar_mapeamentos(rng)
+    pasta_de_para = os.path.join(diretorio, "De_Para")
+    os.makedirs(pasta_de_para, exist_ok=True)
+    for chave, df in mapeamentos.items():
+        df.to_parquet(os.path.join(pasta_de_para, f"{chave}.parquet"), index=False)
+
+    # 2. Razão (várias abas, cabeçalho na linha 'header')
+    cfg = caminhos["DRE"]
+    _gravar_razao(rng, destino("DRE"), cfg["sheet_name"], linhas_razao, formato, cfg["header"])
+
+    # 3. Arquivos do Rateio
+    gravar = _gravar_excel if formato == "xlsx" else _gravar_parquet
+    gravar(_volumes(rng, linhas_rateio), destino("Volumes_Base"))
+    gravar(_adequacao(rng, linhas_rateio), destino("Adequacao"))
+    gravar(_insumos(rng, linhas_rateio), destino("Insumos"))
+    if formato == "xlsx":
+        cfg = caminhos["Faturamento"]
+        _gravar_excel(_faturamento(rng, linhas_rateio), destino("Faturamento"), cfg["sheet_name"], cfg["header"])
+    else:
+        _gravar_parquet(_faturamento(rng, linhas_rateio), destino("Faturamento"))
+
+    caminhos["Ocupacao_Armazem"]["path"] = os.path.join(diretorio, "Ocupacao_Armazem.xlsx")
+    _gravar_ocupacao(rng, caminhos["Ocupacao_Armazem"]["path"], caminhos["Ocupacao_Armazem"]["sheet_name"])
+
+    # 4. Manifesto (permite reaproveitar os dados em outra execução)
+    manifesto = {"versao": VERSAO_GERADOR, "linhas_razao": linhas_razao, "linhas_rateio": linhas_rateio,
+                 "formato": formato, "semente": semente, "caminhos": caminhos}
+    with open(os.path.join(diretorio, "manifesto.json"), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+
+    return caminhos, mapeamentos
+
+
+def carregar_dados(diretorio, linhas_razao, formato="xlsx", linhas_rateio=None, semente=0):
+    """
+    Igual a gerar_dados, mas reaproveita os arquivos se o manifesto da pasta corresponder aos mesmos parâmetros.
+    """
+    linhas_rateio = linhas_rateio if linhas_rateio is not None else max(1000, linhas_razao // 4)
+    try:
+        with open(os.path.join(diretorio, "manifesto.json"), encoding="utf-8") as f:
+            manifesto = json.load(f)
+    except (OSError, ValueError):
+        manifesto = None
+
+    parametros = {"versao": VERSAO_GERADOR, "linhas_razao": linhas_razao, "linhas_rateio": linhas_rateio,
+                  "formato": formato, "semente": semente}
+    if manifesto is None or any(manifesto.get(k) != v for k, v in parametros.items()):
+        print(f"Gerando dados sintéticos em {diretorio} ({linhas_razao} linhas de Razão, {formato})...")
+        return gerar_dados(diretorio, linhas_razao, formato, linhas_rateio, semente)
+
+    pasta_de_para = os.path.join(diretorio, "De_Para")
+    mapeamentos = {os.path.splitext(nome)[0]: pd.read_parquet(os.path.join(pasta_de_para, nome))
+                   for nome in sorted(os.listdir(pasta_de_para))}
+    return manifesto["caminhos"], mapeamentos
@@ -48,4 +48,80 @@ CAMINHOS_ARQUIVOS = {
         ],
         "escrita_mes": "Mês"
     }
-}
\ No newline at end of file
+}
+
+# Cache de ingestão: cada arquivo Excel acima é lido uma única vez e guardado em Parquet.
+# Enquanto o arquivo não mudar (tamanho/data de modificação), as próximas execuções leem do cache.
+CACHE_ARQUIVOS = {
+    # A variável de ambiente CACHE_ARQUIVOS_DIRETORIO permite isolar o cache (ex: Benchmarks)
+    "diretorio": os.getenv("CACHE_ARQUIVOS_DIRETORIO") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "Cache", "Arquivos"),
+    "max_bytes": 2 * 1024 ** 3, # 2 GB
+    "hash_conteudo": False, # True = compara também o conteúdo (SHA-256), mais lento
+    # Leitura das abas com cabeçalho de uma linha em streaming, só com as colunas pedidas (ServicoLeitorExcel).
+    # "motor": "calamine" (se o pacote python-calamine estiver instalado), "openpyxl" ou None (automático).
+    # "streaming": False = pd.read_excel (monta a aba inteira em memória antes de podar as colunas).
+    "leitura": {"streaming": True, "motor": None}
+}
+
+# Modo incremental do Razão: saídas por (Ano, Mês) guardadas em Parquet; só os meses alterados são recalculados
+PARTICOES_RAZAO = {
+    "ativo": False, # True após conferir as saídas contra uma execução completa; False = processa o Razão inteiro a cada execução
+    "diretorio": os.path.join(os.path.dirname(os.path.abspath(__file__)), "Cache", "Particoes"),
+    "max_bytes": 2 * 1024 ** 3 # 2 GB
+}
+
+# Memoização dos resultados do "Processar": mesmas entradas + mesmo snapshot de De-Paras + mesmo código
+# = mesmo arquivo. O job devolve o arquivo já gerado em Downloads em vez de rodar o processamento de novo.
+CACHE_RESULTADOS = {
+    "ativo": True,
+    "diretorio": os.path.join(os.path.dirname(os.path.abspath(__file__)), "Cache", "Resultados") # Manifestos (JSON); os arquivos seguem RETENCAO_DOWNLOADS
+}
+
+# Retenção dos arquivos gerados em Downloads (varredura em segundo plano)
+RETENCAO_DOWNLOADS = {
+    "max_idade_horas": 72, # Arquivos criados há mais tempo são removidos (None = sem limite)
+    "max_bytes": 10 * 1024 ** 3, # 10 GB: acima disso, remove os acessados há mais tempo (None = sem limite)
+    "idade_minima_segundos": 600, # Arquivos mais novos nunca são removidos
+    "intervalo_segundos": 600 # Intervalo entre varreduras
+}
+
+# Execução do ServicoRelatoriosDRE.consolidado
+EXECUCAO = {
+    "modo": "serial", # "serial" ou "processos" (Razão e os 5 Rateios em paralelo)
+    "max_workers": None, # None = nº de núcleos da máquina
+    "motor_razao": "pandas", # "pandas" ou "duckdb" (De-Paras e regras do Razão em um plano paralelo do DuckDB)
+    "duckdb_threads": None # Threads do motor DuckDB (None = nº de núcleos da máquina)
+}
+
+# Fila de processamento em segundo plano (rota /processar)
+JOBS = {
+    "diretorio": os.path.join(os.path.dirname(os.path.abspath(__file__)), "Jobs"), # Estado de cada job (JSON)
+    "max_workers": 2, # Processamentos simultâneos
+    "max_fila": 10, # Jobs pendentes aceitos (na fila + executando)
+    "modo": "threads" # "threads" ou "inline" (executa dentro da requisição - testes)
+}
+
+# Cache dos mapeamentos (De-Paras) do banco, usado em toda requisição (App.load_mappings_into_g)
+CACHE_MAPEAMENTOS = {
+    "ttl": 3600, # Idade máxima do snapshot (segundos): acima disso, a requisição recarrega na hora
+    "renovar_apos": 3000, # A partir desta idade, recarrega em segundo plano (antes de expirar)
+    "espera_apos_erro": 60, # Se o banco falhar, serve o snapshot antigo e só tenta de novo após N segundos
+    # Snapshot compartilhado entre os processos do servidor (Arrow IPC mapeado em memória, Db/SnapshotCompartilhado.py):
+    # um único worker consulta o banco a cada renovação e os demais anexam a versão publicada.
+    "compartilhado": {
+        "ativo": True,
+        "diretorio": os.path.join(os.path.dirname(os.path.abspath(__file__)), "Cache", "Mapeamentos"),
+        "espera_trava": 300 # Segundos até uma trava de carga ser considerada abandonada
+    }
+}
+
+# Abas de De-Paras não encontrados: contagem por chave + amostra limitada de linhas (ServicoDiagnosticoDePara)
+DIAGNOSTICO_DE_PARA = {
+    "amostras_por_chave": 20 # Linhas guardadas (e exibidas) por chave não encontrada, em cada etapa
+}
+
+# Métricas por etapa do pipeline (tempo, CPU, pico de memória, linhas), devolvidas no resultado do job
+INSTRUMENTACAO = {
+    "ativo": True, # False = nenhuma medição (custo desprezível)
+    "memoria_profunda": False # True = memory_usage(deep=True), mede o conteúdo das strings (mais lento)
+}
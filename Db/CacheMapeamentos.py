@@ -0,0 +1,191 @@
+import time
+import threading
+import traceback
+from collections import deque
+from datetime import datetime
+
+
+class CacheMapeamentos:
+    """
+    Cache em memória do snapshot de mapeamentos (De-Paras) do banco.
+
+    Substitui o TTLCache do cachetools, que não tinha trava: quando expirava, todas as
+    requisições simultâneas iam ao banco ao mesmo tempo. Regras:
+      - Uma única carga por vez (single-flight): quem chega durante a carga espera
+        (se ainda não há snapshot) ou recebe o snapshot atual.
+      - Após 'renovar_apos' segundos a carga é feita em segundo plano, antes de expirar,
+        sem atrasar a requisição.
+      - Se a carga falhar (ex: PostgreSQL fora do ar), continua servindo o snapshot antigo
+        e só tenta de novo após 'espera_apos_erro' segundos.
+      - Com 'versao_externa' (snapshot compartilhado entre processos), quando outro processo
+        publica uma versão nova ou invalida o snapshot, a renovação é disparada em segundo plano.
+    """
+
+    def __init__(self, carregador, ttl=3600, renovar_apos=3000, espera_apos_erro=60, versao_externa=None):
+        """
+        :param carregador: Função sem argumentos que retorna o snapshot (dict de DataFrames).
+        :param ttl: Idade máxima (segundos) do snapshot. Acima disso, a requisição recarrega na hora.
+        :param renovar_apos: Idade (segundos) a partir da qual a recarga é disparada em segundo plano.
+        :param espera_apos_erro: Intervalo mínimo (segundos) entre tentativas após uma falha.
+        :param versao_externa: Função opcional (barata) que identifica a versão publicada por outros processos.
+        """
+        self.carregador = carregador
+        self.ttl = ttl
+        self.renovar_apos = renovar_apos
+        self.espera_apos_erro = espera_apos_erro
+        self.versao_externa = versao_externa
+
+        self._valor = None
+        self._carregado_em = None # time.monotonic() da última carga bem-sucedida
+        self._carregado_em_data = None
+        self._invalidado = False
+        self._geracao = 0 # Incrementada a cada invalidar(): carga iniciada antes disso não "limpa" a invalidação
+        self._ultima_falha = None
+        self._versao_externa_carregada = None # versao_externa() no início da última carga bem-sucedida
+
+        self._lock = threading.Lock()
+        self._carga_concluida = threading.Condition(self._lock)
+        self._carregando = False
+
+        # Métricas
+        self.hits = 0
+        self.cargas = 0
+        self.falhas = 0
+        self.servidos_antigos = 0
+        self.ultimo_erro = None
+        self.duracoes = deque(maxlen=20)
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def obter(self):
+        """
+        Retorna o snapshot atual, carregando/renovando conforme a idade.
+        Só lança exceção se não houver nenhum snapshot para servir.
+        """
+        with self._lock:
+            idade = self._idade()
+            if self._valor is not None and not self._invalidado and idade < self.renovar_apos \
+                    and not self._versao_externa_mudou():
+                self.hits += 1
+                return self._valor
+
+            if self._valor is not None:
+                expirado = self._invalidado or idade >= self.ttl
+                if self._carregando or self._em_espera_apos_erro():
+                    # Outro thread já está carregando (ou o banco acabou de falhar): serve o que tem
+                    self.servidos_antigos += expirado
+                    self.hits += 1
+                    return self._valor
+                self._carregando = True
+                if not expirado:
+                    # Perto de expirar: renova em segundo plano e responde na hora
+                    threading.Thread(target=self._carregar, name="cache_mapeamentos", daemon=True).start()
+                    self.hits += 1
+                    return self._valor
+                # Expirado/invalidado: esta requisição recarrega (as demais recebem o snapshot antigo)
+            else:
+                # Ainda não há snapshot: espera a carga em andamento ou faz a carga
+                while self._carregando:
+                    self._carga_concluida.wait()
+                if self._valor is not None:
+                    self.hits += 1
+                    return self._valor
+                if self._em_espera_apos_erro():
+                    raise Exception(f"Erro ao carregar dados do banco: {self.ultimo_erro}")
+                self._carregando = True
+
+        self._carregar()
+
+        with self._lock:
+            if self._valor is None:
+                raise Exception(f"Erro ao carregar dados do banco: {self.ultimo_erro}")
+            return self._valor
+
+    def invalidar(self):
+        """
+        Força a recarga na próxima requisição. O snapshot atual continua disponível
+        como reserva caso o banco não responda.
+        """
+        with self._lock:
+            self._invalidado = True
+            self._geracao += 1
+            self._ultima_falha = None
+        print("Cache de mapeamentos invalidado: será recarregado na próxima requisição.")
+
+    def status(self):
+        """
+        Retorna as métricas do cache (idade do snapshot, durações das cargas, falhas).
+        """
+        with self._lock:
+            return {
+                "carregado": self._valor is not None,
+                "carregado_em": self._carregado_em_data,
+                "idade_segundos": round(self._idade(), 1) if self._carregado_em is not None else None,
+                "ttl": self.ttl,
+                "renovar_apos": self.renovar_apos,
+                "invalidado": self._invalidado,
+                "carregando": self._carregando,
+                "hits": self.hits,
+                "cargas": self.cargas,
+                "falhas": self.falhas,
+                "servidos_antigos": self.servidos_antigos,
+                "ultimo_erro": self.ultimo_erro,
+                "ultima_duracao_segundos": self.duracoes[-1] if self.duracoes else None,
+                "duracoes_segundos": list(self.duracoes),
+            }
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+
+    def _idade(self):
+        if self._carregado_em is None:
+            return float("inf")
+        return time.monotonic() - self._carregado_em
+
+    def _versao_externa_mudou(self):
+        return self.versao_externa is not None and self.versao_externa() != self._versao_externa_carregada
+
+    def _em_espera_apos_erro(self):
+        return self._ultima_falha is not None and time.monotonic() - self._ultima_falha < self.espera_apos_erro
+
+    def _carregar(self):
+        # Só é chamado por quem marcou self._carregando = True
+        inicio = time.perf_counter()
+        with self._lock:
+            geracao = self._geracao
+        versao_externa = self.versao_externa() if self.versao_externa is not None else None
+        try:
+            valor = self.carregador()
+            if valor is None:
+                raise Exception("O carregador de mapeamentos retornou None.")
+        except Exception as e:
+            with self._lock:
+                self.falhas += 1
+                self.ultimo_erro = str(e)
+                self._ultima_falha = time.monotonic()
+                self._carregando = False
+                self._carga_concluida.notify_all()
+                tem_reserva = self._valor is not None
+            print(f"ERRO ao recarregar mapeamentos: {e}")
+            if tem_reserva:
+                print("AVISO: Servindo o snapshot anterior dos mapeamentos até o banco voltar.")
+            else:
+                traceback.print_exc()
+            return
+
+        duracao = round(time.perf_counter() - inicio, 3)
+        with self._lock:
+            self._valor = valor
+            self._carregado_em = time.monotonic()
+            self._carregado_em_data = datetime.now().isoformat(timespec="seconds")
+            self._invalidado = self._geracao != geracao
+            self._versao_externa_carregada = versao_externa
+            self._ultima_falha = None
+            self.ultimo_erro = None
+            self.cargas += 1
+            self.duracoes.append(duracao)
+            self._carregando = False
+            self._carga_concluida.notify_all()
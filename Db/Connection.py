@@ -1,8 +1,15 @@
 import os
+import time
+import threading
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
-from cachetools import cached, TTLCache
+from Config import CACHE_MAPEAMENTOS
+from Db.CacheMapeamentos import CacheMapeamentos
+from Db.SincronizacaoDePara import SincronizadorDePara
+from Db.SnapshotCompartilhado import SnapshotCompartilhado
 
 # Carrega variáveis do .env
 load_dotenv()
@@ -16,58 +23,183 @@ PASSWORD = os.getenv("DB_PASSWORD")
 DRIVER = os.getenv("DB_DRIVER", "psycopg")
 DATABASE_URL = f"postgresql+{DRIVER}://{USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
 
-# --- Configuração do Cache ---
-cache = TTLCache(maxsize=1, ttl=3600)
+# --- Configuração do Pool de Conexões (engine única por processo) ---
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "5"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30")) # Segundos esperando uma conexão livre
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800")) # Renova conexões com mais de 30 min
+MAX_WORKERS_CARGA = int(os.getenv("DB_MAX_WORKERS_CARGA", "4")) # Tabelas De-Para lidas em paralelo
 
-@cached(cache) 
-def Carregar_Mapeamento_Banco():
+# --- Sincronização incremental dos De-Paras ---
+# Ligada: nas recargas do cache, só as linhas alteradas (coluna de versão ou xmin) são baixadas.
+SYNC_INCREMENTAL = os.getenv("DB_SYNC_INCREMENTAL", "1") == "1"
+SYNC_COLUNA_VERSAO = os.getenv("DB_SYNC_COLUNA_VERSAO", "updated_at")
+SYNC_RECARGA_COMPLETA_A_CADA = int(os.getenv("DB_SYNC_RECARGA_COMPLETA_A_CADA", "24")) # Rede de segurança
+SYNC_MARGEM_VERSAO_SEGUNDOS = int(os.getenv("DB_SYNC_MARGEM_VERSAO_SEGUNDOS", "300")) # Releitura antes do máximo de updated_at
+
+# Chave no dicionário de mapeamentos -> Tabela no PostgreSQL
+MAPA_TABELAS = {
+    "DRE_De_Para_Item_Conta": '"Tb_DRE_De_Para_Item_Conta"',
+    "DRE_De_Para_Centro_Custo": '"Tb_DRE_De_Para_Centro_Custo"',
+    "DRE_De_Para_Filial": '"Tb_DRE_De_Para_Filial"',
+    "DRE_De_Para_Contas_Contabeis": '"Tb_DRE_De_Para_Contas_Contabeis"',
+    "Volumes_De_Para_Abreviacao": '"Tb_Volumes_De_Para_Abreviacao"',
+    "Embalagens_De_Para_Clientes": '"Tb_Embalagens_De_Para_Clientes"',
+    "MO_Ade_Temp_Filial_UF": '"Tb_MO_Ade_Temp_Filial_UF"',
+    "MO_Ade_Temp_Cli_Grupo": '"Tb_MO_Ade_Temp_Cli_Grupo"',
+    "Item_De_Para_Filial_Depreciacao": '"Tb_Item_De_Para_Filial_Depreciacao"',
+    "De_Para_Grupos_Ocupacao": '"Tb_De_Para_Grupos_Ocupacao"',
+    "Volumes_De_Para_Abreviacao3": '"Tb_Volumes_De_Para_Abreviacao3"'
+}
+
+_engine = None
+_lock_engine = threading.Lock()
+
+def Obter_Engine():
     """
-    Carrega TODAS as tabelas De-Para do PostgreSQL.
+    Retorna a engine do SQLAlchemy compartilhada pelo processo (criada na primeira chamada).
+    Todas as consultas usam o mesmo pool de conexões, em vez de abrir uma engine nova a cada carga.
     """
+    global _engine
+    if _engine is None:
+        with _lock_engine:
+            if _engine is None:
+                try:
+                    _engine = create_engine(
+                        DATABASE_URL,
+                        pool_pre_ping=True,
+                        pool_size=POOL_SIZE,
+                        max_overflow=POOL_MAX_OVERFLOW,
+                        pool_timeout=POOL_TIMEOUT,
+                        pool_recycle=POOL_RECYCLE,
+                    )
+                except Exception as e:
+                    print(f"Erro ao criar a engine de conexão do SQLAlchemy: {e}")
+                    raise
+    return _engine
+
+def _carregar_tabela(engine, nome_tabela_sql):
+    """
+    Lê uma tabela De-Para em uma conexão própria do pool.
+    Retorna (DataFrame, segundos).
+    """
+    inicio = time.perf_counter()
+    with engine.connect() as conn:
+        df = pd.read_sql(f"SELECT * FROM {nome_tabela_sql}", conn)
+    return df, time.perf_counter() - inicio
+
+sincronizador_de_para = SincronizadorDePara(
+    Obter_Engine,
+    MAPA_TABELAS,
+    coluna_versao=SYNC_COLUNA_VERSAO,
+    recarga_completa_a_cada=SYNC_RECARGA_COMPLETA_A_CADA,
+    max_workers=MAX_WORKERS_CARGA,
+    margem_versao=timedelta(seconds=SYNC_MARGEM_VERSAO_SEGUNDOS)
+)
+
+def _Ler_Mapeamentos_Banco():
+    """
+    Carrega TODAS as tabelas De-Para do PostgreSQL (sem cache).
+    Com DB_SYNC_INCREMENTAL=1, só as alterações desde a última carga são baixadas.
+    """
+    if SYNC_INCREMENTAL:
+        print("ATENÇÃO: Sincronizando De-Paras com o banco de dados (execução de cache)...")
+        inicio = time.perf_counter()
+        try:
+            mapeamentos = sincronizador_de_para.carregar()
+        except Exception as e:
+            print(f"ERRO ao sincronizar mapeamentos: {e}")
+            sincronizador_de_para.esquecer() # Próxima tentativa começa do zero
+            raise Exception(f"Erro ao carregar dados do banco: {e}") from e
+        print(f" -> {len(mapeamentos)} tabelas sincronizadas em {time.perf_counter() - inicio:.2f}s.")
+        return mapeamentos
+
     print("ATENÇÃO: Lendo dados do banco de dados (execução de cache)...")
-    
-    try:
-        engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-    except Exception as e:
-        print(f"Erro ao criar a engine de conexão do SQLAlchemy: {e}")
-        raise 
-        
+    inicio = time.perf_counter()
+    engine = Obter_Engine()
     mapeamentos = {}
-    
-    mapa_tabelas = {
-        "DRE_De_Para_Item_Conta": '"Tb_DRE_De_Para_Item_Conta"',
-        "DRE_De_Para_Centro_Custo": '"Tb_DRE_De_Para_Centro_Custo"',
-        "DRE_De_Para_Filial": '"Tb_DRE_De_Para_Filial"',
-        "DRE_De_Para_Contas_Contabeis": '"Tb_DRE_De_Para_Contas_Contabeis"',
-        "Volumes_De_Para_Abreviacao": '"Tb_Volumes_De_Para_Abreviacao"',
-        "Embalagens_De_Para_Clientes": '"Tb_Embalagens_De_Para_Clientes"',
-        "MO_Ade_Temp_Filial_UF": '"Tb_MO_Ade_Temp_Filial_UF"',
-        "MO_Ade_Temp_Cli_Grupo": '"Tb_MO_Ade_Temp_Cli_Grupo"',
-        "Item_De_Para_Filial_Depreciacao": '"Tb_Item_De_Para_Filial_Depreciacao"',
-        "De_Para_Grupos_Ocupacao": '"Tb_De_Para_Grupos_Ocupacao"',
-        "Volumes_De_Para_Abreviacao3": '"Tb_Volumes_De_Para_Abreviacao3"'
-    }
 
+    # As 11 tabelas são lidas ao mesmo tempo, cada uma em uma conexão do pool
+    max_workers = max(1, min(MAX_WORKERS_CARGA, len(MAPA_TABELAS)))
     nome_tabela_sql = "N/A"
     try:
-        with engine.connect() as conn:
-            for chave_esperada, nome_tabela_sql in mapa_tabelas.items():
-                print(f"Carregando tabela: {nome_tabela_sql}...")
-                mapeamentos[chave_esperada] = pd.read_sql(f"SELECT * FROM {nome_tabela_sql}", conn)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="de_para") as executor:
+            futuros = {
+                chave_esperada: executor.submit(_carregar_tabela, engine, nome_tabela_sql)
+                for chave_esperada, nome_tabela_sql in MAPA_TABELAS.items()
+            }
+            # Resultados na ordem de MAPA_TABELAS (o dicionário final mantém a mesma ordem de antes)
+            for chave_esperada, futuro in futuros.items():
+                nome_tabela_sql = MAPA_TABELAS[chave_esperada]
+                mapeamentos[chave_esperada], segundos = futuro.result()
+                print(f"Carregando tabela: {nome_tabela_sql}... {len(mapeamentos[chave_esperada])} linhas em {segundos:.2f}s")
         
-        print(f" -> {len(mapeamentos)} tabelas carregadas.")
+        print(f" -> {len(mapeamentos)} tabelas carregadas em {time.perf_counter() - inicio:.2f}s.")
         return mapeamentos
         
     except Exception as e:
-        print(f"ERRO ao carregar mapeamentos: {e}")
+        print(f"ERRO ao carregar mapeamentos ({nome_tabela_sql}): {e}")
         raise Exception(f"Erro ao carregar dados do banco: {e}") from e
 
+# --- Snapshot compartilhado entre processos (servidor com vários workers) ---
+snapshot_compartilhado = None
+if CACHE_MAPEAMENTOS["compartilhado"]["ativo"]:
+    snapshot_compartilhado = SnapshotCompartilhado(
+        CACHE_MAPEAMENTOS["compartilhado"]["diretorio"],
+        espera_trava=CACHE_MAPEAMENTOS["compartilhado"]["espera_trava"]
+    )
+
+def _Carregar_Mapeamentos():
+    """
+    Carga do cache: com o snapshot compartilhado, só vai ao banco se nenhum outro worker
+    tiver publicado uma versão recente (senão anexa a versão publicada).
+    """
+    if snapshot_compartilhado is None:
+        return _Ler_Mapeamentos_Banco()
+    return snapshot_compartilhado.obter(_Ler_Mapeamentos_Banco, max_idade=CACHE_MAPEAMENTOS["renovar_apos"])
+
+# --- Configuração do Cache ---
+# Uma carga por vez, renovação em segundo plano antes de expirar e snapshot antigo se o banco cair
+cache_mapeamentos = CacheMapeamentos(
+    _Carregar_Mapeamentos,
+    ttl=CACHE_MAPEAMENTOS["ttl"],
+    renovar_apos=CACHE_MAPEAMENTOS["renovar_apos"],
+    espera_apos_erro=CACHE_MAPEAMENTOS["espera_apos_erro"],
+    versao_externa=snapshot_compartilhado.versao if snapshot_compartilhado is not None else None
+)
+
+def Carregar_Mapeamento_Banco():
+    """
+    Retorna TODAS as tabelas De-Para do PostgreSQL, via cache (cache_mapeamentos).
+    """
+    return cache_mapeamentos.obter()
+
+def Invalidar_Mapeamentos():
+    """
+    Força a recarga dos De-Paras na próxima requisição (ex: após alterar as tabelas no banco).
+    Com o snapshot compartilhado, a invalidação vale para todos os workers.
+    A sincronização incremental também é descartada: a próxima carga relê as tabelas inteiras.
+    """
+    sincronizador_de_para.esquecer()
+    if snapshot_compartilhado is not None:
+        snapshot_compartilhado.invalidar()
+    cache_mapeamentos.invalidar()
+
+def Status_Mapeamentos():
+    """
+    Métricas do cache de De-Paras (e do snapshot compartilhado, se ativo).
+    """
+    status = cache_mapeamentos.status()
+    if snapshot_compartilhado is not None:
+        status["compartilhado"] = snapshot_compartilhado.status()
+    return status
+
 def Atualizar_Sigla_Depositante(nome_depositante, nova_sigla):
     """
     NOVO: Atualiza a sigla (area) na tabela 2 se encontrar um depositante com cadastro incompleto.
     """
     try:
-        engine = create_engine(DATABASE_URL)
+        engine = Obter_Engine()
         # SQL de Update seguro
         sql = text("""
             UPDATE "Tb_Volumes_De_Para_Abreviacao2"
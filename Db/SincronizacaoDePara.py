@@ -0,0 +1,278 @@
+import time
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import inspect, text
+
+
+class SincronizadorDePara:
+    """
+    Sincronização incremental das tabelas De-Para.
+
+    Na primeira carga cada tabela é lida inteira (SELECT *) e guarda-se a sua "versão":
+      - 'coluna_versao' (ex: updated_at), se a tabela tiver essa coluna e chave primária;
+      - xmin do PostgreSQL (id da transação que gravou a linha), se tiver chave primária;
+      - sem chave primária ou sem versão: a tabela é sempre recarregada inteira.
+    Nas cargas seguintes, só as linhas com versão >= "marca d'água" da carga anterior são baixadas
+    e aplicadas sobre o DataFrame anterior (atualiza/insere pela chave primária; chaves que sumiram
+    do banco são removidas). A marca d'água fica abaixo do máximo lido, para não perder alterações
+    gravadas depois da leitura com versão menor ou igual a ele:
+      - xmin: o xmin do snapshot da leitura (transações ainda abertas naquele momento têm id >= ele);
+      - coluna_versao: o máximo menos 'margem_versao' (datas) ou o próprio máximo (empates com >=).
+    As linhas relidas que não mudaram não geram um DataFrame novo.
+
+    Os DataFrames publicados nunca são alterados: uma tabela modificada vira um DataFrame
+    novo e as tabelas sem mudança mantêm o mesmo objeto do snapshot anterior.
+    """
+
+    COLUNA_VERSAO_SYNC = "_versao_sync"
+
+    def __init__(self, obter_engine, mapa_tabelas, coluna_versao="updated_at", recarga_completa_a_cada=24, max_workers=4,
+                 margem_versao=timedelta(minutes=5)):
+        """
+        :param obter_engine: Função que retorna a engine do SQLAlchemy.
+        :param mapa_tabelas: {chave no dicionário de mapeamentos: nome da tabela (já entre aspas)}.
+        :param coluna_versao: Coluna de data/versão de alteração, se existir nas tabelas.
+        :param recarga_completa_a_cada: Após N sincronizações incrementais, recarrega tudo (rede de segurança). 0 = nunca.
+        :param max_workers: Tabelas sincronizadas em paralelo.
+        :param margem_versao: Quanto antes do máximo de 'coluna_versao' (data/hora) a próxima sincronização relê.
+                              Cobre transações que gravam uma data antiga e só confirmam depois da leitura.
+        """
+        self.obter_engine = obter_engine
+        self.mapa_tabelas = mapa_tabelas
+        self.coluna_versao = coluna_versao
+        self.recarga_completa_a_cada = recarga_completa_a_cada
+        self.margem_versao = margem_versao
+        self.max_workers = max(1, min(max_workers, len(mapa_tabelas)))
+
+        self._lock = threading.Lock()
+        self._estado = {} # chave -> {estrategia, pk, df, contagem, versao, desde}
+        self._sincronizacoes = 0
+        self.ultima_sincronizacao = {} # chave -> resumo da última execução (para log/métricas)
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def carregar(self, completo=False):
+        """
+        Retorna o dicionário {chave: DataFrame} atualizado com o banco.
+        :param completo: Se True, ignora o estado e recarrega todas as tabelas.
+        """
+        with self._lock:
+            self._sincronizacoes += 1
+            if self.recarga_completa_a_cada and self._sincronizacoes % self.recarga_completa_a_cada == 0:
+                completo = True
+            if completo:
+                self._estado = {}
+
+            engine = self.obter_engine()
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sync_de_para") as executor:
+                futuros = {
+                    chave: executor.submit(self._sincronizar_tabela, engine, chave, tabela)
+                    for chave, tabela in self.mapa_tabelas.items()
+                }
+                mapeamentos = {}
+                for chave, futuro in futuros.items():
+                    resumo = futuro.result()
+                    self.ultima_sincronizacao[chave] = resumo
+                    mapeamentos[chave] = self._estado[chave]["df"]
+                    print(f"Sincronizando tabela: {self.mapa_tabelas[chave]}... {resumo['modo']} "
+                          f"({resumo['linhas_lidas']} linhas lidas em {resumo['segundos']:.2f}s)")
+            return mapeamentos
+
+    def esquecer(self, chave=None):
+        """
+        Descarta o estado de uma tabela (ou de todas): a próxima carga será completa.
+        """
+        with self._lock:
+            if chave is None:
+                self._estado = {}
+            else:
+                self._estado.pop(chave, None)
+
+    # ------------------------------------------------------------------
+    # Sincronização por tabela
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _nome_simples(tabela):
+        return tabela.strip('"')
+
+    @staticmethod
+    def _aspas(coluna):
+        return '"' + coluna.replace('"', '""') + '"'
+
+    def _descobrir_estrategia(self, engine, tabela):
+        """
+        Retorna (estrategia, pk) onde estrategia é 'coluna', 'xmin' ou 'completa'.
+        """
+        try:
+            inspetor = inspect(engine)
+            nome = self._nome_simples(tabela)
+            pk = inspetor.get_pk_constraint(nome).get("constrained_columns") or []
+            colunas = [c["name"] for c in inspetor.get_columns(nome)]
+        except Exception as e:
+            print(f"AVISO: Não foi possível inspecionar {tabela} ({e}). Usando recarga completa.")
+            return "completa", []
+
+        if not pk:
+            return "completa", []
+        if self.coluna_versao and self.coluna_versao in colunas:
+            return "coluna", pk
+        if engine.dialect.name == "postgresql":
+            return "xmin", pk
+        return "completa", pk
+
+    @staticmethod
+    def _conectar(engine):
+        # No PostgreSQL, todas as consultas de uma tabela enxergam o mesmo snapshot do banco
+        if engine.dialect.name == "postgresql":
+            return engine.connect().execution_options(isolation_level="REPEATABLE READ")
+        return engine.connect()
+
+    def _expressao_versao(self, estrategia):
+        if estrategia == "coluna":
+            return self._aspas(self.coluna_versao)
+        return "xmin::text::bigint"
+
+    def _ler_resumo(self, conn, tabela, estrategia):
+        """
+        Retorna (count, max(versão), marca d'água) no snapshot da conexão.
+        """
+        versao = self._expressao_versao(estrategia)
+        contagem, maximo = conn.execute(text(f"SELECT COUNT(*), MAX({versao}) FROM {tabela}")).one()
+        return contagem, maximo, self._marca_dagua(conn, estrategia, maximo)
+
+    def _marca_dagua(self, conn, estrategia, maximo):
+        """
+        Versão a partir da qual (>=) a próxima sincronização relê as linhas.
+        """
+        if estrategia == "xmin":
+            # Toda transação ainda aberta no snapshot tem id >= xmin do snapshot; xmin das linhas tem 32 bits
+            return conn.execute(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint % 4294967296")).scalar()
+        if isinstance(maximo, datetime) and self.margem_versao:
+            return maximo - self.margem_versao
+        return maximo
+
+    def _sincronizar_tabela(self, engine, chave, tabela):
+        inicio = time.perf_counter()
+        estado = self._estado.get(chave)
+
+        if estado is None:
+            estrategia, pk = self._descobrir_estrategia(engine, tabela)
+            estado = self._carga_completa(engine, tabela, estrategia, pk)
+            self._estado[chave] = estado
+            return self._resumo("completa", len(estado["df"]), inicio)
+
+        if estado["estrategia"] == "completa":
+            self._estado[chave] = self._carga_completa(engine, tabela, "completa", estado["pk"])
+            return self._resumo("completa", len(self._estado[chave]["df"]), inicio)
+
+        with self._conectar(engine) as conn:
+            contagem, versao, desde = self._ler_resumo(conn, tabela, estado["estrategia"])
+
+            if versao is not None and estado["versao"] is not None and versao < estado["versao"]:
+                # Versão andou para trás (ex: xmin reiniciado, restauração de backup): não dá para confiar
+                print(f"AVISO: Versão de {tabela} regrediu. Recarregando tabela inteira.")
+                self._estado[chave] = self._carga_completa(engine, tabela, estado["estrategia"], estado["pk"])
+                return self._resumo("completa", len(self._estado[chave]["df"]), inicio)
+
+            # Linhas novas/alteradas (>= marca d'água: relê empates e transações confirmadas depois da última leitura)
+            expressao = self._expressao_versao(estado["estrategia"])
+            if estado["desde"] is None:
+                sql = f"SELECT *, {expressao} AS {self.COLUNA_VERSAO_SYNC} FROM {tabela} WHERE {expressao} IS NOT NULL"
+                alteradas = pd.read_sql(text(sql), conn)
+            else:
+                sql = f"SELECT *, {expressao} AS {self.COLUNA_VERSAO_SYNC} FROM {tabela} WHERE {expressao} >= :desde"
+                alteradas = pd.read_sql(text(sql), conn, params={"desde": estado["desde"]})
+            alteradas = alteradas.drop(columns=self.COLUNA_VERSAO_SYNC)
+
+            # Chaves existentes (para detectar exclusões) - só se a contagem não fechar
+            chaves_banco = None
+            if contagem != self._contagem_esperada(estado, alteradas):
+                colunas_pk = ", ".join(self._aspas(c) for c in estado["pk"])
+                chaves_banco = pd.read_sql(text(f"SELECT {colunas_pk} FROM {tabela}"), conn)
+
+        if chaves_banco is None and contagem == len(estado["df"]) and self._sem_alteracoes(estado["df"], alteradas, estado["pk"]):
+            # Só linhas relidas e iguais às atuais: mantém o mesmo DataFrame
+            self._estado[chave] = {**estado, "versao": versao, "desde": desde}
+            return self._resumo("sem alterações", len(alteradas), inicio)
+
+        df = self._aplicar_alteracoes(estado["df"], alteradas, chaves_banco, estado["pk"])
+        if len(df) != contagem:
+            # Estado inconsistente (ex: alteração concorrente entre as consultas): recarrega
+            print(f"AVISO: Sincronização de {tabela} não fechou ({len(df)} != {contagem}). Recarregando tabela inteira.")
+            self._estado[chave] = self._carga_completa(engine, tabela, estado["estrategia"], estado["pk"])
+            return self._resumo("completa", len(self._estado[chave]["df"]), inicio)
+
+        self._estado[chave] = {**estado, "df": df, "contagem": contagem, "versao": versao, "desde": desde}
+        return self._resumo("incremental", len(alteradas), inicio)
+
+    def _carga_completa(self, engine, tabela, estrategia, pk):
+        with self._conectar(engine) as conn:
+            df = pd.read_sql(text(f"SELECT * FROM {tabela}"), conn)
+            contagem, versao, desde = (len(df), None, None)
+            if estrategia != "completa":
+                contagem, versao, desde = self._ler_resumo(conn, tabela, estrategia)
+        return {"estrategia": estrategia, "pk": pk, "df": df, "contagem": contagem, "versao": versao, "desde": desde}
+
+    @staticmethod
+    def _indice_pk(df, pk):
+        if len(pk) == 1:
+            return pd.Index(df[pk[0]])
+        return pd.MultiIndex.from_frame(df[pk])
+
+    def _contagem_esperada(self, estado, alteradas):
+        # Total sem exclusões = linhas atuais + chaves realmente novas
+        atuais = self._indice_pk(estado["df"], estado["pk"])
+        novas = self._indice_pk(alteradas, estado["pk"])
+        return len(estado["df"]) + int((~novas.isin(atuais)).sum())
+
+    def _sem_alteracoes(self, df, alteradas, pk):
+        """
+        True se todas as linhas relidas já existem em df com os mesmos valores.
+        """
+        if alteradas.empty:
+            return True
+        indice_atual = self._indice_pk(df, pk)
+        posicoes = indice_atual.get_indexer(self._indice_pk(alteradas, pk))
+        if (posicoes < 0).any():
+            return False
+        atuais = df.iloc[posicoes].reset_index(drop=True)
+        relidas = alteradas[df.columns].reset_index(drop=True)
+        return atuais.astype(object).equals(relidas.astype(object))
+
+    def _aplicar_alteracoes(self, df, alteradas, chaves_banco, pk):
+        """
+        Retorna um DataFrame novo: linhas alteradas substituídas na mesma posição,
+        linhas novas no final e chaves ausentes do banco removidas.
+        """
+        indice_atual = self._indice_pk(df, pk)
+        indice_alteradas = self._indice_pk(alteradas, pk)
+        resultado = df.copy()
+
+        existentes = indice_alteradas.isin(indice_atual)
+        if existentes.any():
+            posicoes = indice_atual.get_indexer(indice_alteradas[existentes])
+            substitutas = alteradas.loc[existentes, df.columns]
+            for coluna in df.columns:
+                valores = resultado[coluna].to_numpy(copy=True)
+                if valores.dtype != substitutas[coluna].dtype:
+                    valores = valores.astype(object)
+                valores[posicoes] = substitutas[coluna].to_numpy()
+                resultado[coluna] = pd.Series(valores).infer_objects().to_numpy() if valores.dtype == object else valores
+
+        if (~existentes).any():
+            resultado = pd.concat([resultado, alteradas.loc[~existentes, df.columns]], ignore_index=True)
+
+        if chaves_banco is not None:
+            manter = self._indice_pk(resultado, pk).isin(self._indice_pk(chaves_banco, pk))
+            resultado = resultado.loc[manter].reset_index(drop=True)
+
+        return resultado
+
+    @staticmethod
+    def _resumo(modo, linhas_lidas, inicio):
+        return {"modo": modo, "linhas_lidas": linhas_lidas, "segundos": time.perf_counter() - inicio}
@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import uuid
+import glob
+import weakref
+import threading
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+
+class SnapshotCompartilhado:
+    """
+    Snapshot dos De-Paras compartilhado entre os processos do servidor (workers do gunicorn/waitress, etc.).
+
+    Sem ele, cada worker guarda a sua cópia das tabelas e vai ao PostgreSQL por conta própria.
+    Aqui cada tabela é gravada uma única vez em Arrow IPC (formato de arquivo, sem compressão) e os
+    workers a abrem com memory map: as páginas do arquivo ficam no cache do sistema operacional uma
+    vez só para todos, e as colunas numéricas/datas sem nulos são usadas sem cópia (somente leitura).
+    Colunas de texto ficam como pd.StringDtype("pyarrow"), apontando para os mesmos buffers; só as
+    colunas usadas no enriquecimento viram objetos str (IndiceDePara, por processo).
+
+    Arquivos na pasta:
+      - <chave>-<id>.arrow: uma tabela. Tabelas que não mudaram entre cargas mantêm o mesmo arquivo
+        (e o mesmo DataFrame nos workers, o que preserva os índices de busca já montados).
+      - atual.json: a versão publicada {versao, publicado_em, tabelas: {chave: arquivo}}, trocada de forma
+        atômica (os.replace): quem lê vê a versão anterior inteira ou a nova inteira.
+      - invalidado.json: momento da última invalidação (rota /mapeamentos/invalidar em qualquer worker).
+      - carga.trava: trava entre processos; só um worker consulta o banco por vez.
+    """
+
+    PONTEIRO = "atual.json"
+    INVALIDACAO = "invalidado.json"
+    TRAVA = "carga.trava"
+    EXTENSAO = ".arrow"
+
+    def __init__(self, diretorio, espera_trava=300, retencao_segundos=600):
+        """
+        :param diretorio: Pasta do snapshot (a mesma para todos os workers da máquina).
+        :param espera_trava: Segundos após os quais uma trava de carga é considerada abandonada (worker morto).
+        :param retencao_segundos: Arquivos de tabelas fora da versão atual são removidos após esse tempo.
+        """
+        self.diretorio = diretorio
+        self.espera_trava = espera_trava
+        self.retencao_segundos = retencao_segundos
+
+        self._lock = threading.Lock()
+        self._publicadas = {} # chave -> (weakref do DataFrame publicado por este processo, arquivo)
+        self._anexadas = {} # chave -> (arquivo, DataFrame anexado)
+        self.versao_anexada = None
+
+        # Métricas (por processo)
+        self.cargas_banco = 0
+        self.anexacoes = 0
+        self.falhas_publicacao = 0
+
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def versao(self):
+        """
+        Identificador barato (os.stat) da versão publicada e da última invalidação.
+        Muda quando qualquer worker publica uma carga nova ou invalida o snapshot.
+        """
+        identificador = []
+        for nome in (self.PONTEIRO, self.INVALIDACAO):
+            try:
+                stat = os.stat(os.path.join(self.diretorio, nome))
+                identificador.append((stat.st_mtime_ns, stat.st_ino, stat.st_size))
+            except FileNotFoundError:
+                identificador.append(None)
+        return tuple(identificador)
+
+    def obter(self, carregador, max_idade):
+        """
+        Retorna os De-Paras da versão publicada, se ela tiver menos de 'max_idade' segundos e for
+        posterior à última invalidação. Caso contrário, um único worker (com a trava) chama o
+        'carregador' (banco), publica o resultado e todos passam a usar a nova versão.
+        Se a publicação falhar, devolve o resultado do carregador (apenas para este processo).
+        """
+        # self._lock só protege o estado deste processo: a espera pela trava entre processos e a
+        # consulta ao banco ficam fora dele (threads do mesmo processo esperam na própria trava)
+        manifesto = self._publicado_valido(max_idade)
+        if manifesto is None:
+            with self._trava():
+                # Outro worker (ou outra thread) pode ter publicado enquanto este esperava a trava
+                manifesto = self._publicado_valido(max_idade)
+                if manifesto is None:
+                    mapeamentos = carregador()
+                    with self._lock:
+                        self.cargas_banco += 1
+                        try:
+                            manifesto = self._publicar(mapeamentos)
+                        except Exception as e:
+                            self.falhas_publicacao += 1
+                            print(f"AVISO: Não foi possível publicar o snapshot compartilhado dos De-Paras: {e}")
+                            return mapeamentos
+        with self._lock:
+            return self._anexar(manifesto)
+
+    def invalidar(self):
+        """
+        Marca a versão publicada como obsoleta para todos os workers: a próxima carga vai ao banco.
+        """
+        self._gravar_json(self.INVALIDACAO, {"em": time.time()})
+
+    def status(self):
+        """
+        Versão publicada, idade, tamanho dos arquivos e contadores deste processo.
+        """
+        manifesto = self._ler_json(self.PONTEIRO)
+        arquivos = list(manifesto["tabelas"].values()) if manifesto else []
+        return {
+            "diretorio": self.diretorio,
+            "versao_publicada": manifesto["versao"] if manifesto else None,
+            "idade_segundos": round(time.time() - manifesto["publicado_em"], 1) if manifesto else None,
+            "bytes": sum(os.path.getsize(os.path.join(self.diretorio, a)) for a in arquivos
+                         if os.path.exists(os.path.join(self.diretorio, a))),
+            "versao_anexada": self.versao_anexada,
+            "cargas_banco": self.cargas_banco,
+            "anexacoes": self.anexacoes,
+            "falhas_publicacao": self.falhas_publicacao,
+        }
+
+    # ------------------------------------------------------------------
+    # Versão publicada
+    # ------------------------------------------------------------------
+
+    def _ler_json(self, nome):
+        try:
+            with open(os.path.join(self.diretorio, nome), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _gravar_json(self, nome, conteudo):
+        destino = os.path.join(self.diretorio, nome)
+        temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(conteudo, f, ensure_ascii=False)
+        os.replace(temporario, destino)
+
+    def _publicado_valido(self, max_idade):
+        manifesto = self._ler_json(self.PONTEIRO)
+        if manifesto is None:
+            return None
+        invalidacao = self._ler_json(self.INVALIDACAO)
+        if invalidacao is not None and manifesto["publicado_em"] <= invalidacao["em"]:
+            return None
+        if time.time() - manifesto["publicado_em"] >= max_idade:
+            return None
+        if not all(os.path.exists(os.path.join(self.diretorio, a)) for a in manifesto["tabelas"].values()):
+            return None
+        return manifesto
+
+    def _publicar(self, mapeamentos):
+        tabelas = {}
+        for chave, df in mapeamentos.items():
+            # Tabela que não mudou (mesmo objeto da publicação anterior): reaproveita o arquivo
+            anterior = self._publicadas.get(chave)
+            if anterior is not None and anterior[0]() is df and os.path.exists(os.path.join(self.diretorio, anterior[1])):
+                tabelas[chave] = anterior[1]
+                continue
+
+            arquivo = f"{chave}-{uuid.uuid4().hex[:12]}{self.EXTENSAO}"
+            destino = os.path.join(self.diretorio, arquivo)
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            temporario = f"{destino}.{os.getpid()}.tmp"
+            try:
+                with pa.OSFile(temporario, "wb") as saida, ipc.new_file(saida, tabela.schema) as escritor:
+                    escritor.write_table(tabela)
+                os.replace(temporario, destino)
+            finally:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
+            self._publicadas[chave] = (weakref.ref(df), arquivo)
+            tabelas[chave] = arquivo
+
+        manifesto = {"versao": uuid.uuid4().hex[:16], "publicado_em": time.time(), "tabelas": tabelas}
+        self._gravar_json(self.PONTEIRO, manifesto) # Troca atômica da versão
+        print(f"  - De-Paras publicados para os demais processos (versão {manifesto['versao']}).")
+        self._limpar(set(tabelas.values()))
+        return manifesto
+
+    def _anexar(self, manifesto):
+        mapeamentos, anexadas = {}, {}
+        for chave, arquivo in manifesto["tabelas"].items():
+            atual = self._anexadas.get(chave)
+            if atual is not None and atual[0] == arquivo:
+                df = atual[1]
+            else:
+                # memory_map: os buffers do Arrow apontam para as páginas do arquivo (sem leitura para a memória do processo).
+                # Texto como StringDtype("pyarrow"): continua nesses buffers em vez de virar objetos str.
+                tabela = ipc.open_file(pa.memory_map(os.path.join(self.diretorio, arquivo))).read_all()
+                df = tabela.to_pandas(split_blocks=True, types_mapper=self._tipo_pandas)
+            mapeamentos[chave] = df
+            anexadas[chave] = (arquivo, df)
+        self._anexadas = anexadas
+        self.versao_anexada = manifesto["versao"]
+        self.anexacoes += 1
+        return mapeamentos
+
+    @staticmethod
+    def _tipo_pandas(tipo):
+        if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+            return pd.StringDtype("pyarrow")
+        return None # Demais tipos: conversão padrão do pyarrow
+
+    def _limpar(self, em_uso):
+        # Arquivos de versões anteriores; os recentes ficam para workers que ainda estão anexando.
+        # No Windows, arquivos ainda mapeados por outro processo não podem ser removidos (ficam para a próxima).
+        limite = time.time() - self.retencao_segundos
+        for caminho in glob.glob(os.path.join(self.diretorio, f"*{self.EXTENSAO}")):
+            if os.path.basename(caminho) in em_uso:
+                continue
+            try:
+                if os.path.getmtime(caminho) < limite:
+                    os.remove(caminho)
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Trava entre processos
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _trava(self):
+        caminho = os.path.join(self.diretorio, self.TRAVA)
+        while True:
+            try:
+                descritor = os.open(caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(caminho) > self.espera_trava:
+                        print("AVISO: Trava de carga dos De-Paras abandonada; removendo.")
+                        os.remove(caminho)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(0.2)
+        try:
+            os.write(descritor, str(os.getpid()).encode("ascii"))
+            os.close(descritor)
+            yield
+        finally:
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
@@ -7,8 +7,14 @@ import pdfplumber
 import json
 import gc
 import re
+import shutil
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pds
+import pyarrow.parquet as pq
+import xml.etree.ElementTree as ET
 
-from qvd import qvd_reader
 from datetime import datetime, date
 
 
@@ -468,6 +474,10 @@ class Json:
                 "path_os_output": "\\\\172.16.200.206\\Luftlogistics\\PUBLICO\\LUCAS\\OrdServicos.parquet",
                 "path_base": "\\\\172.16.200.206\\Luftlogistics\\PUBLICO\\LUCAS\\OrdServicosBase.qvd",
                 "path_base_output": "\\\\172.16.200.206\\Luftlogistics\\PUBLICO\\LUCAS\\OrdServicosBase.parquet",
+                # Colunas gravadas no Parquet de cada QVD (lista vazia = todas)
+                "colunas_ctc": [],
+                "colunas_os": [],
+                "colunas_base": [],
             },
             "dados_atualizar_parquet": {
                 "path": "\\\\172.16.200.206\\Luftlogistics\\PUBLICO\\LUCAS\\NFs_CTCs.parquet",
@@ -817,20 +827,17 @@ class Json:
         st.write("JSON atualizado com sucesso.")
 
     @staticmethod
-    def json_ano_data():
-        st.write("##### Verificando a existências dos Jsons...")
-        if os.path.exists(Json.caminho_json_ctc):
-            with open(Json.caminho_json_ctc, "r") as f:
-                path_parquet = json.load(f)
-        else:
-            st.warning("Arquivo JSON nao encontrado. Criando com valores padrao...")
-            Json.gerar_json_padrao_ctc()
-            with open(Json.caminho_json_ctc, "r") as f:
-                path_parquet = json.load(f)
-
+    def _ano_mes_parquet(caminho_parquet):
+        """
+        Anos e meses da DataCTC de um Parquet único (sem partições), lendo a coluna inteira.
+        :return: {ano: [meses]}
+        """
         st.write("##### Carregando Dados")
-        caminho_parquet = path_parquet["dados_atualizar_parquet"]["path"]
-        df = pd.read_parquet(caminho_parquet)
+        # Só a coluna DataCTC é lida (as demais só se ela não existir, para escolher outra)
+        if "DataCTC" in pq.read_schema(caminho_parquet).names:
+            df = pd.read_parquet(caminho_parquet, columns=["DataCTC"])
+        else:
+            df = pd.read_parquet(caminho_parquet)
 
         st.write("##### Verificando Coluna DataCTC")
         if "DataCTC" not in df.columns:
@@ -864,12 +871,41 @@ class Json:
         
         df_data = {int(ano): meses for ano, meses in df_data.items()}
 
+        return df_data
+
+    @staticmethod
+    def json_ano_data():
+        st.write("##### Verificando a existências dos Jsons...")
+        if os.path.exists(Json.caminho_json_ctc):
+            with open(Json.caminho_json_ctc, "r") as f:
+                path_parquet = json.load(f)
+        else:
+            st.warning("Arquivo JSON nao encontrado. Criando com valores padrao...")
+            Json.gerar_json_padrao_ctc()
+            with open(Json.caminho_json_ctc, "r") as f:
+                path_parquet = json.load(f)
+
+        caminho_parquet = path_parquet["dados_atualizar_parquet"]["path"]
+        linhas_ano_mes = None
+        if os.path.isdir(caminho_parquet):
+            # Dataset particionado (Ano=/Mês=): períodos e nº de linhas vêm do catálogo, sem ler os dados
+            st.write("##### Lendo catálogo de períodos do dataset")
+            linhas_ano_mes = ConversorQvdParquet.catalogo(caminho_parquet)
+            df_data = {ano: sorted(meses) for ano, meses in linhas_ano_mes.items()}
+            st.dataframe(pd.DataFrame(
+                [(ano, mes, linhas) for ano, meses in linhas_ano_mes.items() for mes, linhas in meses.items()],
+                columns=["Ano", "Mês", "Linhas"]))
+        else:
+            df_data = Json._ano_mes_parquet(caminho_parquet)
+
         st.write("##### Salvando Json")
         if os.path.exists(Json.caminho_json_ctc_colunas):
             with open(Json.caminho_json_ctc_colunas, "r",encoding="utf-8") as f:
                 colunas_datas = json.load(f)
 
             colunas_datas["colunas_ano_mes"] = df_data
+            if linhas_ano_mes is not None:
+                colunas_datas["linhas_ano_mes"] = linhas_ano_mes
 
             with open(Json.caminho_json_ctc_colunas, "w", encoding="utf-8") as f:
                 json.dump(colunas_datas, f, indent=4, ensure_ascii=False)
@@ -882,6 +918,8 @@ class Json:
                 colunas_datas = json.load(f)
 
             colunas_datas["colunas_ano_mes"] = df_data
+            if linhas_ano_mes is not None:
+                colunas_datas["linhas_ano_mes"] = linhas_ano_mes
 
             with open(Json.caminho_json_ctc_colunas, "w", encoding="utf-8") as f:
                 json.dump(colunas_datas, f, indent=4, ensure_ascii=False)
@@ -8649,16 +8687,387 @@ class DataCleaner:
         except (ValueError, TypeError):
             return None
 
+    # Número já no formato do float(): sinal, dígitos com um ponto decimal opcional e expoente
+    NUMERO_SIMPLES = r"\s*[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?\s*"
+
+    @classmethod
+    def _numeros_texto(cls, textos):
+        """
+        clean_number para uma Series de textos, com operações sobre a coluna inteira.
+        :return: Array float64 (NaN onde clean_number retornaria None).
+        """
+        numeros = np.full(len(textos), np.nan)
+        if not len(textos):
+            return numeros
+
+        # Separadores: "1.234,56" e "1234,56" -> vírgula decimal; "1.234.567" -> pontos de milhar, menos o último
+        virgula = textos.str.contains(",", regex=False)
+        so_ponto = textos.str.contains(".", regex=False) & ~virgula
+        textos = textos.mask(virgula, textos.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+        if so_ponto.any():
+            partes = textos[so_ponto].str.rpartition(".")
+            milhar = partes[2].str.len() == 3
+            textos.loc[milhar[milhar].index] = (partes[0].str.replace(".", "", regex=False) + "." + partes[2])[milhar]
+
+        # Conversão em bloco dos números simples (mesmo float() por valor); o restante um a um.
+        # O regex no pyarrow (\s e \d só ASCII) pode deixar casos válidos para o float() do laço.
+        simples = pc.match_substring_regex(pa.array(textos.to_numpy(dtype=object), type=pa.string()),
+                                           f"^{cls.NUMERO_SIMPLES}$").to_numpy(zero_copy_only=False)
+        numeros[simples] = textos[simples].to_numpy(dtype=object).astype(np.float64)
+        for i in np.flatnonzero(~simples):
+            try:
+                numeros[i] = float(textos.iat[i])
+            except (ValueError, TypeError):
+                pass
+        return numeros
+
+    @classmethod
+    def _numeros_unicos(cls, valores):
+        """
+        clean_number para um array de valores distintos (qualquer tipo).
+        :return: Array float64 (0 nos nulos, NaN onde clean_number retornaria None).
+        """
+        numeros = np.full(len(valores), np.nan)
+        texto = np.fromiter((isinstance(valor, str) for valor in valores), dtype=bool, count=len(valores))
+        nulos = ~texto & pd.isna(valores)
+        numeros[nulos] = 0
+        numeros[texto] = cls._numeros_texto(pd.Series(valores[texto], dtype=object))
+        for i in np.flatnonzero(~texto & ~nulos):
+            try:
+                numeros[i] = float(valores[i])
+            except (ValueError, TypeError):
+                pass
+        return numeros
+
+    @classmethod
+    def clean_number_serie(cls, serie):
+        """
+        Equivalente a serie.apply(clean_number), em float64, calculado uma vez por valor distinto.
+        """
+        codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+        numeros = cls._numeros_unicos(np.asarray(unicos, dtype=object))
+        return pd.Series(numeros[codigos], index=serie.index, name=serie.name)
+
     @classmethod
     def clean_currency_serie(cls, serie): # Renomeei para indicar que agora opera em uma série
-        serie = serie.astype(str).str.strip().str.replace('R$', '', regex=False)
-        serie = serie.apply(cls.clean_number)
-        return serie
+        # Mesmo resultado de astype(str).str.strip().str.replace('R$', '').apply(clean_number),
+        # mas a limpeza e a conversão são feitas só nos textos distintos
+        codigos, textos = pd.factorize(serie.astype(str))
+        textos = pd.Series(textos, dtype=object).str.strip().str.replace('R$', '', regex=False)
+        return pd.Series(cls._numeros_texto(textos)[codigos], index=serie.index, name=serie.name)
 
     @classmethod
     def clean_ctc(cls, df, col):
         return df[col].fillna('0').astype(str).str.strip()
 
+class ConversorQvdParquet:
+    """
+    Converte um QVD (Qlik) em Parquet em lotes, sem carregar a tabela inteira na memória.
+
+    O QVD tem um cabeçalho XML, uma tabela de símbolos por coluna (os valores distintos) e a tabela
+    de índices (uma linha de bits por registro, com a posição do símbolo de cada coluna). Aqui:
+      1. Só as tabelas de símbolos das colunas pedidas são lidas;
+      2. A tabela de índices é lida em lotes de 'linhas_por_lote' registros e decodificada com numpy;
+      3. O filtro de ano é resolvido uma vez por símbolo da coluna de data e aplicado a cada lote;
+      4. Cada lote filtrado vira um row group do Parquet (pyarrow.ParquetWriter), em um arquivo único
+         (converter) ou em um arquivo por mês de um dataset particionado Ano=/Mês= (converter_particionado).
+    A memória fica limitada aos símbolos das colunas pedidas mais um lote, em vez da tabela inteira.
+    Os valores saem como texto (None para nulos), como no qvd_reader.read.
+    """
+
+    FIM_CABECALHO = b"</QvdTableHeader>"
+    # Colunas de partição do dataset gravado por converter_particionado (pastas Ano=/Mês=)
+    PARTICOES = ["Ano", "Mês"]
+    # Catálogo de períodos do dataset ({ano: {mês: linhas}}); o prefixo "_" o deixa fora da leitura do dataset
+    ARQUIVO_CATALOGO = "_catalogo.json"
+
+    def __init__(self, caminho_qvd, linhas_por_lote=500_000):
+        self.caminho_qvd = caminho_qvd
+        self.linhas_por_lote = linhas_por_lote
+        self._ler_cabecalho()
+
+    def _ler_cabecalho(self):
+        # Lê o arquivo em blocos até o fim do cabeçalho XML (os dados binários começam logo depois)
+        cabecalho = b""
+        with open(self.caminho_qvd, "rb") as f:
+            while self.FIM_CABECALHO not in cabecalho:
+                bloco = f.read(1 << 16)
+                if not bloco:
+                    raise ValueError(f"Cabeçalho do QVD não encontrado: {self.caminho_qvd}")
+                cabecalho += bloco
+        fim = cabecalho.index(self.FIM_CABECALHO) + len(self.FIM_CABECALHO)
+        xml = ET.fromstring(cabecalho[:fim].decode("utf-8"))
+
+        # Após o XML vem "\r\n" e um byte nulo
+        if cabecalho[fim:fim + 2] == b"\r\n":
+            fim += 2
+        elif cabecalho[fim:fim + 1] == b"\n":
+            fim += 1
+        if cabecalho[fim:fim + 1] == b"\0":
+            fim += 1
+        self.inicio_dados = fim
+
+        self.linhas = int(xml.findtext("NoOfRecords"))
+        self.bytes_por_registro = int(xml.findtext("RecordByteSize"))
+        self.inicio_indices = self.inicio_dados + int(xml.findtext("Offset"))
+        self.campos = {}
+        for campo in xml.find("Fields").findall("QvdFieldHeader"):
+            self.campos[campo.findtext("FieldName")] = {
+                "bit_inicio": int(campo.findtext("BitOffset")),
+                "bits": int(campo.findtext("BitWidth")),
+                "bias": int(campo.findtext("Bias")),
+                "simbolos": int(campo.findtext("NoOfSymbols")),
+                "inicio": self.inicio_dados + int(campo.findtext("Offset")),
+                "tamanho": int(campo.findtext("Length")),
+            }
+
+    @property
+    def colunas(self):
+        return list(self.campos)
+
+    @staticmethod
+    def _texto_double(valor):
+        if np.isnan(valor):
+            return "NaN"
+        return np.format_float_positional(valor, trim="-")
+
+    def _ler_simbolos(self, f, nome):
+        """
+        Valores distintos de uma coluna, na ordem da tabela de símbolos (texto; duais ficam com o texto).
+        """
+        campo = self.campos[nome]
+        f.seek(campo["inicio"])
+        dados = f.read(campo["tamanho"])
+        simbolos = np.empty(campo["simbolos"], dtype=object)
+        posicao = 0
+        for i in range(campo["simbolos"]):
+            tipo = dados[posicao]
+            posicao += 1
+            if tipo == 1: # Inteiro
+                simbolos[i] = str(int.from_bytes(dados[posicao:posicao + 4], "little", signed=True))
+                posicao += 4
+            elif tipo == 2: # Double
+                simbolos[i] = self._texto_double(np.frombuffer(dados, dtype="<f8", count=1, offset=posicao)[0])
+                posicao += 8
+            elif tipo in (4, 5, 6): # Texto (5 e 6: inteiro/double seguido do texto)
+                posicao += {4: 0, 5: 4, 6: 8}[tipo]
+                fim = dados.index(b"\0", posicao)
+                simbolos[i] = dados[posicao:fim].decode("utf-8")
+                posicao = fim + 1
+            else:
+                raise ValueError(f"Tipo de símbolo desconhecido ({tipo}) na coluna '{nome}' do QVD.")
+        return simbolos
+
+    def _indices(self, registros, nome):
+        """
+        Posição do símbolo de cada registro do lote (-1 = nulo).
+        :param registros: Lote da tabela de índices, uint8 (n, bytes_por_registro).
+        """
+        campo = self.campos[nome]
+        if campo["simbolos"] == 0:
+            return np.full(len(registros), -1, dtype=np.int64)
+        if campo["bits"] == 0:
+            indices = np.zeros(len(registros), dtype=np.int64)
+        else:
+            # Registro em little-endian: bits [bit_inicio, bit_inicio + bits) a partir do menos significativo
+            primeiro = campo["bit_inicio"] // 8
+            ultimo = (campo["bit_inicio"] + campo["bits"] - 1) // 8
+            valor = np.zeros(len(registros), dtype=np.uint64)
+            for deslocamento, byte in enumerate(range(primeiro, ultimo + 1)):
+                valor |= registros[:, byte].astype(np.uint64) << np.uint64(8 * deslocamento)
+            valor >>= np.uint64(campo["bit_inicio"] % 8)
+            valor &= np.uint64((1 << campo["bits"]) - 1)
+            indices = valor.astype(np.int64)
+        indices += campo["bias"]
+        indices[(indices < 0) | (indices >= campo["simbolos"])] = -1
+        return indices
+
+    def colunas_saida(self, colunas=None):
+        """
+        Colunas gravadas no Parquet (na ordem do QVD). Se 'colunas' for None ou vazia, todas.
+        """
+        faltantes = [c for c in colunas or [] if c not in self.campos]
+        if faltantes:
+            raise ValueError(f"Colunas não encontradas no QVD: {faltantes}")
+        return [c for c in self.campos if not colunas or c in colunas]
+
+    def _lotes(self, colunas, coluna_data=None, ano=None, progresso=None):
+        """
+        Decodifica a tabela de índices em lotes.
+        :return: Gerador de (pa.Table do lote, mês da coluna_data de cada linha ou None), só lotes não vazios.
+        """
+        colunas = self.colunas_saida(colunas)
+        if coluna_data is not None and coluna_data not in self.campos:
+            raise ValueError(f"Colunas não encontradas no QVD: {[coluna_data]}")
+        # A coluna de data é lida mesmo fora de 'colunas' (só para o filtro de ano e para o mês)
+        usadas = colunas + [coluna_data] if coluna_data is not None and coluna_data not in colunas else colunas
+
+        with open(self.caminho_qvd, "rb") as f:
+            # 1. Símbolos (valores distintos) como arrays do Arrow: cada lote é um 'take' nas posições
+            dicionarios, manter_simbolo, mes_simbolo = {}, None, None
+            for nome in usadas:
+                simbolos = self._ler_simbolos(f, nome)
+                if nome == coluna_data:
+                    # Conversão uma vez por valor distinto (mesmo resultado de converter a coluna inteira)
+                    datas = pd.to_datetime(pd.Series(simbolos, dtype=object), errors="coerce", dayfirst=True)
+                    if ano is not None:
+                        manter_simbolo = (datas.dt.year == ano).to_numpy()
+                    mes_simbolo = datas.dt.month.fillna(-1).to_numpy(dtype=np.int64)
+                    dicionarios[nome] = pa.array(datas.to_numpy(dtype="datetime64[ns]"), type=pa.timestamp("ns"))
+                else:
+                    dicionarios[nome] = pa.array(simbolos, type=pa.string())
+            esquema = pa.schema([(nome, dicionarios[nome].type) for nome in colunas])
+
+            # 2. Tabela de índices em lotes
+            f.seek(self.inicio_indices)
+            for inicio in range(0, self.linhas, self.linhas_por_lote):
+                quantidade = min(self.linhas_por_lote, self.linhas - inicio)
+                registros = np.frombuffer(f.read(quantidade * self.bytes_por_registro), dtype=np.uint8)
+                registros = registros.reshape(quantidade, self.bytes_por_registro)
+                indices = {nome: self._indices(registros, nome) for nome in usadas}
+
+                # 3. Filtro de ano pushdown: só as linhas do ano seguem para o Parquet
+                if manter_simbolo is not None:
+                    data = indices[coluna_data]
+                    manter = np.zeros(quantidade, dtype=bool)
+                    manter[data >= 0] = manter_simbolo[data[data >= 0]]
+                    indices = {nome: posicoes[manter] for nome, posicoes in indices.items()}
+
+                if len(indices[usadas[0]]):
+                    lote = pa.table({nome: dicionarios[nome].take(pa.array(indices[nome], mask=indices[nome] < 0))
+                                     for nome in colunas}, schema=esquema)
+                    meses = None
+                    if mes_simbolo is not None:
+                        data = indices[coluna_data]
+                        meses = np.where(data >= 0, mes_simbolo[np.maximum(data, 0)], -1)
+                    yield lote, meses
+                if progresso is not None:
+                    progresso((inicio + quantidade) / self.linhas)
+
+    def converter(self, caminho_parquet, colunas=None, coluna_data=None, ano=None, progresso=None):
+        """
+        Grava um único arquivo Parquet (em um arquivo temporário, trocado no final), um row group por lote.
+
+        :param colunas: Colunas a manter (na ordem do QVD). Se None ou vazia, todas.
+        :param coluna_data: Coluna convertida para data (pd.to_datetime com dayfirst=True, como antes).
+                            Se não estiver em 'colunas', é lida só para o filtro de ano.
+        :param ano: Se informado, só as linhas com coluna_data nesse ano são gravadas.
+        :param progresso: Callback opcional progresso(fração de 0 a 1).
+        :return: Nº de linhas gravadas (0 = nada gravado; o Parquet anterior é mantido).
+        """
+        temporario = f"{caminho_parquet}.tmp"
+        escritor, gravadas = None, 0
+        try:
+            for lote, _ in self._lotes(colunas, coluna_data, ano, progresso):
+                if escritor is None:
+                    escritor = pq.ParquetWriter(temporario, lote.schema, compression="snappy")
+                escritor.write_table(lote)
+                gravadas += lote.num_rows
+        except BaseException:
+            # Falha no meio da conversão: descarta o arquivo temporário incompleto
+            if escritor is not None:
+                escritor.close()
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        if escritor is not None:
+            escritor.close()
+
+        if gravadas:
+            os.replace(temporario, caminho_parquet)
+        return gravadas
+
+    def converter_particionado(self, caminho_dataset, coluna_data, ano, colunas=None, progresso=None):
+        """
+        Grava as linhas do ano como dataset Parquet particionado no estilo Hive:
+        caminho_dataset/Ano=2025/Mês=3/parte-0.parquet (Ano e Mês de coluna_data, fora dos arquivos).
+        A partição do ano é montada em uma pasta temporária e trocada no final; as dos outros anos são
+        mantidas. Um arquivo Parquet único antigo no mesmo caminho é substituído pela pasta.
+
+        :return: {mês: nº de linhas gravadas} (vazio = nada gravado; o dataset anterior é mantido).
+        """
+        temporario = f"{caminho_dataset}.tmp"
+        if os.path.isdir(temporario):
+            shutil.rmtree(temporario)
+
+        escritores, gravadas = {}, {}
+        try:
+            for lote, meses in self._lotes(colunas, coluna_data, ano, progresso):
+                # Colunas com o nome das partições ficam só no caminho (o valor vem de coluna_data)
+                lote = lote.drop_columns([c for c in self.PARTICOES if c in lote.column_names])
+                for mes in np.unique(meses):
+                    if mes not in escritores:
+                        pasta = os.path.join(temporario, f"{self.PARTICOES[1]}={mes}")
+                        os.makedirs(pasta, exist_ok=True)
+                        escritores[mes] = pq.ParquetWriter(os.path.join(pasta, "parte-0.parquet"), lote.schema, compression="snappy")
+                    parte = lote.filter(pa.array(meses == mes))
+                    escritores[mes].write_table(parte)
+                    gravadas[int(mes)] = gravadas.get(int(mes), 0) + parte.num_rows
+        except BaseException:
+            # Falha no meio da conversão: descarta a pasta temporária incompleta
+            for escritor in escritores.values():
+                escritor.close()
+            if os.path.isdir(temporario):
+                shutil.rmtree(temporario)
+            raise
+        for escritor in escritores.values():
+            escritor.close()
+
+        if not gravadas:
+            if os.path.isdir(temporario):
+                shutil.rmtree(temporario)
+            return gravadas
+
+        if os.path.isfile(caminho_dataset):
+            os.remove(caminho_dataset)
+        os.makedirs(caminho_dataset, exist_ok=True)
+        destino = os.path.join(caminho_dataset, f"{self.PARTICOES[0]}={ano}")
+        if os.path.isdir(destino):
+            shutil.rmtree(destino)
+        os.replace(temporario, destino)
+
+        gravadas = dict(sorted(gravadas.items()))
+        catalogo = self.catalogo(caminho_dataset)
+        catalogo[ano] = gravadas
+        self._gravar_catalogo(caminho_dataset, catalogo)
+        return gravadas
+
+    @classmethod
+    def catalogo(cls, caminho_dataset):
+        """
+        Períodos do dataset particionado e nº de linhas de cada um, sem ler os dados: vem do catálogo
+        gravado por converter_particionado ou, se ele não existir, das pastas Ano=/Mês= e do rodapé
+        (metadados) de cada arquivo Parquet. Nesse caso o catálogo é gravado para as próximas consultas.
+        :return: {ano: {mês: linhas}} (int), em ordem.
+        """
+        caminho_catalogo = os.path.join(caminho_dataset, cls.ARQUIVO_CATALOGO)
+        if os.path.exists(caminho_catalogo):
+            with open(caminho_catalogo, "r", encoding="utf-8") as f:
+                catalogo = json.load(f)
+            return {int(ano): {int(mes): linhas for mes, linhas in meses.items()} for ano, meses in sorted(catalogo.items())}
+
+        catalogo = {}
+        for pasta_ano in sorted(os.listdir(caminho_dataset)):
+            if not pasta_ano.startswith(f"{cls.PARTICOES[0]}="):
+                continue
+            ano = int(pasta_ano.split("=", 1)[1])
+            for pasta_mes in os.listdir(os.path.join(caminho_dataset, pasta_ano)):
+                if not pasta_mes.startswith(f"{cls.PARTICOES[1]}="):
+                    continue
+                pasta = os.path.join(caminho_dataset, pasta_ano, pasta_mes)
+                linhas = sum(pq.ParquetFile(os.path.join(pasta, arquivo)).metadata.num_rows
+                             for arquivo in os.listdir(pasta) if arquivo.endswith(".parquet"))
+                catalogo.setdefault(ano, {})[int(pasta_mes.split("=", 1)[1])] = linhas
+        catalogo = {ano: dict(sorted(meses.items())) for ano, meses in catalogo.items()}
+        cls._gravar_catalogo(caminho_dataset, catalogo)
+        return catalogo
+
+    @classmethod
+    def _gravar_catalogo(cls, caminho_dataset, catalogo):
+        with open(os.path.join(caminho_dataset, cls.ARQUIVO_CATALOGO), "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(catalogo.items())), f, indent=4)
+
+
 class VariavelFuncoesPadrao:
     @classmethod
     def nomes(cls, nome_arquivo):
@@ -8668,6 +9077,17 @@ class VariavelFuncoesPadrao:
         else:
             st.session_state.arquivos_atualizados.append(nome_arquivo)    
     @staticmethod
+    def converter_qvd(conversao, caminho, **parametros):
+        """
+        Executa uma conversão do ConversorQvdParquet (converter ou converter_particionado) mostrando o progresso da leitura.
+        :return: Retorno da conversão (linhas gravadas).
+        """
+        barra = st.progress(0.0, text="Lendo QVD...")
+        linhas = conversao(caminho, progresso=lambda fracao: barra.progress(fracao, text=f"Lendo QVD... {fracao:.0%}"), **parametros)
+        barra.empty()
+        return linhas
+
+    @staticmethod
     def atualzar_dados_ctc():
         st.write("### Atualizando dados CTC, atenção, isso pode demorar. Recomenda-se fechar outras aplicações e deixar apenas essa aba aberta.")
         if os.path.exists(Json.caminho_json_ctc):
@@ -8700,27 +9120,24 @@ class VariavelFuncoesPadrao:
             qvd = caminhos_atualizar_ctcs["dados_atualizar_ctc"]["path"]
             caminho_parquet = caminhos_atualizar_ctcs["dados_atualizar_ctc"]["path_output"]
             
-            st.write("### Carregando Dados do banco do B.I")
+            colunas = caminhos_atualizar_ctcs["dados_atualizar_ctc"].get("colunas_ctc", [])
             
-            # Carrega o QVD completo para manter todas as colunas
-            df = qvd_reader.read(qvd)
-
-            # Converte a coluna de data e filtra pelo ano selecionado pelo usuário
-            df["DataCTC"] = pd.to_datetime(df["DataCTC"], errors="coerce", dayfirst=True)
-            df_filtrado = df[df["DataCTC"].dt.year == ano_selecionado].copy()
-
-            # Verifica se o filtro resultou em dados para evitar criar um arquivo vazio
-            if df_filtrado.empty:
+            st.write("### Carregando Dados do banco do B.I e salvando arquivo Parquet otimizado para a aplicação...")
+            
+            # Lê o QVD em lotes: só as colunas configuradas e só as linhas do ano selecionado (DataCTC),
+            # e grava como dataset particionado (Ano=/Mês=): só a partição do ano selecionado é substituída
+            conversor = ConversorQvdParquet(qvd)
+            linhas = VariavelFuncoesPadrao.converter_qvd(conversor.converter_particionado, caminho_parquet,
+                                                         coluna_data="DataCTC", ano=ano_selecionado, colunas=colunas)
+
+            # Se o filtro não resultou em dados, o dataset anterior é mantido
+            if not linhas:
                 st.error(f"Nenhum dado encontrado para o ano {ano_selecionado}. O arquivo Parquet não foi atualizado.")
                 return
-
-            st.write("### Salvando arquivo Parquet otimizado para a aplicação...")
-            
-            df_filtrado.to_parquet(caminho_parquet, compression="snappy")
             
             st.write("### Dados Atualizados.")
 
-            todas_colunas = df_filtrado.columns.tolist()
+            todas_colunas = [c for c in conversor.colunas_saida(colunas) if c not in ConversorQvdParquet.PARTICOES]
 
             st.write("### Salvando informações das colunas no JSON...")
             if os.path.exists(Json.caminho_json_ctc_colunas):
@@ -8734,15 +9151,16 @@ class VariavelFuncoesPadrao:
             
             # Atualiza a lista de colunas no JSON e salva
             dados_colunas_existente["colunas_ctc_completa"]["Colunas"] = todas_colunas
+            # Períodos disponíveis (e linhas por período) do catálogo do dataset, sem ler os dados
+            if caminho_parquet == caminhos_atualizar_ctcs["dados_atualizar_parquet"]["path"]:
+                catalogo = ConversorQvdParquet.catalogo(caminho_parquet)
+                dados_colunas_existente["colunas_ano_mes"] = {ano: sorted(meses) for ano, meses in catalogo.items()}
+                dados_colunas_existente["linhas_ano_mes"] = catalogo
             with open(Json.caminho_json_ctc_colunas, "w", encoding="utf-8") as f:
                 json.dump(dados_colunas_existente, f, ensure_ascii=False, indent=4)
 
             st.success(f"### Atualização para o ano de {ano_selecionado} foi Finalizada :)")    
 
-            # Limpeza de memória
-            del df
-            del df_filtrado
-            gc.collect()
             
     @staticmethod
     def atualzar_dados_os():
@@ -8770,14 +9188,11 @@ class VariavelFuncoesPadrao:
             st.write("### Atualizando dados CTC, atenção, isso pode demorar. Recomenda-se fechar outras aplicações e deixar apenas essa aba aberta.")
             qvd = caminhos_atualizar_ctcs["dados_atualizar_ctc"]["path_os"]
             caminho_parquet = caminhos_atualizar_ctcs["dados_atualizar_ctc"]["path_os_output"]
+            colunas = caminhos_atualizar_ctcs["dados_atualizar_ctc"].get("colunas_os", [])
             
-            st.write("### Carregando Dados do banco do B.I")
-            
-            df = qvd_reader.read(qvd)
-
-            st.write("### Atualizando dados CTC para aplicação.")
+            st.write("### Carregando Dados do banco do B.I e atualizando dados CTC para aplicação.")
             
-            df.to_parquet(caminho_parquet, compression="snappy")
+            VariavelFuncoesPadrao.converter_qvd(ConversorQvdParquet(qvd).converter, caminho_parquet, colunas=colunas)
             
             st.write("### Dados Atualizados.")
     @staticmethod
@@ -8806,17 +9221,53 @@ class VariavelFuncoesPadrao:
             st.write("### Atualizando dados CTC, atenção, isso pode demorar. Recomenda-se fechar outras aplicações e deixar apenas essa aba aberta.")
             qvd = caminhos_atualizar_ctcs["dados_atualizar_ctc"]["path_base"]
             caminho_parquet = caminhos_atualizar_ctcs["dados_atualizar_ctc"]["path_base_output"]
+            colunas = caminhos_atualizar_ctcs["dados_atualizar_ctc"].get("colunas_base", [])
             
-            st.write("### Carregando Dados do banco do B.I")
+            st.write("### Carregando Dados do banco do B.I e atualizando dados CTC para aplicação.")
             
-            df = qvd_reader.read(qvd)
-
-            st.write("### Atualizando dados CTC para aplicação.")
-            
-            df.to_parquet(caminho_parquet, compression="snappy")
+            VariavelFuncoesPadrao.converter_qvd(ConversorQvdParquet(qvd).converter, caminho_parquet, colunas=colunas)
             
             st.write("### Dados Atualizados.")
     
+    @staticmethod
+    def ler_dataset_ctc(caminho, anos, meses, colunas=None, linhas=None, coluna_data="DataCTC"):
+        """
+        Lê do dataset CTC (particionado em Ano=/Mês= por ConversorQvdParquet.converter_particionado) só as
+        partições dos anos e meses pedidos e só as colunas pedidas. Ano e Mês vêm das pastas, como int64.
+        Um Parquet único antigo (sem partições) é lido inteiro e filtrado pela DataCTC, como antes.
+
+        :param colunas: Colunas a ler (as que existirem). Se None, todas.
+        :param linhas: Se informado, lê só as primeiras linhas (pré-visualização).
+        :param coluna_data: Só no Parquet único: coluna de data usada no lugar da DataCTC (renomeada para DataCTC).
+        """
+        particoes = ConversorQvdParquet.PARTICOES
+        particionamento = pds.partitioning(pa.schema([(c, pa.int64()) for c in particoes]), flavor="hive")
+        dataset = pds.dataset(caminho, format="parquet", partitioning=particionamento)
+
+        if os.path.isfile(caminho):
+            if coluna_data not in dataset.schema.names:
+                raise ValueError(f"Coluna de data '{coluna_data}' não encontrada em {caminho}. "
+                                 "Selecione uma coluna válida ou atualize os dados CTC.")
+            colunas_arquivo = None if colunas is None else \
+                [c for c in dataset.schema.names if c in colunas and c not in particoes] + [coluna_data]
+            df = dataset.to_table(columns=list(dict.fromkeys(colunas_arquivo)) if colunas_arquivo else None).to_pandas()
+            if coluna_data != "DataCTC":
+                df = df.drop(columns="DataCTC", errors="ignore").rename(columns={coluna_data: "DataCTC"})
+            df["DataCTC"] = pd.to_datetime(df["DataCTC"], errors="coerce", dayfirst=True)
+            df[particoes[0]] = df["DataCTC"].dt.year.astype(int)
+            df[particoes[1]] = df["DataCTC"].dt.month.astype(int)
+            df = df[df[particoes[0]].isin(anos) & df[particoes[1]].isin(meses)]
+            if colunas is not None:
+                df = df[[c for c in df.columns if c in colunas]]
+            return (df.head(linhas) if linhas else df).reset_index(drop=True)
+
+        if colunas is not None:
+            colunas = [c for c in dataset.schema.names if c in colunas]
+        filtro = pds.field(particoes[0]).isin(anos) & pds.field(particoes[1]).isin(meses)
+        if linhas:
+            return dataset.head(linhas, columns=colunas, filter=filtro).to_pandas()
+        return dataset.to_table(columns=colunas, filter=filtro).to_pandas()
+
     @staticmethod
     def update_arquivo_excel():
 
@@ -8866,28 +9317,27 @@ class VariavelFuncoesPadrao:
 
             mes_selecionado = st.multiselect("Selecione os Meses:", meses_disponiveis, default=meses_disponiveis)
 
-            if st.button("🔄 Continuar"):
-                caminho_parquet = atualzar_parquet["dados_atualizar_parquet"]["path"]
-                df = pd.read_parquet(caminho_parquet)
-
-                if "DataCTC" not in df.columns:
+            # Parquet único antigo (sem partições) sem DataCTC: o usuário escolhe a coluna de data
+            caminho_parquet = atualzar_parquet["dados_atualizar_parquet"]["path"]
+            coluna_data = "DataCTC"
+            if os.path.isfile(caminho_parquet):
+                colunas_arquivo = pq.read_schema(caminho_parquet).names
+                if coluna_data not in colunas_arquivo:
                     st.warning("Coluna nao encontrada, selecione uma coluna valida para atualizar")
-                    coluna_valida = st.selectbox("Colunas", df.columns)
-                    df = df.rename(columns={coluna_valida: "DataCTC"})
-
-                df["DataCTC"] = pd.to_datetime(df["DataCTC"], errors="coerce",dayfirst=True)
-                df["Ano"] = df["DataCTC"].dt.year.astype(int)
-                df["Mês"] = df["DataCTC"].dt.month.astype(int)
+                    coluna_data = st.selectbox("Colunas", colunas_arquivo)
 
-                #ano_selecionado = [int(ano) for ano in ano_selecionado]
-                #mes_selecionado = [int(mes) for mes in mes_selecionado]
-
-                df_filtrado = df[
-                    (df["Ano"].isin([int(ano) for ano in ano_selecionado])) &
-                    (df["Mês"].isin([int(mes) for mes in mes_selecionado]))
-                ].copy()
-
-                st.session_state["dados"] = df_filtrado
+            if st.button("🔄 Continuar"):
+                # Só as partições (Ano=/Mês=) selecionadas são lidas; aqui apenas uma amostra para a
+                # escolha de colunas, os dados completos são lidos depois, só com as colunas escolhidas
+                filtro_ctc = {
+                    "caminho": caminho_parquet,
+                    "anos": [int(ano) for ano in ano_selecionado],
+                    "meses": [int(mes) for mes in mes_selecionado],
+                    "coluna_data": coluna_data,
+                }
+                st.session_state["filtro_ctc"] = filtro_ctc
+                st.session_state["dados"] = VariavelFuncoesPadrao.ler_dataset_ctc(
+                    filtro_ctc["caminho"], filtro_ctc["anos"], filtro_ctc["meses"], linhas=25, coluna_data=coluna_data)
                 st.session_state["fase"] = "colunas"
                 st.rerun()
 
@@ -8932,6 +9382,10 @@ class VariavelFuncoesPadrao:
                 if colunas_indisponiveis:
                     st.warning(f"Colunas indisponíveis: {colunas_indisponiveis}")
 
+                filtro_ctc = st.session_state["filtro_ctc"]
+                df = VariavelFuncoesPadrao.ler_dataset_ctc(filtro_ctc["caminho"], filtro_ctc["anos"], filtro_ctc["meses"],
+                                                           colunas=colunas_disponiveis + ["Status Ocorrencia"],
+                                                           coluna_data=filtro_ctc["coluna_data"])
                 df = df[colunas_disponiveis].loc[df["Status Ocorrencia"] != "Cancelado"]
                 df = df.fillna("Desconsiderar")
 
@@ -9073,7 +9527,7 @@ class VariavelFuncoesPadrao:
                 df[col] = DataCleaner.clean_ctc(df, col)
                 df[col] = DataCleaner.remove_leading_zero_serie(df[col])
             
-            df["Valor Frete"] = df["Valor Frete"].apply(DataCleaner.clean_number)
+            df["Valor Frete"] = DataCleaner.clean_number_serie(df["Valor Frete"])
 
             st.session_state[nome_tabela] = df
             st.success("356 atualizada")
@@ -1,18 +1,38 @@
 import os
-import uuid
-import pandas as pd
+from werkzeug.wsgi import ClosingIterator
 from flask import (
     Blueprint, render_template, request, redirect, 
-    url_for, g, send_from_directory, flash
+    url_for, g, send_from_directory, flash, jsonify, session
 )
-# Importa as classes de serviço que contêm a "inteligência" do processamento
-from Services.DRE.ServicoRelatoriosDRE import ServicoRelatoriosDRE
-from Services.DRE.ServicoRelatoriosRateio import ServicoRelatoriosRateio
-from Config import CAMINHOS_ARQUIVOS
+# Importa os serviços que contêm a "inteligência" do processamento
+from Services.DRE.ServicoFilaJobs import ServicoFilaJobs
+from Services.DRE.ServicoProcessamentoDRE import executar_processamento_dre
+from Services.DRE.ServicoExportacaoRelatorios import FORMATOS_EXPORTACAO
+from Services.DRE.ServicoCacheResultados import obter_cache_resultados
+from Services.DRE.ServicoRetencaoDownloads import ServicoRetencaoDownloads
+from Config import CAMINHOS_ARQUIVOS, JOBS, RETENCAO_DOWNLOADS
 
 # Define onde os arquivos gerados serão salvos para o usuário baixar depois
 DOWNLOAD_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Downloads'))
 
+# Fila de jobs: o processamento roda em segundo plano e a página acompanha o progresso
+fila_jobs = ServicoFilaJobs(
+    JOBS["diretorio"],
+    max_workers=JOBS["max_workers"],
+    max_fila=JOBS["max_fila"],
+    modo=JOBS["modo"]
+)
+
+# Retenção da pasta de Downloads: idade máxima, limite de tamanho (LRU) e varredura em segundo plano
+# (a thread é iniciada pelo App.py na primeira requisição, não na importação)
+retencao_downloads = ServicoRetencaoDownloads(
+    DOWNLOAD_DIR,
+    max_idade=RETENCAO_DOWNLOADS["max_idade_horas"] * 3600 if RETENCAO_DOWNLOADS["max_idade_horas"] is not None else None,
+    max_bytes=RETENCAO_DOWNLOADS["max_bytes"],
+    idade_minima=RETENCAO_DOWNLOADS["idade_minima_segundos"],
+    intervalo=RETENCAO_DOWNLOADS["intervalo_segundos"]
+)
+
 # Cria o Blueprint (um módulo de rotas do Flask)
 dre_blueprint = Blueprint(
     'dre', 
@@ -25,62 +45,110 @@ def index():
     """
     Rota principal: Exibe a tela HTML (o formulário com o botão).
     """
-    return render_template('DRE_Rentabilidade.html')
+    # Se o usuário já iniciou um processamento, mostra o link para acompanhá-lo
+    ultimo_job = fila_jobs.status(session.get('ultimo_job'))
+    return render_template('DRE_Rentabilidade.html', ultimo_job=ultimo_job, formatos=FORMATOS_EXPORTACAO)
 
 @dre_blueprint.route('/processar', methods=['POST'])
 def processar_dre():
     """
     Rota de Ação: Ocorre quando o usuário clica em "Processar".
-    Aqui acontece a mágica de instanciar os serviços e gerar o Excel.
+    Apenas enfileira o job e redireciona para a página de acompanhamento;
+    o processamento em si roda em segundo plano (ServicoFilaJobs).
     """
     # 'g' é uma variável global do Flask válida apenas durante a requisição.
     # g.mapeamentos foi preenchido no App.py (middleware) para evitar recarregar o banco toda hora.
     if g.mapeamentos is None:
         flash("Erro crítico: Mapeamentos não puderam ser carregados do banco.", "error")
-        return render_template('DRE_Rentabilidade.html')
+        return render_template('DRE_Rentabilidade.html', formatos=FORMATOS_EXPORTACAO)
+
+    # Formato de saída: Excel (padrão) ou um formato colunar (Parquet, CSV.gz, Arrow), em .zip ou pasta
+    formato = request.form.get('formato', 'xlsx')
+    compactar = request.form.get('saida', 'zip') != 'pasta'
+    if formato not in FORMATOS_EXPORTACAO:
+        flash(f"Formato de saída inválido: {formato}", "error")
+        return render_template('DRE_Rentabilidade.html', formatos=FORMATOS_EXPORTACAO)
+
+    # Pedidos idênticos (mesmas entradas, De-Paras e formato) compartilham o mesmo job em andamento
+    chave = None
+    cache_resultados = obter_cache_resultados()
+    if cache_resultados is not None:
+        try:
+            chave = cache_resultados.chave(CAMINHOS_ARQUIVOS, g.mapeamentos, formato, compactar)
+        except FileNotFoundError:
+            chave = None # O job reporta o arquivo ausente
 
     try:
-        # 1. Instancia os serviços
-        # Passamos os mapeamentos (dados do banco) e os caminhos (configuração de onde estão os Excels)
-        rateio_service = ServicoRelatoriosRateio(g.mapeamentos, CAMINHOS_ARQUIVOS)
-        dre_service = ServicoRelatoriosDRE(g.mapeamentos, CAMINHOS_ARQUIVOS)
-
-        # 2. Executa a lógica principal
-        print("Iniciando processamento consolidado...")
-        # O método .consolidado() chama todas as funções internas e retorna um dicionário
-        # onde a Chave é o nome da Aba e o Valor é o DataFrame pronto.
-        relatorios = dre_service.consolidado(rateio_service)
-        
-        # 3. Salva o arquivo físico
-        # Gera um nome aleatório (uuid) para evitar que dois usuários sobrescrevam o arquivo um do outro
-        filename = f"DRE_Rentabilidade_{uuid.uuid4().hex[:8]}.xlsx"
-        filepath = os.path.join(DOWNLOAD_DIR, filename)
-        
-        print(f"Salvando relatórios em: {filepath}")
-        
-        # Usa o ExcelWriter para criar um arquivo com múltiplas abas
-        with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-            for nome_aba, df in relatorios.items():
-                if not df.empty:
-                    # O Excel limita nomes de aba a 31 caracteres, cortamos se for maior
-                    nome_aba_curto = nome_aba.replace("_", " ")[:31]
-                    df.to_excel(writer, sheet_name=nome_aba_curto, index=False)
-                else:
-                    print(f"Aba '{nome_aba}' está vazia, pulando.")
-        
-        print(f"Processamento concluído. Arquivo gerado: {filename}")
-        
-        # 4. Redireciona o navegador para a rota de download, passando o nome do arquivo gerado
-        return redirect(url_for('dre.download', filename=filename))
-
-    except Exception as e:
-        # Captura qualquer erro (arquivo não encontrado, coluna errada, banco fora)
-        print(f"ERRO NO PROCESSAMENTO: {e}")
-        import traceback
-        traceback.print_exc() # Mostra o erro detalhado no terminal
-        # flash() envia a mensagem de erro para aparecer no topo do HTML
-        flash(f"Ocorreu um erro: {e}", "error")
-        return render_template('DRE_Rentabilidade.html')
+        # O job recebe o snapshot atual dos mapeamentos (o 'g' não existe fora da requisição)
+        job_id = fila_jobs.enfileirar(
+            executar_processamento_dre,
+            g.mapeamentos, CAMINHOS_ARQUIVOS, DOWNLOAD_DIR,
+            formato=formato, compactar=compactar,
+            descricao=f"DRE Rentabilidade ({FORMATOS_EXPORTACAO[formato][0]})",
+            chave=chave
+        )
+    except RuntimeError as e:
+        # Fila cheia
+        flash(str(e), "error")
+        return render_template('DRE_Rentabilidade.html', formatos=FORMATOS_EXPORTACAO)
+
+    session['ultimo_job'] = job_id
+    return redirect(url_for('dre.acompanhar_job', job_id=job_id))
+
+@dre_blueprint.route('/jobs/<job_id>')
+def acompanhar_job(job_id):
+    """
+    Página de acompanhamento: consulta /jobs/<id>/status periodicamente
+    e mostra o link de download quando o job termina.
+    """
+    job = fila_jobs.status(job_id)
+    if job is None:
+        flash("Processamento não encontrado.", "error")
+        return redirect(url_for('dre.index'))
+    return render_template('DRE_Job.html', job=job)
+
+@dre_blueprint.route('/jobs/<job_id>/status')
+def status_job(job_id):
+    """
+    Rota JSON: estado, etapa atual, percentual e link de download do job.
+    """
+    job = fila_jobs.status(job_id)
+    if job is None:
+        return jsonify({"erro": "Job não encontrado."}), 404
+
+    if job["estado"] == ServicoFilaJobs.CONCLUIDO and job["resultado"]:
+        # Saída em pasta (formatos colunares sem .zip) tem um arquivo para download por relatório
+        arquivos = job["resultado"].get("arquivos") or [job["resultado"]["arquivo"]]
+        job["downloads"] = [{"nome": arquivo, "url": url_for('dre.download', filename=arquivo)} for arquivo in arquivos]
+        job["download_url"] = job["downloads"][0]["url"]
+    return jsonify(job)
+
+@dre_blueprint.route('/metricas')
+def metricas():
+    """
+    Rota JSON: métricas por etapa (tempo, CPU, memória, linhas) dos processamentos mais recentes.
+    """
+    limite = request.args.get('limite', default=20, type=int)
+    jobs = []
+    for job in fila_jobs.listar()[:limite]:
+        resultado = job.get("resultado") or {}
+        jobs.append({
+            "id": job["id"],
+            "estado": job["estado"],
+            "criado_em": job["criado_em"],
+            "iniciado_em": job["iniciado_em"],
+            "finalizado_em": job["finalizado_em"],
+            "reaproveitado": resultado.get("reaproveitado", False),
+            "etapas": resultado.get("metricas", []),
+        })
+    return jsonify(jobs)
+
+@dre_blueprint.route('/downloads')
+def inventario_downloads():
+    """
+    Rota JSON: arquivos da pasta de Downloads (tamanho, criação, último acesso, expiração).
+    """
+    return jsonify(retencao_downloads.inventario())
 
 @dre_blueprint.route('/download/<path:filename>')
 def download(filename):
@@ -88,13 +156,25 @@ def download(filename):
     Rota de Download: Entrega o arquivo físico para o browser do usuário.
     """
     print(f"Tentando enviar o arquivo: {filename} do diretório: {DOWNLOAD_DIR}")
+    # Arquivo removido pela retenção (ou inexistente): falha na hora, com a mensagem do motivo
+    erro = retencao_downloads.verificar(filename)
+    if erro:
+        flash(erro, "error")
+        return redirect(url_for('dre.index'))
+
+    # Enquanto o envio não termina, o arquivo não pode ser removido pela varredura
+    marcador = retencao_downloads.iniciar_download(filename)
     try:
         # send_from_directory é uma função segura do Flask para enviar arquivos
-        return send_from_directory(
+        resposta = send_from_directory(
             DOWNLOAD_DIR,
             filename,
             as_attachment=True # Força o download ao invés de tentar abrir no navegador
         )
-    except FileNotFoundError:
-        flash("Erro: Arquivo não encontrado no servidor.", "error")
-        return redirect(url_for('dre.index'))
\ No newline at end of file
+    except Exception:
+        retencao_downloads.finalizar_download(marcador)
+        raise
+    # O envio é feito depois que a rota retorna: libera o arquivo quando o servidor fechar o corpo da resposta
+    # (call_on_close não é chamado em respostas de arquivo, que vão direto para o servidor)
+    resposta.response = ClosingIterator(resposta.response, lambda: retencao_downloads.finalizar_download(marcador))
+    return resposta
\ No newline at end of file
@@ -0,0 +1,346 @@
+import os
+import json
+import glob
+import base64
+import pickle
+import hashlib
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from Config import CACHE_ARQUIVOS
+from .ServicoLeitorExcel import ServicoLeitorExcel, tipar_texto
+
+
+class ServicoCacheArquivos:
+    """
+    Cache de ingestão dos arquivos Excel definidos em Config.CAMINHOS_ARQUIVOS.
+
+    Cada leitura (arquivo + aba + header + colunas) vira uma entrada Parquet no disco.
+    A entrada é identificada pela "impressão digital" da origem (caminho, tamanho,
+    data de modificação e, opcionalmente, o hash do conteúdo). Se o arquivo não mudou,
+    o DataFrame é carregado do Parquet em milissegundos; se mudou, o Excel é lido
+    novamente e a entrada antiga daquele arquivo/aba é descartada.
+
+    Abas com cabeçalho de uma linha são lidas em streaming (ServicoLeitorExcel), só com as
+    colunas pedidas; as demais (ex: cabeçalho duplo da Ocupação) passam pelo pd.read_excel.
+    """
+
+    EXTENSAO = ".parquet"
+    CHAVE_METADADOS = b"t_core_cache"
+
+    def __init__(self, diretorio, max_bytes=2 * 1024 ** 3, hash_conteudo=False, leitor=None):
+        """
+        :param diretorio: Pasta onde os arquivos Parquet do cache são gravados.
+        :param max_bytes: Tamanho máximo total do cache. Acima disso, as entradas menos usadas são removidas.
+        :param hash_conteudo: Se True, usa o SHA-256 do conteúdo do arquivo na impressão digital (mais seguro, porém lê o arquivo inteiro).
+        :param leitor: ServicoLeitorExcel usado nas leituras da origem. Se None, sempre usa o pd.read_excel.
+        """
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self.hash_conteudo = hash_conteudo
+        self.leitor = leitor
+
+        # Contadores de uso (por processo)
+        self.hits = 0
+        self.misses = 0
+        self.falhas_gravacao = 0
+
+        self._lock = threading.Lock()
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Impressão digital e nomes das entradas
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _hash(valor):
+        return hashlib.sha256(json.dumps(valor, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+        sha = hashlib.sha256()
+        with open(caminho, "rb") as f:
+            for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+                sha.update(bloco)
+        return sha.hexdigest()
+
+    def impressao_digital(self, caminho, sheet_name=0, header=0, colunas=None, colunas_str=None):
+        """
+        Retorna o dicionário que identifica unicamente uma leitura de arquivo.
+        Lança FileNotFoundError se o arquivo não existir.
+        """
+        caminho = os.path.abspath(caminho)
+        stat = os.stat(caminho)
+        return {
+            "caminho": caminho,
+            "tamanho": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "conteudo": self._hash_arquivo(caminho) if self.hash_conteudo else None,
+            "sheet_name": sheet_name,
+            "header": header,
+            "colunas": sorted(str(c).upper().strip() for c in colunas) if colunas else None,
+            "colunas_str": sorted(str(c).strip() for c in colunas_str) if colunas_str else None,
+        }
+
+    def _prefixo_arquivo(self, caminho):
+        return self._hash(os.path.abspath(caminho))
+
+    def _nome_entrada(self, digital):
+        # <arquivo>_<leitura>_<versão>: permite invalidar por arquivo e descartar versões antigas da mesma leitura
+        leitura = self._hash([digital["sheet_name"], digital["header"], digital["colunas"], digital["colunas_str"]])
+        if digital["conteudo"]:
+            versao = digital["conteudo"][:16]
+        else:
+            versao = self._hash([digital["tamanho"], digital["mtime_ns"]])
+        return f"{self._prefixo_arquivo(digital['caminho'])}_{leitura}_{versao}{self.EXTENSAO}"
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def ler_excel(self, caminho, sheet_name=0, header=0, colunas=None, colunas_str=None):
+        """
+        Lê uma aba de um arquivo Excel passando pelo cache.
+
+        Se o caminho terminar em '.parquet', a origem já é colunar e é lida direto, sem cache:
+        um arquivo único, ou uma pasta com um '<aba>.parquet' por aba (o 'header' é ignorado).
+
+        :param caminho: Caminho do arquivo Excel.
+        :param sheet_name: Nome (ou índice) da aba.
+        :param header: Linha(s) de cabeçalho, como no pd.read_excel.
+        :param colunas: Lista opcional de colunas a manter (comparação sem diferenciar maiúsculas/espaços).
+        :param colunas_str: Colunas convertidas para texto já na leitura (ver ServicoLeitorExcel.tipar_texto);
+                            o cache guarda o resultado já convertido (categórico).
+        :return: DataFrame com as colunas podadas.
+        """
+        if self._origem_parquet(caminho):
+            return tipar_texto(self._ler_origem_parquet(caminho, sheet_name, colunas), colunas_str or [])
+
+        digital = self.impressao_digital(caminho, sheet_name, header, colunas, colunas_str)
+        nome = self._nome_entrada(digital)
+        caminho_entrada = os.path.join(self.diretorio, nome)
+
+        if os.path.exists(caminho_entrada):
+            try:
+                df = self._ler_parquet(caminho_entrada)
+                os.utime(caminho_entrada)  # Marca como usado recentemente (LRU)
+                with self._lock:
+                    self.hits += 1
+                return df
+            except Exception as e:
+                # Entrada corrompida ou removida no meio da leitura: relê a origem
+                print(f"AVISO: Entrada de cache inválida ({nome}): {e}")
+
+        with self._lock:
+            self.misses += 1
+
+        print(f"  - Cache: lendo '{os.path.basename(caminho)}' (aba: {sheet_name}) da origem...")
+        df = tipar_texto(self._ler_origem(caminho, sheet_name, header, colunas), colunas_str or [])
+        self._gravar(df, digital, caminho_entrada)
+        return df
+
+    def _ler_origem(self, caminho, sheet_name, header, colunas):
+        if self.leitor is not None and self.leitor.suporta(caminho, header, colunas):
+            return self.leitor.ler_aba(caminho, sheet_name=sheet_name, header=header, colunas=colunas)
+
+        excel_file = pd.ExcelFile(caminho)
+        if isinstance(sheet_name, str) and sheet_name not in excel_file.sheet_names:
+            raise ValueError(f"Aba '{sheet_name}' não encontrada no arquivo '{caminho}'.")
+
+        usecols = None
+        if colunas:
+            colunas_upper = {str(c).upper().strip() for c in colunas}
+            usecols = lambda col: str(col).upper().strip() in colunas_upper
+
+        return pd.read_excel(excel_file, sheet_name=sheet_name, header=header, usecols=usecols)
+
+    @staticmethod
+    def _origem_parquet(caminho):
+        return str(caminho).lower().endswith(".parquet")
+
+    @staticmethod
+    def _ler_origem_parquet(caminho, sheet_name, colunas):
+        arquivo = caminho
+        if os.path.isdir(caminho):
+            if isinstance(sheet_name, str):
+                arquivo = os.path.join(caminho, f"{sheet_name}.parquet")
+            else:
+                abas = sorted(glob.glob(os.path.join(caminho, "*.parquet")))
+                arquivo = abas[sheet_name] if sheet_name < len(abas) else ""
+            if not os.path.isfile(arquivo):
+                raise ValueError(f"Aba '{sheet_name}' não encontrada no arquivo '{caminho}'.")
+        elif not os.path.isfile(caminho):
+            raise FileNotFoundError(caminho)
+
+        selecionadas = None
+        if colunas:
+            colunas_upper = {str(c).upper().strip() for c in colunas}
+            selecionadas = [c for c in pq.read_schema(arquivo).names if str(c).upper().strip() in colunas_upper]
+        return pd.read_parquet(arquivo, columns=selecionadas)
+
+    # ------------------------------------------------------------------
+    # Serialização Parquet
+    # ------------------------------------------------------------------
+
+    def _gravar(self, df, digital, caminho_entrada):
+        try:
+            gravar_dataframe_parquet(df, caminho_entrada, {"origem": digital}, self.CHAVE_METADADOS)
+        except Exception as e:
+            with self._lock:
+                self.falhas_gravacao += 1
+            print(f"AVISO: Não foi possível gravar o cache de '{digital['caminho']}': {e}")
+            return
+
+        self._remover_versoes_antigas(caminho_entrada)
+        self._aplicar_limite()
+
+    def _ler_parquet(self, caminho_entrada):
+        return ler_dataframe_parquet(caminho_entrada, self.CHAVE_METADADOS)[0]
+
+    # ------------------------------------------------------------------
+    # Manutenção: versões antigas, limite de tamanho e invalidação
+    # ------------------------------------------------------------------
+
+    def _remover_versoes_antigas(self, caminho_entrada):
+        # Mesmo arquivo + mesma leitura, versão diferente => entrada obsoleta
+        prefixo = os.path.basename(caminho_entrada).rsplit("_", 1)[0]
+        for antigo in glob.glob(os.path.join(self.diretorio, f"{prefixo}_*{self.EXTENSAO}")):
+            if antigo != caminho_entrada:
+                self._remover(antigo)
+
+    @staticmethod
+    def _remover(caminho_entrada):
+        try:
+            os.remove(caminho_entrada)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _listar_entradas(self):
+        entradas = []
+        for caminho_entrada in glob.glob(os.path.join(self.diretorio, f"*{self.EXTENSAO}")):
+            try:
+                stat = os.stat(caminho_entrada)
+            except FileNotFoundError:
+                continue
+            entradas.append((stat.st_mtime, stat.st_size, caminho_entrada))
+        return entradas
+
+    def _aplicar_limite(self):
+        """
+        Remove as entradas usadas há mais tempo até o total ficar abaixo de max_bytes.
+        """
+        entradas = sorted(self._listar_entradas())
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, caminho_entrada in entradas:
+            if total <= self.max_bytes:
+                break
+            if self._remover(caminho_entrada):
+                print(f"  - Cache: removendo entrada antiga {os.path.basename(caminho_entrada)}")
+            total -= tamanho
+
+    def invalidar(self, caminho=None):
+        """
+        Remove entradas do cache.
+        :param caminho: Se informado, remove apenas as entradas daquele arquivo; caso contrário, limpa tudo.
+        :return: Quantidade de entradas removidas.
+        """
+        padrao = f"{self._prefixo_arquivo(caminho)}_*{self.EXTENSAO}" if caminho else f"*{self.EXTENSAO}"
+        removidas = 0
+        for caminho_entrada in glob.glob(os.path.join(self.diretorio, padrao)):
+            removidas += self._remover(caminho_entrada)
+        return removidas
+
+    def estatisticas(self):
+        """
+        Retorna contadores de uso e ocupação do cache.
+        """
+        entradas = self._listar_entradas()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "falhas_gravacao": self.falhas_gravacao,
+            "entradas": len(entradas),
+            "bytes": sum(tamanho for _, tamanho, _ in entradas),
+            "max_bytes": self.max_bytes,
+        }
+
+
+# --- Serialização Parquet (também usada pelo repositório de partições do Razão) ---
+
+def _coluna_mista(serie):
+    # Colunas 'object' (ou categóricas) com tipos misturados (ex: 123 e "ABC") não são aceitas pelo Arrow
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.cat.categories.to_series()
+    return serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True) not in ("string", "empty")
+
+
+def gravar_dataframe_parquet(df, caminho, metadados=None, chave_metadados=ServicoCacheArquivos.CHAVE_METADADOS):
+    """
+    Grava o DataFrame em Parquet preservando os rótulos originais das colunas (tuplas de MultiIndex,
+    datas) e colunas 'object' com tipos misturados (gravadas valor a valor com pickle).
+    A troca do arquivo é atômica (seguro entre processos).
+    :param metadados: Dicionário (JSON) extra, guardado junto com o esquema.
+    """
+    # Os rótulos originais vão nos metadados; no Parquet as colunas ficam com nomes posicionais.
+    df_posicional = df.copy(deep=False)
+    df_posicional.columns = [f"c{i}" for i in range(df.shape[1])]
+
+    colunas_pickle = []
+    for i, col in enumerate(df_posicional.columns):
+        if _coluna_mista(df_posicional[col]):
+            df_posicional[col] = [pickle.dumps(v) for v in df_posicional[col]]
+            colunas_pickle.append(i)
+
+    tabela = pa.Table.from_pandas(df_posicional, preserve_index=False)
+    metadados_esquema = dict(tabela.schema.metadata or {})
+    metadados_esquema[chave_metadados] = json.dumps({
+        **(metadados or {}),
+        "colunas": base64.b64encode(pickle.dumps(df.columns)).decode("ascii"),
+        "colunas_pickle": colunas_pickle,
+    }, default=str).encode("utf-8")
+    tabela = tabela.replace_schema_metadata(metadados_esquema)
+
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        pq.write_table(tabela, temporario)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def ler_dataframe_parquet(caminho, chave_metadados=ServicoCacheArquivos.CHAVE_METADADOS):
+    """
+    Lê um arquivo gravado por gravar_dataframe_parquet.
+    :return: (DataFrame, metadados).
+    """
+    tabela = pq.read_table(caminho)
+    info = json.loads(tabela.schema.metadata[chave_metadados])
+    df = tabela.to_pandas()
+    for i in info["colunas_pickle"]:
+        df.iloc[:, i] = [pickle.loads(v) for v in df.iloc[:, i]]
+    df.columns = pickle.loads(base64.b64decode(info["colunas"]))
+    return df, info
+
+
+_cache_padrao = None
+_lock_cache_padrao = threading.Lock()
+
+
+def obter_cache_arquivos():
+    """
+    Retorna a instância compartilhada do cache, configurada por Config.CACHE_ARQUIVOS.
+    """
+    global _cache_padrao
+    with _lock_cache_padrao:
+        if _cache_padrao is None:
+            leitura = CACHE_ARQUIVOS.get("leitura", {"streaming": False, "motor": None})
+            _cache_padrao = ServicoCacheArquivos(
+                CACHE_ARQUIVOS["diretorio"],
+                max_bytes=CACHE_ARQUIVOS["max_bytes"],
+                hash_conteudo=CACHE_ARQUIVOS["hash_conteudo"],
+                leitor=ServicoLeitorExcel(leitura["motor"]) if leitura["streaming"] else None,
+            )
+        return _cache_padrao
@@ -0,0 +1,274 @@
+import os
+import glob
+import json
+import hashlib
+import threading
+import weakref
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+from Config import CACHE_RESULTADOS
+from .ServicoCacheArquivos import obter_cache_arquivos
+
+
+def _hash(valor):
+    return hashlib.sha256(json.dumps(valor, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+# --- Versões do código e do snapshot de De-Paras (também usadas pelas partições do Razão) ---
+_versao_codigo = None
+# Hash por tabela De-Para: id() -> (referência fraca, hash). Tabelas que não mudaram
+# entre snapshots mantêm o mesmo objeto e não são recalculadas (como os índices De-Para).
+_hashes_tabelas = {}
+_lock_versoes = threading.Lock()
+
+
+def versao_codigo():
+    """
+    Hash dos fontes que definem o resultado (Services/DRE/*.py, Config.py com as regras e colunas,
+    Db/*.py com a carga dos De-Paras) e das bibliotecas usadas no cálculo.
+    """
+    global _versao_codigo
+    if _versao_codigo is None:
+        raiz = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        fontes = glob.glob(os.path.join(raiz, "Services", "DRE", "*.py")) + glob.glob(os.path.join(raiz, "Db", "*.py"))
+        fontes.append(os.path.join(raiz, "Config.py"))
+
+        sha = hashlib.sha256(f"pandas={pd.__version__};pyarrow={pa.__version__}".encode("utf-8"))
+        for fonte in sorted(fontes):
+            sha.update(os.path.relpath(fonte, raiz).replace(os.sep, "/").encode("utf-8"))
+            with open(fonte, "rb") as f:
+                sha.update(f.read())
+        _versao_codigo = sha.hexdigest()[:16]
+    return _versao_codigo
+
+
+def _hash_tabela(df):
+    with _lock_versoes:
+        item = _hashes_tabelas.get(id(df))
+        if item is not None and item[0]() is df:
+            return item[1]
+
+    sha = hashlib.sha256(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+    sha.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    valor = sha.hexdigest()[:16]
+
+    with _lock_versoes:
+        # Descarta entradas de DataFrames que já foram coletados
+        for chave in [c for c, (ref, _) in _hashes_tabelas.items() if ref() is None]:
+            del _hashes_tabelas[chave]
+        _hashes_tabelas[id(df)] = (weakref.ref(df), valor)
+    return valor
+
+
+def versao_mapeamentos(mapeamentos):
+    """
+    Hash do snapshot de De-Paras (conteúdo de todas as tabelas).
+    """
+    return _hash({nome: _hash_tabela(df) for nome, df in mapeamentos.items()})[:16]
+
+
+class ServicoCacheResultados:
+    """
+    Memoização dos resultados do "Processar".
+
+    Dois processamentos com os mesmos arquivos de entrada, o mesmo snapshot de De-Paras e a
+    mesma versão do código geram relatórios idênticos. A chave do resultado é o hash de:
+      - a impressão digital de cada arquivo de Config.CAMINHOS_ARQUIVOS (caminho, tamanho,
+        data de modificação e, com hash_conteudo, o SHA-256) e seus parâmetros de leitura;
+      - a versão do snapshot de mapeamentos (hash do conteúdo de cada tabela De-Para);
+      - a versão do código (hash dos fontes de Services/DRE e das versões de pandas/pyarrow);
+      - o formato de saída.
+    Cada resultado vira um manifesto JSON (<chave>.json) apontando para os arquivos já gravados
+    em Downloads. Os arquivos pertencem à retenção de Downloads (ServicoRetencaoDownloads), que é
+    a única a removê-los; aqui só se removem manifestos cujos arquivos já não existem.
+    """
+
+    EXTENSAO = ".json"
+
+    def __init__(self, diretorio):
+        """
+        :param diretorio: Pasta dos manifestos (os arquivos em si ficam na pasta de Downloads).
+        """
+        self.diretorio = diretorio
+
+        # Contadores de uso (por processo)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Chave do resultado
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _digital_entrada(caminho):
+        # Pasta (origem Parquet com um arquivo por aba): impressão digital de cada arquivo
+        if os.path.isdir(caminho):
+            arquivos = sorted(glob.glob(os.path.join(caminho, "*")))
+            return [obter_cache_arquivos().impressao_digital(arquivo) for arquivo in arquivos if os.path.isfile(arquivo)]
+        return obter_cache_arquivos().impressao_digital(caminho)
+
+    def chave(self, caminhos, mapeamentos, formato="xlsx", compactar=True):
+        """
+        Calcula a chave do resultado.
+        :raises FileNotFoundError: Se algum arquivo de entrada não existir.
+        """
+        entradas = {nome: {"parametros": parametros, "digital": self._digital_entrada(parametros["path"])}
+                    for nome, parametros in caminhos.items()}
+        return _hash({
+            "entradas": entradas,
+            "mapeamentos": versao_mapeamentos(mapeamentos),
+            "codigo": versao_codigo(),
+            "formato": formato,
+            "compactar": compactar,
+        })[:32]
+
+    # ------------------------------------------------------------------
+    # Leitura e registro
+    # ------------------------------------------------------------------
+
+    def _caminho_manifesto(self, chave):
+        return os.path.join(self.diretorio, f"{chave}{self.EXTENSAO}")
+
+    @staticmethod
+    def _ler_manifesto(caminho_manifesto):
+        try:
+            with open(caminho_manifesto, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def obter(self, chave, diretorio_saida):
+        """
+        Retorna o resultado memoizado (dicionário do job, com "reaproveitado": True) ou None.
+        O resultado só é válido se todos os seus arquivos ainda existirem em diretorio_saida.
+        Num acerto, a data dos arquivos é renovada: a retenção de Downloads conta a idade a partir
+        dela, e o link devolvido tem o mesmo prazo de um arquivo recém-gerado.
+        """
+        caminho_manifesto = self._caminho_manifesto(chave)
+        manifesto = self._ler_manifesto(caminho_manifesto)
+        if manifesto is None or not self._renovar(diretorio_saida, manifesto["arquivos"]):
+            if manifesto is not None:
+                self._remover(caminho_manifesto)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return {**manifesto["resultado"], "reaproveitado": True, "gerado_em": manifesto["criado_em"]}
+
+    @staticmethod
+    def _renovar(diretorio_saida, arquivos):
+        """
+        Atualiza a data (mtime e atime) de cada artefato de Downloads do resultado: o arquivo, ou a
+        pasta de primeiro nível nos formatos com um arquivo por relatório.
+        :return: False se algum arquivo não existir mais (removido pela retenção).
+        """
+        artefatos = {a.replace("\\", "/").split("/", 1)[0] for a in arquivos}
+        try:
+            for artefato in artefatos:
+                os.utime(os.path.join(diretorio_saida, artefato))
+        except FileNotFoundError:
+            return False
+        # Conferido depois de renovar: uma varredura concorrente não remove mais o que foi renovado
+        return all(os.path.isfile(os.path.join(diretorio_saida, a)) for a in arquivos)
+
+    def registrar(self, chave, resultado, diretorio_saida):
+        """
+        Memoiza o resultado de um job concluído (os arquivos já devem estar em diretorio_saida).
+        """
+        arquivos = resultado.get("arquivos") or [resultado["arquivo"]]
+        manifesto = {
+            "chave": chave,
+            "criado_em": datetime.now().isoformat(timespec="seconds"),
+            "diretorio_saida": os.path.abspath(diretorio_saida),
+            "arquivos": arquivos,
+            "bytes": sum(os.path.getsize(os.path.join(diretorio_saida, a)) for a in arquivos),
+            "resultado": resultado,
+        }
+        # Grava em arquivo temporário e troca atomicamente (seguro entre processos)
+        caminho_manifesto = self._caminho_manifesto(chave)
+        temporario = f"{caminho_manifesto}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(manifesto, f, ensure_ascii=False, default=str)
+        os.replace(temporario, caminho_manifesto)
+        self._limpar_orfaos()
+
+    # ------------------------------------------------------------------
+    # Limpeza e invalidação
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _remover(caminho_manifesto):
+        # Só o manifesto: os arquivos em Downloads ficam a cargo da retenção
+        try:
+            os.remove(caminho_manifesto)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _listar_entradas(self):
+        entradas = []
+        for caminho_manifesto in glob.glob(os.path.join(self.diretorio, f"*{self.EXTENSAO}")):
+            manifesto = self._ler_manifesto(caminho_manifesto)
+            try:
+                mtime = os.stat(caminho_manifesto).st_mtime
+            except FileNotFoundError:
+                continue
+            entradas.append((mtime, manifesto["bytes"] if manifesto else 0, caminho_manifesto, manifesto))
+        return entradas
+
+    def _limpar_orfaos(self):
+        """
+        Remove os manifestos cujos arquivos já foram removidos de Downloads pela retenção.
+        """
+        for _, _, caminho_manifesto, manifesto in self._listar_entradas():
+            if manifesto is None:
+                continue
+            if not all(os.path.isfile(os.path.join(manifesto["diretorio_saida"], a)) for a in manifesto["arquivos"]):
+                if self._remover(caminho_manifesto):
+                    print(f"  - Cache de resultados: esquecendo {', '.join(manifesto['arquivos'])} (removido de Downloads)")
+
+    def invalidar(self):
+        """
+        Esquece todos os resultados memoizados (os arquivos em Downloads são mantidos).
+        :return: Quantidade de manifestos removidos.
+        """
+        removidos = 0
+        for caminho_manifesto in glob.glob(os.path.join(self.diretorio, f"*{self.EXTENSAO}")):
+            removidos += self._remover(caminho_manifesto)
+        return removidos
+
+    def estatisticas(self):
+        """
+        Retorna contadores de uso e ocupação do cache.
+        """
+        entradas = self._listar_entradas()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entradas": len(entradas),
+            "bytes": sum(tamanho for _, tamanho, _, _ in entradas),
+        }
+
+
+_cache_padrao = None
+_lock_cache_padrao = threading.Lock()
+
+
+def obter_cache_resultados():
+    """
+    Retorna a instância compartilhada do cache, configurada por Config.CACHE_RESULTADOS
+    (None se a memoização estiver desligada).
+    """
+    global _cache_padrao
+    if not CACHE_RESULTADOS["ativo"]:
+        return None
+    with _lock_cache_padrao:
+        if _cache_padrao is None:
+            _cache_padrao = ServicoCacheResultados(CACHE_RESULTADOS["diretorio"])
+        return _cache_padrao
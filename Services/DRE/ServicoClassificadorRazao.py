@@ -0,0 +1,413 @@
+import numpy as np
+import pandas as pd
+from .ServicoIndiceDePara import obter_indice_de_para
+from .ServicoEsquemaDimensoes import categorizar
+
+# Colunas de agrupamento de todas as tabelas de saída do Razão
+COLUNAS_SAIDA = ["Tabela", "Ano", "Mês", "Filial UF", "Area", "Grupo", "Item"]
+
+# Regra manual de De-Para para ISS (Item -> UF)
+MAPA_FILIAL_ISS = {"10802": "GO", "10302": "SP", "10702": "RJ", "11002": "SC"}
+
+
+def identificador_sql(nome):
+    """
+    Nome de coluna entre aspas duplas, para SQL (motor DuckDB).
+    """
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+def literal_sql(valor):
+    """
+    Texto fixo como literal SQL.
+    """
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+def valor_sql(fonte, coluna_sql):
+    """
+    Expressão SQL de uma saída de regra (texto fixo, Coluna(...) ou Mapeado(...)).
+    :param coluna_sql: Função nome da coluna do Razão -> expressão SQL.
+    """
+    if isinstance(fonte, str):
+        return literal_sql(fonte)
+    return fonte.sql(coluna_sql)
+
+
+class Coluna:
+    """
+    Indica que o valor de saída vem de uma coluna do Razão (e não de um texto fixo).
+    """
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.colunas = [nome]
+
+    def sql(self, coluna_sql):
+        return coluna_sql(self.nome)
+
+
+class Mapeado:
+    """
+    Valor de saída: a coluna 'origem' traduzida pelo dicionário 'mapa'; sem tradução, vale a coluna 'padrao'.
+    """
+
+    def __init__(self, origem, mapa, padrao):
+        self.origem = origem
+        self.mapa = mapa
+        self.padrao = padrao
+        self.colunas = [origem, padrao]
+
+    def __call__(self, df):
+        return df[self.origem].astype(object).map(self.mapa).fillna(df[self.padrao].astype(object))
+
+    def sql(self, coluna_sql):
+        casos = " ".join(f"WHEN {literal_sql(chave)} THEN {literal_sql(valor)}" for chave, valor in self.mapa.items())
+        return f"CASE {coluna_sql(self.origem)} {casos} ELSE {coluna_sql(self.padrao)} END"
+
+
+# --- Condições das regras ---
+# Cada condição é avaliada sobre o DataFrame (máscara booleana) ou traduzida para SQL (motor DuckDB).
+# Atenção: comparações com '!=' são verdadeiras para valores nulos (NaN), exatamente como nas máscaras originais;
+# '==' e isin são falsas. No SQL: IS DISTINCT FROM / IS NOT DISTINCT FROM e IN sem nulos.
+
+class Condicao:
+    """
+    Base das condições. 'a & b' combina duas condições (ambas verdadeiras).
+    """
+
+    colunas = []
+
+    def __and__(self, outra):
+        return Todas(self, outra)
+
+
+class Igual(Condicao):
+    def __init__(self, coluna, valor):
+        self.coluna, self.valor = coluna, valor
+        self.colunas = [coluna]
+
+    def __call__(self, df):
+        return df[self.coluna] == self.valor
+
+    def sql(self, coluna_sql):
+        return f"({coluna_sql(self.coluna)} IS NOT DISTINCT FROM {literal_sql(self.valor)})"
+
+
+class Diferente(Condicao):
+    def __init__(self, coluna, valor):
+        self.coluna, self.valor = coluna, valor
+        self.colunas = [coluna]
+
+    def __call__(self, df):
+        return df[self.coluna] != self.valor
+
+    def sql(self, coluna_sql):
+        return f"({coluna_sql(self.coluna)} IS DISTINCT FROM {literal_sql(self.valor)})"
+
+
+class Em(Condicao):
+    def __init__(self, coluna, valores):
+        self.coluna, self.valores = coluna, list(valores)
+        self.colunas = [coluna]
+
+    def __call__(self, df):
+        return df[self.coluna].isin(self.valores)
+
+    def sql(self, coluna_sql):
+        return f"COALESCE({coluna_sql(self.coluna)} IN ({', '.join(literal_sql(v) for v in self.valores)}), FALSE)"
+
+
+class Todas(Condicao):
+    def __init__(self, *condicoes):
+        self.condicoes = [parte for condicao in condicoes
+                          for parte in (condicao.condicoes if isinstance(condicao, Todas) else [condicao])]
+        self.colunas = [coluna for condicao in self.condicoes for coluna in condicao.colunas]
+
+    def __call__(self, df):
+        mascara = self.condicoes[0](df)
+        for condicao in self.condicoes[1:]:
+            mascara = mascara & condicao(df)
+        return mascara
+
+    def sql(self, coluna_sql):
+        return "(" + " AND ".join(condicao.sql(coluna_sql) for condicao in self.condicoes) + ")"
+
+
+# --- Condições reutilizadas nas regras ---
+_farma_direto = Diferente("sigla", "Desconhecido")
+_farma_indireto = Igual("sigla", "Desconhecido")
+_oper_armazem = Igual("centro_custo_desc", "Operação Armazenagem")
+_outros_armazem = Diferente("centro_custo_desc", "Operação Armazenagem")
+
+def _grupo(*grupos):
+    return Em("grupo", grupos)
+
+_filial_iss = Mapeado("Item", MAPA_FILIAL_ISS, padrao="filial_uf")
+
+
+# Lista ORDENADA de regras: cada linha do Razão recebe a PRIMEIRA regra cuja condição é verdadeira.
+# "condicao" é uma Condicao (Igual, Diferente, Em, combinadas com &); None = sempre verdadeira.
+# "saida" define as colunas da tabela de saída (texto fixo, Coluna(...) ou Mapeado(...)).
+# Ano, Mês e Item vêm das colunas de mesmo nome, salvo indicação contrária.
+# "bloco" (padrão: a etapa) separa somas parciais que eram agrupadas separadamente no processo antigo,
+# para que os saldos finais sejam idênticos (mesma ordem de soma em ponto flutuante).
+REGRAS_CLASSIFICACAO_RAZAO = [
+    # ---------------- ETAPA: Recortes (Embalagem, Adequação, Financeiros, Impostos, Taxas) ----------------
+    {
+        "id": "folha_adequacao", "etapa": "Recortes",
+        "condicao": Igual("Item", "10110") & Igual("grupo", "PESSOAL OPER"),
+        "saida": {"Tabela": "Folha Adequação", "Area": Coluna("Título Conta"), "Grupo": Coluna("grupo"), "Filial UF": Coluna("filial_uf")},
+    },
+    {
+        "id": "material_embalagem", "etapa": "Recortes",
+        "condicao": Igual("Título Conta", "MATERIAL DE EMBALAGEM"),
+        "saida": {"Tabela": "MATERIAL DE EMBALAGEM", "Area": "Desconhecido", "Grupo": Coluna("sigla"), "Filial UF": Coluna("filial_uf")},
+    },
+    {
+        # Depreciação: a Filial UF vem do De-Para Item -> Filial (Item_De_Para_Filial_Depreciacao)
+        "id": "depreciacao", "etapa": "Recortes",
+        "condicao": Igual("grupo_financeiro", "DEPREC/AMORT"),
+        "saida": {"Tabela": "Custos Financeiros", "Area": Coluna("Título Conta"), "Grupo": Coluna("grupo_financeiro")},
+        "filial_por_depreciacao": True,
+    },
+    {
+        "id": "custos_financeiros", "etapa": "Recortes",
+        "condicao": Igual("grupo_financeiro", "CUSTOS FINANCEIROS"),
+        "saida": {"Tabela": "Custos Financeiros", "Area": Coluna("Título Conta"), "Grupo": Coluna("grupo_financeiro"), "Filial UF": Coluna("filial_uf")},
+    },
+    {
+        "id": "iss", "etapa": "Recortes",
+        "condicao": Igual("grupo", "ISS"),
+        "saida": {"Tabela": "ISS", "Area": "ISS", "Grupo": Coluna("grupo"), "Filial UF": _filial_iss},
+    },
+    {
+        "id": "outros_impostos", "etapa": "Recortes",
+        "condicao": _grupo("PIS", "COFINS", "ICMS"),
+        "saida": {"Tabela": "Outros Impostos", "Area": "Outros Impostos", "Grupo": Coluna("grupo"), "Filial UF": Coluna("filial_uf")},
+    },
+    {
+        "id": "taxas_operacionais", "etapa": "Recortes",
+        "condicao": Igual("grupo", "IMPOSTOS OPER") & _oper_armazem & Diferente("sigla", "Desconhecido"),
+        "saida": {"Tabela": "Custos Operacionais - Taxas", "Area": Coluna("Título Conta"), "Grupo": Coluna("sigla"), "Filial UF": Coluna("filial_uf")},
+    },
+    {
+        "id": "taxas_operacionais_outros", "etapa": "Recortes",
+        "condicao": Igual("grupo", "IMPOSTOS OPER") & _outros_armazem & Diferente("sigla", "Desconhecido"),
+        "saida": {"Tabela": "Custos Operacionais Outros - Taxas", "Area": Coluna("Título Conta"), "Grupo": Coluna("sigla"), "Filial UF": Coluna("filial_uf")},
+    },
+    {
+        "id": "taxas_indiretas", "etapa": "Recortes",
+        "condicao": Igual("grupo", "IMPOSTOS OPER"),
+        "saida": {"Tabela": "Custos Operacionais Indiretos - Taxas", "Area": Coluna("Título Conta"), "Grupo": Coluna("sigla"), "Filial UF": Coluna("filial_uf")},
+    },
+
+    # ---------------- ETAPA: Overhead ----------------
+    {
+        # Overhead de SERVIÇOS sai do Razão, mas não entra em nenhuma tabela (exceção específica)
+        "id": "overhead_servicos", "etapa": "Overhead",
+        "condicao": Diferente("tipo_cc", "Oper") & Igual("grupo", "SERVIÇOS"),
+        "descartar": True,
+    },
+    {
+        "id": "overhead_nao_operacional", "etapa": "Overhead", "bloco": "Overhead Não Operacional",
+        "condicao": Diferente("tipo_cc", "Oper"),
+        "saida": {"Tabela": "Overhead", "Area": Coluna("grupo"), "Grupo": "Overhead", "Item": "Overhead", "Filial UF": Coluna("filial_uf")},
+    },
+    {
+        "id": "indenizacao_trabalhista", "etapa": "Overhead", "bloco": "Indenização Trabalhista",
+        "condicao": Igual("Conta", "60301020108") & Igual("tipo_cc", "Oper"),
+        "saida": {"Tabela": "Overhead", "Area": Coluna("grupo"), "Grupo": "Overhead", "Item": "Overhead", "Filial UF": Coluna("filial_uf")},
+    },
+
+    # ---------------- ETAPA: Custos Alocados (Farma Direto = sigla conhecida; Indireto = 'Desconhecido') ----------------
+    # A ordem abaixo é a INVERSA da antiga sequência de atribuições (onde a última atribuição vencia).
+    {
+        "id": "descontos", "etapa": "Custos Alocados",
+        "condicao": _farma_direto & Igual("grupo", "DESCONTOS") & _oper_armazem,
+        "saida": {"Tabela": "Descontos"},
+    },
+    {
+        "id": "indenizacao_mercadorias", "etapa": "Custos Alocados",
+        "condicao": _farma_direto & Igual("grupo", "INDEN.MERCADORIAS") & _oper_armazem,
+        "saida": {"Tabela": "Indenização de Mercadorias"},
+    },
+    {
+        "id": "outros_grupos_indiretos", "etapa": "Custos Alocados",
+        "condicao": _farma_indireto & _grupo("INFORMATICA OPER", "ARMAZENAGEM OPER", "OUTROS OPER"),
+        "saida": {"Tabela": "Custos Operacionais Indiretos"},
+    },
+    {
+        "id": "outros_grupos_outros", "etapa": "Custos Alocados",
+        "condicao": _farma_direto & _grupo("INFORMATICA OPER", "ARMAZENAGEM OPER", "OUTROS OPER") & _outros_armazem,
+        "saida": {"Tabela": "Custos Operacionais Outros"},
+    },
+    {
+        "id": "outros_grupos_armazem", "etapa": "Custos Alocados",
+        "condicao": _farma_direto & _grupo("INFORMATICA OPER", "ARMAZENAGEM OPER", "OUTROS OPER") & _oper_armazem,
+        "saida": {"Tabela": "Custos Operacionais"},
+    },
+    {
+        "id": "temporarios_indiretos", "etapa": "Custos Alocados",
+        "condicao": _farma_indireto & Igual("grupo", "TERCEIROS OPER"),
+        "saida": {"Tabela": "Temporarios Indiretos"},
+    },
+    {
+        "id": "temporarios", "etapa": "Custos Alocados",
+        "condicao": _farma_direto & Igual("Conta", "60301020209"),
+        "saida": {"Tabela": "Temporarios"},
+    },
+    {
+        "id": "temporarios_conta_indiretos", "etapa": "Custos Alocados",
+        "condicao": _farma_indireto & Igual("Conta", "60301020209"),
+        "saida": {"Tabela": "Custos Operacionais Indiretos"},
+    },
+    {
+        "id": "terceiros_operacionais", "etapa": "Custos Alocados",
+        "condicao": _farma_direto & Igual("grupo", "TERCEIROS OPER"),
+        "saida": {"Tabela": "Custos Operacionais"},
+    },
+    {
+        "id": "rateio_indiretos_operacoes", "etapa": "Custos Alocados",
+        "condicao": _farma_indireto & Igual("grupo", "PESSOAL OPER"),
+        "saida": {"Tabela": "Rateio Indiretos Operações"},
+    },
+    {
+        "id": "folha_razao_outros", "etapa": "Custos Alocados",
+        "condicao": _farma_direto & Igual("grupo", "PESSOAL OPER") & _outros_armazem,
+        "saida": {"Tabela": "Folha Razão Outros"},
+    },
+    {
+        "id": "folha_razao", "etapa": "Custos Alocados",
+        "condicao": _farma_direto & Igual("grupo", "PESSOAL OPER") & _oper_armazem,
+        "saida": {"Tabela": "Folha Razão"},
+    },
+    {
+        # Regra final: o que não caiu em nenhuma regra acima
+        "id": "tabela_desconhecida", "etapa": "Custos Alocados",
+        "condicao": None,
+        "saida": {"Tabela": "Tabela Desconhecida"},
+    },
+]
+
+# Saída padrão da etapa Custos Alocados (grupo contábil vira Area; sigla vira Grupo)
+SAIDA_PADRAO = {
+    "Ano": Coluna("Ano"), "Mês": Coluna("Mês"), "Item": Coluna("Item"),
+    "Area": Coluna("grupo"), "Grupo": Coluna("sigla"), "Filial UF": Coluna("filial_uf"),
+}
+
+
+class ServicoClassificadorRazao:
+    """
+    Motor de regras da classificação do Razão.
+
+    Substitui a antiga cadeia de máscaras sequenciais (Embalagem_Adequa -> Overhead ->
+    farma_direto_indireto -> custos_alocados), em que cada etapa copiava o Razão,
+    recortava, renomeava e agrupava. Aqui:
+      1. Cada linha recebe o ID da primeira regra verdadeira em UMA passada vetorizada (np.select);
+      2. As colunas de saída são montadas por regra, sem copiar o Razão;
+      3. Um ÚNICO groupby gera as tabelas de todas as etapas.
+    """
+
+    def __init__(self, regras=None):
+        self.regras = regras or REGRAS_CLASSIFICACAO_RAZAO
+
+    def atribuir_regras(self, df):
+        """
+        Retorna um array (int) com o índice da regra atribuída a cada linha do DataFrame.
+        """
+        condicoes = []
+        for regra in self.regras:
+            if regra["condicao"] is None:
+                condicoes.append(np.ones(len(df), dtype=bool))
+            else:
+                condicoes.append(np.asarray(regra["condicao"](df), dtype=bool))
+        return np.select(condicoes, np.arange(len(self.regras)), default=-1)
+
+    def _valores(self, df, fonte, posicoes, cache_colunas):
+        if isinstance(fonte, Coluna):
+            if fonte.nome not in cache_colunas:
+                cache_colunas[fonte.nome] = df[fonte.nome].to_numpy(dtype=object)
+            return cache_colunas[fonte.nome][posicoes]
+        if callable(fonte):
+            return fonte(df.iloc[posicoes]).to_numpy(dtype=object)
+        return fonte
+
+    def montar_saida(self, df, regras_atribuidas, mapeamentos):
+        """
+        Monta a tabela de saída (COLUNAS_SAIDA + saldo + bloco) de todas as linhas classificadas,
+        ainda sem agrupar. Linhas de regras com "descartar" ficam de fora.
+        """
+        n = len(df)
+        colunas = {col: np.empty(n, dtype=object) for col in COLUNAS_SAIDA}
+        blocos = np.zeros(n, dtype=np.int64)
+        numeros_blocos = self.numeros_blocos(regras_atribuidas)
+        manter = np.ones(n, dtype=bool)
+        cache_colunas = {}
+
+        for indice, regra in enumerate(self.regras):
+            posicoes = np.flatnonzero(regras_atribuidas == indice)
+            if len(posicoes) == 0:
+                continue
+            if regra.get("descartar"):
+                manter[posicoes] = False
+                continue
+
+            blocos[posicoes] = numeros_blocos[indice]
+            saida = {**SAIDA_PADRAO, **regra["saida"]}
+            for col in COLUNAS_SAIDA:
+                if col == "Filial UF" and regra.get("filial_por_depreciacao"):
+                    # Depreciação: Filial UF via De-Para Item -> Filial (Item_De_Para_Filial_Depreciacao)
+                    de_para = obter_indice_de_para(mapeamentos, "Item_De_Para_Filial_Depreciacao", ["item"])
+                    colunas[col][posicoes] = de_para.valores("filial_uf", de_para.posicoes(df.iloc[posicoes], ["item"]))
+                    continue
+                colunas[col][posicoes] = self._valores(df, saida[col], posicoes, cache_colunas)
+
+        resultado = pd.DataFrame(colunas)
+        resultado["saldo"] = df["saldo"].to_numpy()
+        resultado["bloco"] = blocos
+        resultado = resultado.loc[manter]
+
+        return resultado
+
+    def numeros_blocos(self, regras_atribuidas):
+        """
+        Número do bloco de cada regra: o índice da primeira regra do mesmo bloco que tem linhas
+        (-1 para regras sem linhas ou descartadas). Ordena as somas parciais por bloco.
+        """
+        contagem = np.bincount(regras_atribuidas[regras_atribuidas >= 0], minlength=len(self.regras))
+        numeros = np.full(len(self.regras), -1, dtype=np.int64)
+        ordem_blocos = {}
+        for indice, regra in enumerate(self.regras):
+            if contagem[indice] and not regra.get("descartar"):
+                numeros[indice] = ordem_blocos.setdefault(regra.get("bloco", regra["etapa"]), indice)
+        return numeros
+
+    def classificar(self, df, mapeamentos):
+        """
+        Classifica o Razão enriquecido e retorna:
+          - o DataFrame agrupado (COLUNAS_SAIDA + saldo) com as tabelas de todas as etapas;
+          - o array com o índice da regra de cada linha do Razão.
+        """
+        regras_atribuidas = self.atribuir_regras(df)
+        saida = categorizar(self.montar_saida(df, regras_atribuidas, mapeamentos), COLUNAS_SAIDA)
+        # Soma parcial por bloco (na ordem das regras) e depois o total por chave
+        parciais = saida.groupby(["bloco"] + COLUNAS_SAIDA, as_index=False, observed=True)["saldo"].sum()
+        return self.totalizar(parciais), regras_atribuidas
+
+    def totalizar(self, parciais):
+        """
+        Total por chave (COLUNAS_SAIDA) das somas parciais, que chegam ordenadas por bloco e chave.
+        """
+        return parciais.groupby(COLUNAS_SAIDA, as_index=False, observed=True)["saldo"].sum()
+
+    def contagem_por_etapa(self, regras_atribuidas):
+        """
+        Retorna {etapa: nº de linhas do Razão} para log.
+        """
+        etapas = np.array([regra["etapa"] for regra in self.regras], dtype=object)
+        contagem = pd.Series(etapas[regras_atribuidas]).value_counts()
+        return contagem.to_dict()
+
+    def indice_regra(self, id_regra):
+        return next(i for i, regra in enumerate(self.regras) if regra["id"] == id_regra)
@@ -17,7 +17,7 @@ class ServicoDePara:
   
         """
         try:
-            # Chama a função do Connection.py que possui cache (TTLCache)
+            # Chama a função do Connection.py que possui cache (CacheMapeamentos)
             # Isso evita ir ao banco de dados em toda requisição se não passou 1 hora.
             mapeamentos = Carregar_Mapeamento_Banco()
             
@@ -0,0 +1,95 @@
+import pandas as pd
+from Config import DIAGNOSTICO_DE_PARA
+
+# Colunas acrescentadas às linhas de amostra nas abas de De-Paras não encontrados
+COLUNA_ETAPA = "Etapa"
+COLUNA_CHAVE = "Chave De-Para"
+COLUNA_LINHAS = "Linhas com a Chave"
+
+
+class ServicoDiagnosticoDePara:
+    """
+    Coletor das linhas que não encontraram De-Para (abas De_Paras_Não_Encontrados).
+
+    Em vez de guardar uma cópia de cada linha sem De-Para em cada etapa, guarda por etapa:
+      - a contagem de linhas por chave não encontrada (somada a cada registro);
+      - uma amostra limitada: as primeiras 'amostras_por_chave' linhas de cada chave, com todas as colunas.
+    Toda chave não encontrada aparece no relatório (pelo menos uma linha de amostra), com o total de linhas
+    que ela afetou. A memória fica limitada pelo nº de chaves distintas, e não pelo nº de linhas do arquivo.
+    """
+
+    def __init__(self, amostras_por_chave=None):
+        """
+        :param amostras_por_chave: Máximo de linhas guardadas por chave. Se None, usa Config.DIAGNOSTICO_DE_PARA.
+        """
+        self.amostras_por_chave = amostras_por_chave or DIAGNOSTICO_DE_PARA["amostras_por_chave"]
+        self._etapas = {} # etapa -> {"chaves": [...], "contagem": DataFrame, "amostra": DataFrame}, na ordem de registro
+
+    def _limitar(self, amostra, chaves):
+        posicao = amostra.groupby(chaves, dropna=False, observed=True, sort=False).cumcount()
+        return amostra.loc[posicao.to_numpy() < self.amostras_por_chave]
+
+    def registrar(self, etapa, df, mascara, chaves):
+        """
+        Registra as linhas de df em que 'mascara' é verdadeira (sem De-Para na etapa).
+        :param etapa: Nome da etapa no relatório (ex: "Razão: Centro de Custo").
+        :param chaves: Colunas de df usadas na busca do De-Para.
+        :return: Nº de linhas registradas.
+        """
+        linhas = df.loc[mascara]
+        if linhas.empty:
+            return 0
+        contagem = linhas.groupby(chaves, dropna=False, observed=True, sort=False).size().rename(COLUNA_LINHAS).reset_index()
+        self.incorporar_etapa(etapa, chaves, contagem, self._limitar(linhas, chaves))
+        return len(linhas)
+
+    def incorporar_etapa(self, etapa, chaves, contagem, amostra):
+        """
+        Soma uma contagem (chaves + COLUNA_LINHAS) e acrescenta uma amostra (na ordem recebida) à etapa.
+        """
+        atual = self._etapas.get(etapa)
+        if atual is not None:
+            contagem = pd.concat([atual["contagem"], contagem], ignore_index=True)
+            amostra = pd.concat([atual["amostra"], amostra], ignore_index=True)
+        contagem = contagem.groupby(chaves, dropna=False, observed=True, sort=False)[COLUNA_LINHAS].sum().reset_index()
+        self._etapas[etapa] = {"chaves": list(chaves), "contagem": contagem, "amostra": self._limitar(amostra, chaves)}
+
+    def incorporar(self, outro):
+        """
+        Junta os registros de outro coletor (ex: de um processo filho), etapa por etapa.
+        """
+        for etapa, item in outro._etapas.items():
+            self.incorporar_etapa(etapa, item["chaves"], item["contagem"], item["amostra"])
+
+    def etapa(self, etapa):
+        """
+        Retorna (chaves, contagem, amostra) da etapa, ou None se nada foi registrado nela.
+        """
+        item = self._etapas.get(etapa)
+        return None if item is None else (item["chaves"], item["contagem"], item["amostra"])
+
+    def linhas(self, etapa=None):
+        """
+        Total de linhas sem De-Para (de uma etapa ou de todas).
+        """
+        etapas = [self._etapas[etapa]] if etapa is not None else self._etapas.values()
+        return int(sum(item["contagem"][COLUNA_LINHAS].sum() for item in etapas if item is not None))
+
+    def relatorio(self):
+        """
+        Monta a aba de De-Paras não encontrados: as linhas de amostra de cada etapa (na ordem de registro),
+        precedidas da etapa, das colunas da chave e do total de linhas com aquela chave.
+        """
+        partes = []
+        for etapa, item in self._etapas.items():
+            chaves, amostra = item["chaves"], item["amostra"].reset_index(drop=True)
+            totais = amostra[chaves].merge(item["contagem"], on=chaves, how="left")[COLUNA_LINHAS]
+            cabecalho = pd.DataFrame({
+                COLUNA_ETAPA: etapa,
+                COLUNA_CHAVE: ", ".join(chaves),
+                COLUNA_LINHAS: totais.to_numpy(),
+            })
+            partes.append(pd.concat([cabecalho, amostra], axis=1))
+        if not partes:
+            return pd.DataFrame()
+        return pd.concat(partes, ignore_index=True)
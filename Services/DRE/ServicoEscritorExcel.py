@@ -0,0 +1,209 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+# Limite de linhas de uma aba do Excel (1.048.576, incluindo o cabeçalho)
+MAX_LINHAS_ABA = 1_048_575
+
+# Dia zero das datas do Excel (sistema 1900), em nanossegundos desde 1970
+_EPOCA_EXCEL_NS = pd.Timestamp("1899-12-30").value
+_NS_POR_DIA = 86_400 * 10 ** 9
+
+
+class ServicoEscritorExcel:
+    """
+    Gravação do Excel de saída do DRE em streaming (xlsxwriter em modo constant_memory).
+
+    Cada linha vai para o disco assim que é escrita, então a memória usada não depende do
+    tamanho do Razão (o ExcelWriter/openpyxl montava o arquivo inteiro em memória).
+    O tipo de cada coluna é decidido uma vez: números e datas são gravados como valores
+    nativos do Excel e o formato (ex: "#,##0.00", "dd/mm/yyyy") é aplicado na coluna inteira.
+    Abas acima do limite do Excel continuam em abas extras ("Consolidado DRE (2)", ...).
+    """
+
+    FORMATO_DECIMAL = "#,##0.00"
+    FORMATO_DATA = "dd/mm/yyyy"
+    FORMATO_DATA_HORA = "dd/mm/yyyy hh:mm:ss"
+
+    def __init__(self, linhas_por_bloco=10_000, max_linhas_aba=MAX_LINHAS_ABA):
+        """
+        :param linhas_por_bloco: Linhas convertidas para valores Python por vez (limita a memória da conversão).
+        :param max_linhas_aba: Linhas de dados por aba antes de continuar em uma nova aba.
+        """
+        self.linhas_por_bloco = linhas_por_bloco
+        self.max_linhas_aba = max_linhas_aba
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def escrever(self, relatorios, caminho):
+        """
+        Grava os relatórios (uma aba por DataFrame) no arquivo .xlsx.
+
+        :param relatorios: Dicionário {nome: DataFrame}, como o retorno de consolidado(). DataFrames vazios são pulados.
+        :param caminho: Caminho do arquivo de saída.
+        :return: Resumo {"arquivo", "bytes", "segundos", "linhas", "abas": [{"aba", "relatorio", "linhas", "colunas"}]}.
+        """
+        inicio = time.perf_counter()
+        opcoes = {
+            "constant_memory": True,
+            "use_zip64": True, # Arquivos acima de 4 GB
+            "strings_to_numbers": False,
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        }
+        abas = []
+        with xlsxwriter.Workbook(caminho, opcoes) as workbook:
+            formatos = {
+                "cabecalho": workbook.add_format({"bold": True, "border": 1}),
+                self.FORMATO_DECIMAL: workbook.add_format({"num_format": self.FORMATO_DECIMAL}),
+                self.FORMATO_DATA: workbook.add_format({"num_format": self.FORMATO_DATA}),
+                self.FORMATO_DATA_HORA: workbook.add_format({"num_format": self.FORMATO_DATA_HORA}),
+            }
+            for nome, df in relatorios.items():
+                if df.empty:
+                    print(f"Aba '{nome}' está vazia, pulando.")
+                    continue
+                abas.extend(self._escrever_relatorio(workbook, formatos, nome, df))
+
+        return {
+            "arquivo": os.path.basename(caminho),
+            "bytes": os.path.getsize(caminho),
+            "segundos": round(time.perf_counter() - inicio, 4),
+            "linhas": sum(aba["linhas"] for aba in abas),
+            "abas": abas,
+        }
+
+    # ------------------------------------------------------------------
+    # Abas
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _nome_aba(nome, parte):
+        # O Excel limita nomes de aba a 31 caracteres
+        nome = nome.replace("_", " ")
+        if parte == 1:
+            return nome[:31]
+        sufixo = f" ({parte})"
+        return nome[:31 - len(sufixo)] + sufixo
+
+    def _escrever_relatorio(self, workbook, formatos, nome, df):
+        colunas = [self._preparar_coluna(df[coluna]) for coluna in df.columns] if df.columns.is_unique else \
+                  [self._preparar_coluna(df.iloc[:, i]) for i in range(df.shape[1])]
+        cabecalho = [str(coluna) for coluna in df.columns]
+
+        abas = []
+        for parte, inicio in enumerate(range(0, len(df), self.max_linhas_aba), start=1):
+            fim = min(inicio + self.max_linhas_aba, len(df))
+            nome_aba = self._nome_aba(nome, parte)
+            worksheet = workbook.add_worksheet(nome_aba)
+
+            # Formatos e larguras definidos uma vez por coluna (antes das linhas, exigência do constant_memory)
+            for indice, (titulo, coluna) in enumerate(zip(cabecalho, colunas)):
+                formato = formatos.get(coluna["formato"])
+                worksheet.set_column(indice, indice, max(10, min(len(titulo) + 2, 50)), formato)
+            worksheet.freeze_panes(1, 0)
+            worksheet.write_row(0, 0, cabecalho, formatos["cabecalho"])
+
+            self._escrever_linhas(worksheet, colunas, inicio, fim, formatos[self.FORMATO_DATA_HORA])
+            abas.append({"aba": nome_aba, "relatorio": nome, "linhas": fim - inicio, "colunas": len(colunas)})
+        return abas
+
+    def _escrever_linhas(self, worksheet, colunas, inicio, fim, formato_data):
+        escritores = [getattr(worksheet, coluna["metodo"]) if coluna["metodo"] else self._escritor_misto(worksheet, formato_data)
+                      for coluna in colunas]
+        linha_excel = 1
+        for inicio_bloco in range(inicio, fim, self.linhas_por_bloco):
+            fim_bloco = min(inicio_bloco + self.linhas_por_bloco, fim)
+            valores = [coluna["converter"](inicio_bloco, fim_bloco) for coluna in colunas]
+            for linha in zip(*valores):
+                for indice, valor in enumerate(linha):
+                    if valor is not None:
+                        escritores[indice](linha_excel, indice, valor)
+                linha_excel += 1
+
+    # ------------------------------------------------------------------
+    # Tipos das colunas
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _escritor_misto(worksheet, formato_data):
+        # Colunas com tipos misturados: decide célula a célula (o write() do xlsxwriter faz o mesmo)
+        def escrever(linha, coluna, valor):
+            if isinstance(valor, str):
+                worksheet.write_string(linha, coluna, valor)
+            elif isinstance(valor, (bool, np.bool_)):
+                worksheet.write_boolean(linha, coluna, bool(valor))
+            elif isinstance(valor, (int, float, np.integer, np.floating)):
+                if np.isfinite(valor):
+                    worksheet.write_number(linha, coluna, valor)
+                else:
+                    worksheet.write_string(linha, coluna, str(valor))
+            elif isinstance(valor, pd.Timestamp):
+                if valor.tzinfo is not None:
+                    valor = valor.tz_localize(None)
+                worksheet.write_datetime(linha, coluna, valor.to_pydatetime(), formato_data)
+            else:
+                worksheet.write_string(linha, coluna, str(valor))
+        return escrever
+
+    @staticmethod
+    def _sem_nulos(valores, nulos):
+        # Lista Python com None no lugar dos nulos (células em branco)
+        if not nulos.any():
+            return valores.tolist()
+        resultado = valores.astype(object)
+        resultado[nulos] = None
+        return resultado.tolist()
+
+    def _preparar_coluna(self, serie):
+        """
+        Decide, uma vez por coluna, o método de escrita, o formato e como converter um bloco de linhas.
+        """
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype(object)
+
+        if pd.api.types.is_bool_dtype(serie.dtype) and not serie.hasnans:
+            valores = serie.to_numpy(dtype=bool)
+            return {"metodo": "write_boolean", "formato": None,
+                    "converter": lambda i, f: valores[i:f].tolist()}
+
+        if pd.api.types.is_numeric_dtype(serie.dtype) and not pd.api.types.is_bool_dtype(serie.dtype):
+            inteiro = pd.api.types.is_integer_dtype(serie.dtype)
+            if inteiro and not serie.hasnans:
+                valores = serie.to_numpy(dtype=np.int64)
+            else:
+                valores = serie.to_numpy(dtype=np.float64, na_value=np.nan)
+            if not inteiro and not np.isfinite(valores[~np.isnan(valores)]).all():
+                # Infinito não é um número do Excel: vai como texto, como no to_excel do pandas
+                return self._preparar_objeto(serie.astype(object))
+            formato = None if inteiro else self.FORMATO_DECIMAL
+            if valores.dtype == np.int64:
+                return {"metodo": "write_number", "formato": formato, "converter": lambda i, f: valores[i:f].tolist()}
+            return {"metodo": "write_number", "formato": formato,
+                    "converter": lambda i, f: self._sem_nulos(valores[i:f], np.isnan(valores[i:f]))}
+
+        if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+            if getattr(serie.dt, "tz", None) is not None:
+                serie = serie.dt.tz_localize(None)
+            nanossegundos = serie.to_numpy(dtype="datetime64[ns]").view(np.int64)
+            nulos = serie.isna().to_numpy()
+            # Data do Excel = dias (com fração) desde 30/12/1899
+            dias = (nanossegundos - _EPOCA_EXCEL_NS) / _NS_POR_DIA
+            so_data = bool((nanossegundos[~nulos] % _NS_POR_DIA == 0).all())
+            return {"metodo": "write_number", "formato": self.FORMATO_DATA if so_data else self.FORMATO_DATA_HORA,
+                    "converter": lambda i, f: self._sem_nulos(dias[i:f], nulos[i:f])}
+
+        return self._preparar_objeto(serie)
+
+    def _preparar_objeto(self, serie):
+        valores = serie.to_numpy(dtype=object)
+        nulos = pd.isna(valores)
+        if pd.api.types.infer_dtype(valores, skipna=True) in ("string", "empty"):
+            return {"metodo": "write_string", "formato": None,
+                    "converter": lambda i, f: self._sem_nulos(valores[i:f], nulos[i:f])}
+        return {"metodo": None, "formato": None,
+                "converter": lambda i, f: self._sem_nulos(valores[i:f], nulos[i:f])}
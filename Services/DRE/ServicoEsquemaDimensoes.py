@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+# Dimensões da Rentabilidade (chaves do agrupamento final, na ordem do consolidado)
+COLUNAS_DIMENSAO = ["Tabela", "Ano", "Mês", "Filial UF", "Grupo", "Area", "Item"]
+
+# Colunas de texto do Razão enriquecido guardadas como categóricas (poucos valores distintos e muitas linhas).
+# "Descrição" fica de fora: é texto livre, quase um valor por lançamento.
+COLUNAS_CATEGORICAS_RAZAO = [
+    "Conta", "Título Conta", "Filial", "Centro de Custo", "Item", "Ano", "Mês",
+    "centro_de_custo_id", "centro_custo_desc", "tipo_cc", "item", "nome", "sigla",
+    "filial_nome", "filial_uf", "Concat Razão", "descricao_completa", "descricao_resumida",
+    "grupo", "grupo_financeiro",
+]
+
+# De-Paras do enriquecimento do Razão, na ordem em que são aplicados: {índice: colunas do Razão na chave}.
+# "contas_fallback" só vale para as linhas sem grupo financeiro na chave composta (Conta + tipo_cc).
+CHAVES_DE_PARA_RAZAO = {
+    "centro_custo": ["Centro de Custo"],
+    "item": ["Item"],
+    "filial": ["Filial"],
+    "contas": ["Concat Razão"],
+    "contas_fallback": ["Conta"],
+}
+
+# Colunas do De-Para de Contas descartadas das linhas do fallback antes de refazer o De-Para só pela Conta
+COLUNAS_CONTAS_FALLBACK = ["conta", "descricao_completa", "descricao_resumida", "grupo", "grupo_financeiro"]
+
+# Rótulo dos valores nulos nas dimensões do relatório final
+ROTULO_NULO = "N/A"
+
+
+def categorizar(df, colunas):
+    """
+    Converte as colunas (as que existirem em df) para categóricas, sem ordenar as categorias.
+    Os códigos ocupam 1 ou 2 bytes por linha (int8/int16), em vez de um ponteiro para um objeto str.
+    Comparações (==, !=, isin) e nulos se comportam como nas colunas 'object'.
+    :return: Novo DataFrame (as demais colunas não são copiadas).
+    """
+    convertidas = {}
+    for coluna in colunas:
+        if coluna in df.columns and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            codigos, categorias = pd.factorize(df[coluna])
+            convertidas[coluna] = pd.Categorical.from_codes(codigos, categorias)
+    return df.assign(**convertidas) if convertidas else df
+
+
+def por_valores_distintos(df, colunas, funcao):
+    """
+    Calcula funcao(df[colunas]) apenas uma vez por combinação distinta de valores e devolve o
+    resultado (categórico) para todas as linhas. Ex: astype(str).str.strip() de uma coluna com
+    milhões de linhas e algumas centenas de valores distintos.
+    :param funcao: Recebe um DataFrame com uma linha por combinação (colunas categóricas como 'object')
+                   e retorna uma Series do mesmo tamanho.
+    :return: pd.Categorical com uma posição por linha de df.
+    """
+    grupos = df.groupby(colunas, dropna=False, observed=True, sort=False)
+    numeros = grupos.ngroup().to_numpy()
+    primeiras = np.unique(numeros, return_index=True)[1]
+    unicos = df[colunas].iloc[primeiras].reset_index(drop=True)
+    unicos = unicos.astype({c: object for c in colunas if isinstance(unicos[c].dtype, pd.CategoricalDtype)})
+
+    codigos, categorias = pd.factorize(pd.Series(funcao(unicos)).reset_index(drop=True))
+    return pd.Categorical.from_codes(codigos[numeros], categorias)
+
+
+def unificar_categorias(dfs, colunas):
+    """
+    Deixa as colunas categóricas com as MESMAS categorias em todos os DataFrames (união, na ordem em
+    que aparecem), para que pd.concat mantenha o tipo categórico. Se a coluna for categórica em algum
+    dos DataFrames, ela também é convertida nos demais (ex: tabelas do Rateio, que chegam como 'object').
+    :return: Lista de novos DataFrames.
+    """
+    dfs = list(dfs)
+    convertidas = [{} for _ in dfs]
+    for coluna in colunas:
+        presentes = [i for i, df in enumerate(dfs) if coluna in df.columns]
+        if not any(isinstance(dfs[i][coluna].dtype, pd.CategoricalDtype) for i in presentes):
+            continue
+        partes = []
+        for i in presentes:
+            serie = dfs[i][coluna]
+            partes.append(serie.cat.categories if isinstance(serie.dtype, pd.CategoricalDtype) else pd.Index(pd.unique(serie.dropna())))
+        categorias = pd.Index(pd.unique(np.concatenate([parte.to_numpy(dtype=object) for parte in partes])))
+        tipo = pd.CategoricalDtype(categorias)
+        for i in presentes:
+            convertidas[i][coluna] = dfs[i][coluna].astype(tipo)
+    return [df.assign(**novas) if novas else df for df, novas in zip(dfs, convertidas)]
+
+
+def rotular(serie):
+    """
+    Rótulos finais de uma dimensão (texto), como no antigo astype(str).replace('nan'/'None', 'N/A'):
+    valores diferentes com o mesmo texto (ex: 1 e "1") viram a mesma categoria e os nulos viram ROTULO_NULO.
+    As categorias ficam em ordem alfabética, a mesma do groupby sobre texto.
+    :return: Series categórica com categorias de texto ordenadas.
+    """
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = categorizar(serie.to_frame(), [serie.name])[serie.name]
+
+    textos = serie.cat.categories.astype(str).to_numpy(dtype=object)
+    textos[np.isin(textos, ["nan", "None"])] = ROTULO_NULO
+    codigos = serie.cat.codes.to_numpy()
+    if (codigos == -1).any():
+        textos = np.append(textos, ROTULO_NULO)
+        codigos = np.where(codigos == -1, len(textos) - 1, codigos)
+
+    categorias, novos_codigos = np.unique(textos.astype(str), return_inverse=True)
+    return pd.Series(pd.Categorical.from_codes(novos_codigos[codigos], categorias), index=serie.index, name=serie.name)
@@ -0,0 +1,141 @@
+import os
+import time
+import shutil
+import zipfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from .ServicoEscritorExcel import ServicoEscritorExcel
+
+# Formatos aceitos em /processar: {formato: (rótulo, extensão de cada arquivo)}
+FORMATOS_EXPORTACAO = {
+    "xlsx": ("Excel", ".xlsx"),
+    "parquet": ("Parquet", ".parquet"),
+    "csv.gz": ("CSV (gzip)", ".csv.gz"),
+    "arrow": ("Arrow IPC", ".arrow"),
+}
+
+
+class ServicoExportacaoRelatorios:
+    """
+    Grava os relatórios do consolidado no formato pedido.
+
+    - "xlsx": um único Excel com uma aba por relatório (ServicoEscritorExcel).
+    - "parquet", "csv.gz", "arrow": um arquivo por relatório, entregues em um .zip
+      ou em uma pasta dentro do diretório de saída. São lidos direto por ferramentas de BI,
+      pandas, DuckDB, etc., sem passar pelo parser de Excel.
+    """
+
+    def __init__(self, escritor_excel=None):
+        self.escritor_excel = escritor_excel or ServicoEscritorExcel()
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def exportar(self, relatorios, diretorio_saida, nome_base, formato="xlsx", compactar=True):
+        """
+        :param relatorios: Dicionário {nome: DataFrame}, como o retorno de consolidado().
+        :param diretorio_saida: Pasta de Downloads.
+        :param nome_base: Nome do artefato, sem extensão (ex: "DRE_Rentabilidade_1a2b3c4d").
+        :param formato: Uma das chaves de FORMATOS_EXPORTACAO.
+        :param compactar: Formatos colunares: True = um .zip; False = uma pasta com um arquivo por relatório.
+        :return: Resumo {"arquivo", "arquivos", "formato", "bytes", "segundos", "linhas", "abas"}.
+                 "arquivos" são os caminhos (relativos ao diretório de saída) disponíveis para download.
+        """
+        if formato not in FORMATOS_EXPORTACAO:
+            raise ValueError(f"Formato de saída inválido: '{formato}'. Use um de: {', '.join(FORMATOS_EXPORTACAO)}.")
+        os.makedirs(diretorio_saida, exist_ok=True)
+
+        if formato == "xlsx":
+            resumo = self.escritor_excel.escrever(relatorios, os.path.join(diretorio_saida, f"{nome_base}.xlsx"))
+            return {**resumo, "formato": formato, "arquivos": [resumo["arquivo"]]}
+
+        inicio = time.perf_counter()
+        pasta = os.path.join(diretorio_saida, nome_base)
+        os.makedirs(pasta, exist_ok=True)
+        try:
+            abas = self._gravar_arquivos(relatorios, pasta, formato)
+            if compactar:
+                arquivo = f"{nome_base}.zip"
+                self._compactar(pasta, abas, os.path.join(diretorio_saida, arquivo), formato)
+        except Exception:
+            shutil.rmtree(pasta, ignore_errors=True)
+            raise
+
+        if compactar:
+            shutil.rmtree(pasta, ignore_errors=True)
+            arquivos = [arquivo]
+            total_bytes = os.path.getsize(os.path.join(diretorio_saida, arquivo))
+        else:
+            arquivo = nome_base
+            arquivos = [f"{nome_base}/{aba['aba']}" for aba in abas]
+            total_bytes = sum(aba["bytes"] for aba in abas)
+
+        return {
+            "arquivo": arquivo,
+            "arquivos": arquivos,
+            "formato": formato,
+            "bytes": total_bytes,
+            "segundos": round(time.perf_counter() - inicio, 4),
+            "linhas": sum(aba["linhas"] for aba in abas),
+            "abas": abas,
+        }
+
+    # ------------------------------------------------------------------
+    # Gravação
+    # ------------------------------------------------------------------
+
+    def _gravar_arquivos(self, relatorios, pasta, formato):
+        extensao = FORMATOS_EXPORTACAO[formato][1]
+        abas = []
+        for nome, df in relatorios.items():
+            if df.empty:
+                print(f"Relatório '{nome}' está vazio, pulando.")
+                continue
+            arquivo = f"{nome}{extensao}"
+            caminho = os.path.join(pasta, arquivo)
+            tabela = self._tabela_arrow(df)
+
+            if formato == "parquet":
+                pq.write_table(tabela, caminho, compression="zstd")
+            elif formato == "arrow":
+                with pa.OSFile(caminho, "wb") as destino, pa.ipc.new_file(destino, tabela.schema) as escritor:
+                    escritor.write_table(tabela)
+            else:
+                # CSV não tem tipo dicionário (colunas categóricas): grava os valores
+                tabela = pa.table([pc.cast(coluna, coluna.type.value_type) if pa.types.is_dictionary(coluna.type) else coluna
+                                   for coluna in tabela.columns], names=tabela.column_names)
+                with pa.CompressedOutputStream(caminho, "gzip") as destino:
+                    pa_csv.write_csv(tabela, destino)
+
+            abas.append({"aba": arquivo, "relatorio": nome, "linhas": len(df), "colunas": df.shape[1],
+                         "bytes": os.path.getsize(caminho)})
+        return abas
+
+    @staticmethod
+    def _tabela_arrow(df):
+        """
+        Converte o DataFrame para Arrow. Colunas 'object' (ou categóricas) com tipos misturados (ex: contas lidas
+        como número em uma aba e texto em outra) viram texto; nomes de colunas viram texto.
+        """
+        df = df.copy(deep=False)
+        df.columns = [str(coluna) for coluna in df.columns]
+        for i in range(df.shape[1]):
+            serie = df.iloc[:, i]
+            if isinstance(serie.dtype, pd.CategoricalDtype) and serie.cat.categories.dtype == object \
+                    and pd.api.types.infer_dtype(serie.cat.categories) not in ("string", "empty"):
+                serie = serie.astype(object)
+            if serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True) not in ("string", "empty"):
+                df.isetitem(i, serie.where(serie.isna(), serie.astype(str)))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+    @staticmethod
+    def _compactar(pasta, abas, caminho_zip, formato):
+        # Parquet e CSV.gz já são comprimidos; o Arrow IPC (sem compressão, para leitura direta) é comprimido no zip
+        compressao = zipfile.ZIP_DEFLATED if formato == "arrow" else zipfile.ZIP_STORED
+        with zipfile.ZipFile(caminho_zip, "w", compression=compressao, allowZip64=True) as arquivo_zip:
+            for aba in abas:
+                arquivo_zip.write(os.path.join(pasta, aba["aba"]), arcname=aba["aba"])
@@ -0,0 +1,204 @@
+import os
+import json
+import uuid
+import threading
+import traceback
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ServicoFilaJobs:
+    """
+    Fila de processamentos em segundo plano (jobs).
+
+    A rota HTTP apenas enfileira o job e devolve um ID; um pool local de workers
+    executa o processamento e grava o andamento (etapa, percentual, resultado)
+    em um arquivo JSON por job. Como o estado fica no disco, o acompanhamento
+    sobrevive a um refresh da página e pode ser lido por qualquer worker do Flask.
+
+    Jobs enfileirados com a mesma 'chave' enquanto um deles ainda está pendente
+    compartilham a mesma execução (single-flight): enfileirar() devolve o ID do job em andamento.
+    """
+
+    NA_FILA = "na_fila"
+    EXECUTANDO = "executando"
+    CONCLUIDO = "concluido"
+    ERRO = "erro"
+
+    def __init__(self, diretorio, max_workers=2, max_fila=10, modo="threads"):
+        """
+        :param diretorio: Pasta onde os arquivos de estado dos jobs (JSON) são gravados.
+        :param max_workers: Nº máximo de jobs executando ao mesmo tempo.
+        :param max_fila: Nº máximo de jobs pendentes (na fila + executando). Acima disso, enfileirar() recusa.
+        :param modo: "threads" (pool em segundo plano) ou "inline" (executa na hora, no próprio processo - útil para testes).
+        """
+        self.diretorio = diretorio
+        self.max_workers = max_workers
+        self.max_fila = max_fila
+        self.modo = modo
+
+        self._lock = threading.Lock()
+        self._pendentes = set()
+        self._por_chave = {} # chave -> ID do job pendente com essa chave
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job") if modo == "threads" else None
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._marcar_interrompidos()
+
+    # ------------------------------------------------------------------
+    # Persistência do estado
+    # ------------------------------------------------------------------
+
+    def _caminho(self, job_id):
+        return os.path.join(self.diretorio, f"{job_id}.json")
+
+    def _gravar(self, job):
+        # Grava em arquivo temporário e troca atomicamente (leitores nunca veem JSON pela metade)
+        caminho = self._caminho(job["id"])
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(temporario, caminho)
+
+    def _atualizar(self, job_id, **campos):
+        with self._lock:
+            job = self.status(job_id)
+            job.update(campos)
+            self._gravar(job)
+            return job
+
+    @staticmethod
+    def _processo_ativo(pid):
+        if not pid:
+            return False
+        if os.name == "nt":
+            return True # Sem verificação segura no Windows (os.kill encerraria o processo)
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _marcar_interrompidos(self):
+        """
+        Jobs que estavam 'na_fila' ou 'executando' em um processo que não existe mais nunca vão terminar.
+        (Com vários workers do Flask, os jobs dos outros processos vivos são preservados.)
+        """
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith(".json"):
+                continue
+            job = self.status(nome[:-len(".json")])
+            if job and job["estado"] in (self.NA_FILA, self.EXECUTANDO) and not self._processo_ativo(job.get("pid")):
+                job.update(estado=self.ERRO, erro="Processamento interrompido (servidor reiniciado).")
+                self._gravar(job)
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def enfileirar(self, funcao, *args, descricao=None, chave=None, **kwargs):
+        """
+        Cria um job e agenda sua execução.
+
+        A função recebe como primeiro argumento um callback `progresso(etapa, percentual)`
+        e deve retornar um dicionário (JSON serializável) com o resultado.
+
+        :param chave: Identifica trabalhos equivalentes (ex: mesmas entradas). Se já houver um job
+                      pendente com a mesma chave, nenhum job novo é criado e o ID dele é devolvido.
+        :return: ID do job.
+        :raises RuntimeError: Se a fila estiver cheia.
+        """
+        with self._lock:
+            if chave is not None and self._por_chave.get(chave) in self._pendentes:
+                job_id = self._por_chave[chave]
+                print(f"Job {job_id} com a mesma chave já está em andamento: reaproveitando.")
+                return job_id
+            if len(self._pendentes) >= self.max_fila:
+                raise RuntimeError(f"Fila de processamento cheia ({self.max_fila} jobs pendentes). Tente novamente em alguns minutos.")
+            job_id = uuid.uuid4().hex[:12]
+            self._pendentes.add(job_id)
+            if chave is not None:
+                self._por_chave[chave] = job_id
+            self._gravar({
+                "id": job_id,
+                "descricao": descricao,
+                "chave": chave,
+                "pid": os.getpid(),
+                "estado": self.NA_FILA,
+                "etapa": None,
+                "percentual": 0,
+                "etapas": [],
+                "criado_em": datetime.now().isoformat(timespec="seconds"),
+                "iniciado_em": None,
+                "finalizado_em": None,
+                "resultado": None,
+                "erro": None,
+            })
+
+        if self._executor is not None:
+            self._executor.submit(self._executar, job_id, funcao, args, kwargs)
+        else:
+            self._executar(job_id, funcao, args, kwargs)
+        return job_id
+
+    def status(self, job_id):
+        """
+        Retorna o estado do job (dicionário) ou None se o ID não existir.
+        """
+        # O ID vem da URL: aceita apenas o formato gerado por enfileirar()
+        if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(self._caminho(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def listar(self):
+        """
+        Retorna todos os jobs conhecidos, do mais recente para o mais antigo.
+        """
+        jobs = [self.status(nome[:-len(".json")]) for nome in os.listdir(self.diretorio) if nome.endswith(".json")]
+        return sorted((j for j in jobs if j), key=lambda j: j["criado_em"], reverse=True)
+
+    def pendentes(self):
+        with self._lock:
+            return len(self._pendentes)
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    def _executar(self, job_id, funcao, args, kwargs):
+        self._atualizar(job_id, estado=self.EXECUTANDO, iniciado_em=datetime.now().isoformat(timespec="seconds"))
+
+        def progresso(etapa, percentual):
+            with self._lock:
+                job = self.status(job_id)
+                agora = datetime.now().isoformat(timespec="seconds")
+                # Fecha a etapa anterior e abre a nova
+                if job["etapas"] and job["etapas"][-1]["fim"] is None:
+                    job["etapas"][-1]["fim"] = agora
+                job["etapas"].append({"nome": etapa, "inicio": agora, "fim": None})
+                job.update(etapa=etapa, percentual=percentual)
+                self._gravar(job)
+
+        try:
+            resultado = funcao(progresso, *args, **kwargs)
+            job = self.status(job_id)
+            agora = datetime.now().isoformat(timespec="seconds")
+            if job["etapas"] and job["etapas"][-1]["fim"] is None:
+                job["etapas"][-1]["fim"] = agora
+            self._atualizar(job_id, estado=self.CONCLUIDO, percentual=100, etapas=job["etapas"],
+                            resultado=resultado, finalizado_em=agora)
+        except Exception as e:
+            print(f"ERRO NO JOB {job_id}: {e}")
+            traceback.print_exc()
+            self._atualizar(job_id, estado=self.ERRO, erro=str(e),
+                            finalizado_em=datetime.now().isoformat(timespec="seconds"))
+        finally:
+            with self._lock:
+                self._pendentes.discard(job_id)
+                self._por_chave = {c: j for c, j in self._por_chave.items() if j != job_id}
@@ -0,0 +1,181 @@
+import threading
+import weakref
+import pandas as pd
+
+
+class IndiceDePara:
+    """
+    Índice de busca (hash) de uma tabela De-Para, montado uma única vez por snapshot de mapeamentos.
+
+    Substitui os DataFrame.merge(how="left") repetidos nos serviços: a tabela de hash da chave
+    é construída aqui (e não a cada merge) e o enriquecimento é um take vetorizado por coluna.
+    Chaves duplicadas são detectadas na construção e mantém-se a PRIMEIRA ocorrência, então o
+    enriquecimento nunca altera o número de linhas. Chaves nulas não entram no índice.
+    """
+
+    def __init__(self, df, chaves, nome=None):
+        """
+        :param df: Tabela De-Para.
+        :param chaves: Lista de colunas que formam a chave.
+        :param nome: Nome da tabela (para mensagens).
+        """
+        self.nome = nome
+        self.chaves = list(chaves)
+
+        tabela = df.loc[df[self.chaves].notna().all(axis=1)]
+        indice = self._montar_indice(tabela, self.chaves)
+
+        duplicadas = indice.duplicated()
+        self.linhas_duplicadas = int(duplicadas.sum())
+        self.chaves_duplicadas = int(indice[duplicadas].nunique()) if self.linhas_duplicadas else 0
+        if self.linhas_duplicadas:
+            tabela = tabela.loc[~duplicadas]
+            indice = indice[~duplicadas]
+
+        self._indice = indice
+        self.colunas = list(tabela.columns)
+        self._tabela = tabela
+        self._valores = {} # coluna -> array numpy, montado sob demanda por _coluna()
+        self._categorias = {} # coluna -> (códigos, categorias), montado sob demanda por valores_categoricos()
+
+    def _coluna(self, coluna):
+        """
+        Valores da coluna como array numpy. Texto em buffers do Arrow (snapshot compartilhado,
+        Db/SnapshotCompartilhado.py) só vira objetos str aqui, e só nas colunas realmente usadas,
+        com None nos nulos, como as colunas 'object' vindas do banco.
+        """
+        valores = self._valores.get(coluna)
+        if valores is None:
+            serie = self._tabela[coluna]
+            if isinstance(serie.dtype, (pd.StringDtype, pd.ArrowDtype)):
+                valores = serie.to_numpy(dtype=object, na_value=None)
+            else:
+                valores = serie.to_numpy()
+            self._valores[coluna] = valores
+        return valores
+
+    @staticmethod
+    def _montar_indice(df, colunas):
+        if len(colunas) == 1:
+            return pd.Index(df[colunas[0]])
+        return pd.MultiIndex.from_frame(df[colunas])
+
+    def __len__(self):
+        return len(self._indice)
+
+    def alerta_duplicadas(self, contexto):
+        """
+        Retorna a mensagem de alerta de chaves duplicadas (ou None se não houver).
+        """
+        if not self.linhas_duplicadas:
+            return None
+        return (f"{self.nome} (em {contexto}): {self.chaves_duplicadas} chaves duplicadas no De-Para "
+                f"({self.linhas_duplicadas} linhas ignoradas, usada a primeira ocorrência).")
+
+    def posicoes(self, df, chaves_esquerda):
+        """
+        Retorna, para cada linha de df, a posição da linha correspondente no De-Para (-1 = não encontrada).
+        """
+        chaves_esquerda = list(chaves_esquerda)
+        if len(chaves_esquerda) == 1 and isinstance(df[chaves_esquerda[0]].dtype, pd.CategoricalDtype):
+            # Chave categórica: busca só as categorias e expande pelos códigos
+            serie = df[chaves_esquerda[0]]
+            posicoes_categorias = self._indice.get_indexer(serie.cat.categories)
+            return pd.api.extensions.take(posicoes_categorias, serie.cat.codes.to_numpy(), allow_fill=True, fill_value=-1)
+        return self._indice.get_indexer(self._montar_indice(df, chaves_esquerda))
+
+    def valores(self, coluna, posicoes):
+        """
+        Retorna os valores da coluna do De-Para nas posições informadas (NaN onde a posição é -1).
+        """
+        return pd.api.extensions.take(self._coluna(coluna), posicoes, allow_fill=True)
+
+    def valores_categoricos(self, coluna, posicoes):
+        """
+        Como valores(), mas retorna um pd.Categorical (só para colunas 'object' do De-Para; as
+        numéricas seguem em valores(), que converte int -> float onde há NaN, como o merge).
+        """
+        if coluna not in self._categorias:
+            self._categorias[coluna] = pd.factorize(self._coluna(coluna))
+        codigos, categorias = self._categorias[coluna]
+        return pd.Categorical.from_codes(pd.api.extensions.take(codigos, posicoes, allow_fill=True, fill_value=-1), categorias)
+
+    def tabela(self):
+        """
+        Linhas do índice (sem chaves nulas ou duplicadas) como DataFrame: a linha i é a posição i.
+        """
+        return pd.DataFrame({coluna: self._coluna(coluna) for coluna in self.colunas}, columns=self.colunas)
+
+    def nomes_enriquecimento(self, colunas_df, chaves_esquerda, colunas=None):
+        """
+        Nomes usados por enriquecer(): ({coluna de df renomeada: novo nome}, {coluna do De-Para: nome no resultado}).
+        """
+        chaves_esquerda = list(chaves_esquerda)
+        if colunas is None:
+            # Como no merge: a chave do De-Para só não aparece quando tem o mesmo nome da chave da esquerda
+            colunas = [c for c in self.colunas if not (c in self.chaves and c in chaves_esquerda
+                                                        and self.chaves.index(c) == chaves_esquerda.index(c))]
+        repetidas = [c for c in colunas if c in colunas_df]
+        return {c: f"{c}_x" for c in repetidas}, {c: f"{c}_y" if c in repetidas else c for c in colunas}
+
+    def enriquecer(self, df, chaves_esquerda, colunas=None, categorico=False, posicoes=None):
+        """
+        Equivalente a df.merge(tabela_de_para, how="left", left_on=chaves_esquerda, right_on=chaves),
+        porém sem duplicar linhas e trazendo apenas as colunas pedidas.
+
+        :param df: DataFrame a enriquecer.
+        :param chaves_esquerda: Colunas de df que correspondem às chaves do De-Para.
+        :param colunas: Colunas do De-Para a trazer. Se None, traz todas (como o merge).
+        :param categorico: Se True, as colunas de texto do De-Para vêm como categóricas.
+        :param posicoes: Posições já calculadas para as linhas de df (ex: pelo motor DuckDB). Se None, busca as chaves.
+        :return: Novo DataFrame (índice 0..n-1, como o merge), com sufixos _x/_y em colunas repetidas.
+        """
+        renomear, destinos = self.nomes_enriquecimento(df.columns, chaves_esquerda, colunas)
+        if posicoes is None:
+            posicoes = self.posicoes(df, chaves_esquerda)
+        resultado = df.reset_index(drop=True)
+        if renomear:
+            resultado = resultado.rename(columns=renomear)
+
+        for coluna, destino in destinos.items():
+            if categorico and self._coluna(coluna).dtype == object:
+                resultado[destino] = self.valores_categoricos(coluna, posicoes)
+            else:
+                resultado[destino] = self.valores(coluna, posicoes)
+        return resultado
+
+
+# --- Índices compartilhados por snapshot de mapeamentos ---
+# Chave: id() da tabela De-Para. A referência fraca confirma que o id ainda é do mesmo DataFrame
+# (tabelas que não mudaram entre snapshots mantêm o mesmo objeto e reaproveitam o índice).
+_indices = {}
+_lock_indices = threading.Lock()
+
+
+def obter_indice_de_para(mapeamentos, nome_tabela, chaves, filtro=None, variante=None):
+    """
+    Retorna o IndiceDePara da tabela, construindo-o apenas na primeira chamada para aquele DataFrame.
+
+    :param mapeamentos: Dicionário de De-Paras (g.mapeamentos).
+    :param nome_tabela: Chave da tabela no dicionário.
+    :param chaves: Colunas da chave.
+    :param filtro: Função opcional df -> máscara booleana, aplicada antes de montar o índice.
+    :param variante: Nome que distingue índices da mesma tabela/chave com filtros diferentes.
+    """
+    df = mapeamentos[nome_tabela]
+    chave_cache = (id(df), tuple(chaves), variante)
+
+    with _lock_indices:
+        item = _indices.get(chave_cache)
+        if item is not None and item[0]() is df:
+            return item[1]
+
+    origem = df.loc[filtro(df)] if filtro is not None else df
+    indice = IndiceDePara(origem, chaves, nome=nome_tabela)
+
+    with _lock_indices:
+        # Remove índices de DataFrames que não existem mais
+        for chave_antiga in [k for k, (ref, _) in _indices.items() if ref() is None]:
+            del _indices[chave_antiga]
+        _indices[chave_cache] = (weakref.ref(df), indice)
+    return indice
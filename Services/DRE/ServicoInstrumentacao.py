@@ -0,0 +1,186 @@
+import os
+import sys
+import time
+import functools
+import threading
+import pandas as pd
+from Config import INSTRUMENTACAO
+
+
+def _pico_memoria_bytes():
+    """
+    Pico de memória residente (RSS) do processo até agora, em bytes. None se não for possível medir.
+    """
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico if sys.platform == "darwin" else pico * 1024 # Linux informa em KB
+    except ImportError:
+        pass
+
+    if os.name == "nt":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            kernel32, psapi = ctypes.windll.kernel32, ctypes.windll.psapi
+            kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+            psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+            contadores = PROCESS_MEMORY_COUNTERS()
+            contadores.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+            if psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(contadores), contadores.cb):
+                return contadores.PeakWorkingSetSize
+        except Exception:
+            pass
+    return None
+
+
+def _tamanho(objeto, memoria_profunda):
+    """
+    Retorna (linhas, bytes) de um DataFrame, lista de DataFrames ou dicionário de DataFrames.
+    """
+    if isinstance(objeto, pd.DataFrame):
+        return len(objeto), int(objeto.memory_usage(index=True, deep=memoria_profunda).sum())
+    if isinstance(objeto, dict):
+        objeto = list(objeto.values())
+    if isinstance(objeto, (list, tuple)):
+        linhas, memoria = 0, 0
+        for item in objeto:
+            if isinstance(item, pd.DataFrame):
+                l, m = _tamanho(item, memoria_profunda)
+                linhas, memoria = linhas + l, memoria + m
+        return linhas, memoria
+    return None, None
+
+
+class _RegistroEtapa:
+    """
+    Medição de uma etapa (usada dentro do 'with instrumentacao.etapa(...)').
+    """
+
+    def __init__(self, instrumentacao, nome):
+        self.instrumentacao = instrumentacao
+        self.dados = {"etapa": nome, "processo": os.getpid(), "linhas_entrada": None, "bytes_entrada": None,
+                      "linhas_saida": None, "bytes_saida": None}
+
+    def entrada(self, objeto):
+        self.dados["linhas_entrada"], self.dados["bytes_entrada"] = _tamanho(objeto, self.instrumentacao.memoria_profunda)
+
+    def saida(self, objeto):
+        self.dados["linhas_saida"], self.dados["bytes_saida"] = _tamanho(objeto, self.instrumentacao.memoria_profunda)
+
+    def __enter__(self):
+        self._pico_inicio = _pico_memoria_bytes()
+        self._cpu_inicio = time.thread_time()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        self.dados["segundos"] = round(time.perf_counter() - self._inicio, 4)
+        self.dados["cpu_segundos"] = round(time.thread_time() - self._cpu_inicio, 4)
+        pico_fim = _pico_memoria_bytes()
+        self.dados["pico_rss_delta_bytes"] = pico_fim - self._pico_inicio if pico_fim is not None else None
+        self.dados["pico_rss_bytes"] = pico_fim
+        self.dados["erro"] = repr(valor) if valor is not None else None
+        self.instrumentacao.registrar(self.dados)
+        return False
+
+
+class _RegistroNulo:
+    """
+    Usado quando a instrumentação está desligada: nenhuma medição, custo desprezível.
+    """
+
+    def entrada(self, objeto):
+        pass
+
+    def saida(self, objeto):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        return False
+
+
+_REGISTRO_NULO = _RegistroNulo()
+
+
+class Instrumentacao:
+    """
+    Coleta tempo (parede e CPU), pico de memória (RSS) e tamanho dos DataFrames de cada etapa do pipeline.
+
+    Uso:
+        with instrumentacao.etapa("Consolidação final") as registro:
+            registro.entrada(dfs)
+            ...
+            registro.saida(resultado)
+
+    ou, em métodos de serviço que têm o atributo self.instrumentacao, o decorator @medir_etapa.
+    """
+
+    def __init__(self, ativo=None, memoria_profunda=None):
+        """
+        :param ativo: Liga/desliga a coleta. Se None, usa Config.INSTRUMENTACAO["ativo"].
+        :param memoria_profunda: Se True, mede também o conteúdo das strings (memory_usage(deep=True), mais lento).
+        """
+        self.ativo = INSTRUMENTACAO["ativo"] if ativo is None else ativo
+        self.memoria_profunda = INSTRUMENTACAO["memoria_profunda"] if memoria_profunda is None else memoria_profunda
+        self.registros = []
+        self._lock = threading.Lock()
+
+    def etapa(self, nome):
+        if not self.ativo:
+            return _REGISTRO_NULO
+        return _RegistroEtapa(self, nome)
+
+    def registrar(self, dados):
+        with self._lock:
+            self.registros.append(dados)
+
+    def incorporar(self, registros):
+        """
+        Junta registros vindos de outro processo (modo "processos").
+        """
+        with self._lock:
+            self.registros.extend(registros)
+
+    def resumo(self):
+        """
+        Retorna a lista de registros (JSON serializável), na ordem em que as etapas terminaram.
+        """
+        with self._lock:
+            return list(self.registros)
+
+
+def medir_etapa(nome, entrada=None, saida=None):
+    """
+    Decorator para métodos de serviço: mede a etapa usando self.instrumentacao (se existir e estiver ativa).
+    :param nome: Nome da etapa nos registros.
+    :param entrada: Função opcional self -> DataFrame de entrada (para contar linhas/memória de entrada).
+    :param saida: Função opcional self -> DataFrame de saída. Se None, mede o retorno do método.
+    """
+    def decorator(metodo):
+        @functools.wraps(metodo)
+        def wrapper(self, *args, **kwargs):
+            instrumentacao = getattr(self, "instrumentacao", None)
+            if instrumentacao is None or not instrumentacao.ativo:
+                return metodo(self, *args, **kwargs)
+            with instrumentacao.etapa(nome) as registro:
+                if entrada is not None:
+                    registro.entrada(entrada(self))
+                resultado = metodo(self, *args, **kwargs)
+                registro.saida(saida(self) if saida is not None else resultado)
+            return resultado
+        return wrapper
+    return decorator
@@ -0,0 +1,225 @@
+import os
+import datetime as dt
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+from .ServicoEsquemaDimensoes import por_valores_distintos
+
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None # Sem o calamine, usa o openpyxl em modo somente leitura
+
+# Textos que o pd.read_excel trata como nulos (na_values padrão do pandas)
+TEXTOS_NULOS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+# Valores tratados como nulos: textos nulos do pandas + erros de fórmula do Excel (#DIV/0!, #REF!, ...)
+VALORES_NULOS = list(TEXTOS_NULOS | set(ERROR_CODES))
+
+# Extensões que o openpyxl consegue ler
+EXTENSOES_OPENPYXL = (".xlsx", ".xlsm")
+
+# Textos que o pd.read_excel converte em booleano (quando a coluna inteira é booleana)
+VALORES_BOOLEANOS = {"True": True, "TRUE": True, "true": True, "False": False, "FALSE": False, "false": False}
+
+
+class ServicoLeitorExcel:
+    """
+    Leitura em streaming de uma aba do Excel, só com as colunas pedidas.
+
+    O pd.read_excel monta a aba inteira em memória (todas as colunas, uma lista Python por linha)
+    antes de criar o DataFrame. Aqui as linhas são percorridas uma a uma (calamine, se instalado,
+    ou openpyxl em modo somente leitura) e só os valores das colunas pedidas vão para buffers
+    pré-alocados (um array por coluna). O resultado é o mesmo do pd.read_excel(header=N, usecols=...):
+      - o cabeçalho é a linha 'header' (nomes repetidos viram "Nome.1", vazios "Unnamed: i");
+      - números inteiros vêm como int; células vazias, textos nulos ("N/A", "NULL", ...) e erros viram NaN;
+      - cada coluna vira numérica se todos os valores forem números (ou textos numéricos) e
+        datetime64 se todos forem datas; caso contrário fica 'object';
+      - linhas vazias no meio são mantidas (NaN) e as do final são descartadas.
+    """
+
+    def __init__(self, motor=None):
+        """
+        :param motor: "calamine" ou "openpyxl". Se None, usa o calamine quando estiver instalado.
+        """
+        if motor is None:
+            motor = "calamine" if python_calamine is not None else "openpyxl"
+        if motor == "calamine" and python_calamine is None:
+            raise ValueError("Motor 'calamine' indisponível: instale o pacote python-calamine.")
+        if motor not in ("calamine", "openpyxl"):
+            raise ValueError(f"Motor inválido: {motor}. Use 'calamine' ou 'openpyxl'.")
+        self.motor = motor
+
+    def suporta(self, caminho, header, colunas):
+        """
+        Indica se a leitura pode ser feita aqui: colunas escolhidas, cabeçalho de uma linha e formato
+        suportado pelo motor. Nos demais casos (ex: cabeçalho MultiIndex) o chamador usa o pd.read_excel.
+        """
+        if not colunas or isinstance(header, bool) or not isinstance(header, (int, np.integer)):
+            return False
+        return self.motor == "calamine" or str(caminho).lower().endswith(EXTENSOES_OPENPYXL)
+
+    # ------------------------------------------------------------------
+    # Linhas da aba (por motor)
+    # ------------------------------------------------------------------
+
+    def _abrir(self, caminho, sheet_name):
+        """
+        :return: (iterador de linhas a partir da 1ª linha da planilha, deslocamento da 1ª coluna,
+                  estimativa do nº de linhas, função de fechamento).
+        """
+        if self.motor == "calamine":
+            livro = python_calamine.CalamineWorkbook.from_path(caminho)
+            nomes = livro.sheet_names
+            if isinstance(sheet_name, str) and sheet_name not in nomes:
+                raise ValueError(f"Aba '{sheet_name}' não encontrada no arquivo '{caminho}'.")
+            aba = livro.get_sheet_by_name(sheet_name if isinstance(sheet_name, str) else nomes[sheet_name])
+            # O calamine começa na 1ª linha da planilha, mas pula as colunas vazias à esquerda
+            return aba.iter_rows(), aba.start[1] if aba.start else 0, aba.total_height + 1, livro.close
+
+        livro = load_workbook(caminho, read_only=True, data_only=True)
+        if isinstance(sheet_name, str) and sheet_name not in livro.sheetnames:
+            livro.close()
+            raise ValueError(f"Aba '{sheet_name}' não encontrada no arquivo '{caminho}'.")
+        aba = livro[sheet_name] if isinstance(sheet_name, str) else livro.worksheets[sheet_name]
+        estimativa = aba.max_row or 0
+        aba.reset_dimensions() # A dimensão gravada no arquivo pode estar errada (como no pd.read_excel)
+        return aba.iter_rows(values_only=True), 0, estimativa, livro.close
+
+    # ------------------------------------------------------------------
+    # Cabeçalho
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _nomes_colunas(linha, deslocamento):
+        # Mesmas regras do pd.read_excel: vazios viram "Unnamed: i" e repetidos ganham ".1", ".2", ...
+        nomes = []
+        for i, valor in enumerate(linha):
+            valor = ServicoLeitorExcel._inteiro(valor)
+            vazio = valor is None or (isinstance(valor, str) and valor == "")
+            nomes.append(f"Unnamed: {i + deslocamento}" if vazio else valor)
+
+        contagem = {}
+        for i, nome in enumerate(nomes):
+            atual = contagem.get(nome, 0)
+            while atual > 0:
+                contagem[nome] = atual + 1
+                nome = f"{nome}.{atual}"
+                atual = contagem.get(nome, 0)
+            nomes[i] = nome
+            contagem[nome] = atual + 1
+        return nomes
+
+    @staticmethod
+    def _inteiro(valor):
+        return int(valor) if valor.__class__ is float and valor.is_integer() else valor
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def ler_aba(self, caminho, sheet_name=0, header=0, colunas=None):
+        """
+        Lê uma aba com as colunas pedidas.
+
+        :param sheet_name: Nome (ou índice) da aba.
+        :param header: Linha do cabeçalho (0 = 1ª linha da planilha), como no pd.read_excel.
+        :param colunas: Colunas a manter (comparação sem diferenciar maiúsculas/espaços).
+        :return: DataFrame com as colunas na ordem da planilha.
+        """
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(caminho)
+
+        linhas, deslocamento, estimativa, fechar = self._abrir(caminho, sheet_name)
+        try:
+            # 1. Cabeçalho: pula as linhas anteriores e escolhe as colunas
+            nomes = []
+            for numero, linha in enumerate(linhas):
+                if numero == header:
+                    nomes = self._nomes_colunas(linha, deslocamento)
+                    break
+
+            colunas_upper = {str(c).upper().strip() for c in colunas}
+            posicoes = [i for i, nome in enumerate(nomes) if str(nome).upper().strip() in colunas_upper]
+
+            # 2. Dados: um buffer 'object' por coluna, pré-alocado pela dimensão da aba (cresce se preciso).
+            # Textos repetidos (Conta, Filial, ...) passam a apontar para um único objeto str por coluna.
+            capacidade = max(estimativa - header - 1, 1024)
+            buffers = [np.empty(capacidade, dtype=object) for _ in posicoes]
+            textos = [{} for _ in posicoes]
+            colunas_buffer = list(zip(buffers, posicoes, textos))
+            vazio = "" if self.motor == "calamine" else None
+            total = ultima_com_dados = 0
+            for linha in linhas:
+                if total == capacidade:
+                    capacidade *= 2
+                    buffers = [np.resize(buffer, capacidade) for buffer in buffers]
+                    colunas_buffer = list(zip(buffers, posicoes, textos))
+                largura = len(linha)
+                for buffer, i, unicos in colunas_buffer:
+                    valor = linha[i] if i < largura else vazio
+                    buffer[total] = unicos.setdefault(valor, valor) if valor.__class__ is str else valor
+                total += 1
+                if linha.count(vazio) != largura:
+                    ultima_com_dados = total
+        finally:
+            linhas = linha = None # Libera a aba (o calamine a mantém inteira em memória) antes da conversão
+            fechar()
+
+        # 3. Linhas vazias do final (em todas as colunas da aba) não entram; cada buffer é liberado após a conversão
+        del colunas_buffer, textos
+        dados = {}
+        for i in posicoes:
+            dados[nomes[i]] = self._converter(buffers.pop(0)[:ultima_com_dados])
+        return pd.DataFrame(dados, columns=[nomes[i] for i in posicoes])
+
+    def _converter(self, valores):
+        """
+        Tipos de uma coluna, como no pd.read_excel: inteiros, nulos, numérico/booleano/'object'.
+        A detecção de datas (datetime64) fica com o construtor do DataFrame, como lá.
+        """
+        # Células: números inteiros como int e, no calamine, datas como datetime (o openpyxl já entrega assim)
+        combinar = dt.datetime.combine
+        meia_noite = dt.time()
+        valores = np.array([
+            int(v) if v.__class__ is float and v.is_integer()
+            else combinar(v, meia_noite) if v.__class__ is dt.date
+            else v
+            for v in valores
+        ] or [], dtype=object)
+
+        if not len(valores):
+            return valores
+
+        nulos = pd.isna(valores) | pd.Series(valores, dtype=object).isin(VALORES_NULOS).to_numpy()
+        valores[nulos] = np.nan
+
+        try:
+            return pd.to_numeric(valores)
+        except (ValueError, TypeError):
+            pass
+
+        # Colunas só com True/False (sem nulos) viram booleanas
+        if not nulos.any() and all(v.__class__ is bool or v in VALORES_BOOLEANOS for v in valores):
+            return np.array([VALORES_BOOLEANOS.get(v, v) for v in valores], dtype=bool)
+        return valores
+
+
+def tipar_texto(df, colunas):
+    """
+    Converte as colunas (as que existirem em df, comparando nomes sem espaços nas pontas) para texto
+    sem espaços nas pontas (astype(str).str.strip()), calculado uma vez por valor distinto.
+    Nulos viram "nan", como no astype(str). O resultado já sai categórico.
+    """
+    alvos = {str(c).strip() for c in colunas}
+    selecionadas = [coluna for coluna in df.columns if str(coluna).strip() in alvos]
+    if not selecionadas:
+        return df
+    df = df.copy(deep=False)
+    for coluna in selecionadas:
+        df[coluna] = por_valores_distintos(df, [coluna], lambda d: d[coluna].astype(str).str.strip())
+    return df
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+
+class ServicoLeitorOcupacao:
+    """
+    Leitor do layout 'Acompanhamento Pallets' (Ocupação de Armazém).
+
+    Cada aba é uma tabela dinâmica com cabeçalho em duas linhas (MultiIndex):
+      - nível 0: cliente (a planilha repete o nome nas subcolunas seguintes);
+      - nível 1: subcoluna ("Seco", "Frio", "TOTAL <cliente>", ...) ou "Mês" na coluna dos meses.
+    Linhas = meses.
+
+    Regras (as mesmas do processamento anterior, coluna a coluna):
+      1. Colunas numéricas com soma 0 são descartadas.
+      2. Cliente com uma única subcoluna: a coluna entra como está, com o nome original do cliente.
+      3. Cliente com várias subcolunas:
+         - subcolunas com "TOTAL" (no cliente ou na subcoluna) entram como estão;
+         - as demais são descartadas se o nome de algum cliente com TOTAL as identificar
+           (expressão regular, sem diferenciar maiúsculas) e, as que sobrarem, somadas por cliente.
+         Nesse grupo o nome do cliente vai em maiúsculas, sem parênteses nem apóstrofos e até a primeira vírgula.
+      4. Nomes de cliente com espaços normalizados; nomes com "level" (colunas sem cabeçalho) e linhas sem mês são descartados.
+
+    Tudo é decidido sobre os níveis do cabeçalho (custo proporcional ao nº de colunas);
+    os valores só são tocados no unpivot final, feito de uma vez para todas as abas.
+    """
+
+    def __init__(self, coluna_mes="Mês"):
+        """
+        :param coluna_mes: Texto do nível 1 que identifica a coluna dos meses (Config: "escrita_mes").
+        """
+        self.coluna_mes = coluna_mes
+
+    # ------------------------------------------------------------------
+    # Classificação das colunas de uma aba
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _nome_agrupado(nivel0):
+        # Nome do cliente no grupo com várias subcolunas (ver regra 3)
+        return (nivel0.astype(str).str.upper()
+                .str.replace(r"[()']", "", regex=True)
+                .str.split(",").str[0]
+                .str.strip())
+
+    @staticmethod
+    def _normalizar_clientes(nomes):
+        # Nomes que não são texto viram "nan", como no processamento anterior
+        nomes = pd.Series(nomes, dtype=object).str.strip().fillna("nan")
+        return nomes.str.replace(r"\s+", " ", regex=True).str.strip().to_numpy(dtype=object)
+
+    def desmontar(self, planilha, aba):
+        """
+        Classifica as colunas de uma aba e devolve os blocos (Mês x Clientes) a empilhar.
+
+        :param planilha: DataFrame lido com header=[4, 5] (colunas MultiIndex de 2 níveis).
+        :param aba: Nome da aba (vira a coluna "Filial").
+        :return: Lista de blocos {"valores": DataFrame (linhas = meses), "clientes": nomes, "mes": Series, "filial": aba}.
+        """
+        dados = planilha.fillna(0)
+        nivel0 = dados.columns.get_level_values(0)
+        nivel1 = dados.columns.get_level_values(1)
+
+        # 1. Colunas numéricas com soma 0
+        numericas = np.flatnonzero([pd.api.types.is_numeric_dtype(tipo) for tipo in dados.dtypes])
+        manter = np.ones(dados.shape[1], dtype=bool)
+        manter[numericas[dados.iloc[:, numericas].sum().to_numpy() == 0]] = False
+        dados, nivel0, nivel1 = dados.iloc[:, manter], nivel0[manter], nivel1[manter]
+
+        # 2. Coluna dos meses
+        eh_mes = np.asarray(nivel1 == self.coluna_mes)
+        if not eh_mes.any():
+            raise ValueError(f"Não foi possível encontrar a coluna '{self.coluna_mes}' para o pivot.")
+        mes = dados.iloc[:, np.flatnonzero(eh_mes)[0]]
+
+        # 3. Clientes com uma subcoluna x clientes com várias subcolunas
+        agrupada = np.asarray(nivel0.map(nivel0.value_counts()) > 1)
+        simples = ~agrupada & ~eh_mes
+
+        nome0 = pd.Index(nivel0.astype(str).str.upper())
+        nome1 = pd.Index(nivel1.astype(str).str.upper())
+        tem_total = np.asarray(nome0.str.contains("TOTAL", regex=False) | nome1.str.contains("TOTAL", regex=False))
+        nome_agrupado = self._nome_agrupado(nivel0)
+
+        posicoes_total = np.flatnonzero(agrupada & tem_total)
+        posicoes_sem_total = np.flatnonzero(agrupada & ~tem_total)
+
+        # Subcolunas sem TOTAL de clientes que já têm TOTAL não são somadas (evita contar em dobro)
+        if len(posicoes_total) and len(posicoes_sem_total):
+            padrao = "|".join(f"(?:{nome})" for nome in nome_agrupado[posicoes_total])
+            identificadas = (nome0[posicoes_sem_total].str.contains(padrao, case=False, regex=True)
+                             | nome1[posicoes_sem_total].str.contains(padrao, case=False, regex=True))
+            posicoes_sem_total = posicoes_sem_total[~np.asarray(identificadas)]
+
+        blocos = [{"valores": dados.iloc[:, np.flatnonzero(simples)], "clientes": nivel0[simples], "mes": mes, "filial": aba}]
+
+        if len(posicoes_total) or len(posicoes_sem_total):
+            # Soma das subcolunas sem TOTAL por cliente (clientes em ordem alfabética)
+            ordem = np.lexsort((nome1[posicoes_sem_total], nome0[posicoes_sem_total]))
+            posicoes_sem_total = posicoes_sem_total[ordem]
+            somadas = dados.iloc[:, posicoes_sem_total].T.groupby(nome_agrupado[posicoes_sem_total].to_numpy()).sum().T
+
+            totais = dados.iloc[:, posicoes_total]
+            totais.columns = nome_agrupado[posicoes_total]
+            valores = pd.concat([totais, somadas], axis=1) if len(posicoes_sem_total) else totais
+            blocos.append({"valores": valores, "clientes": valores.columns, "mes": mes, "filial": aba})
+
+        return blocos
+
+    # ------------------------------------------------------------------
+    # Unpivot de todas as abas
+    # ------------------------------------------------------------------
+
+    def empilhar(self, blocos):
+        """
+        Transforma os blocos de todas as abas em linhas (Mês, Cliente, Ocupação, Filial, Ano) de uma só vez.
+        A ordem das linhas é: aba, bloco, mês, cliente.
+        """
+        partes = {"Mês": [], "Cliente": [], "Ocupação": [], "Filial": [], "Ano": []}
+        for bloco in blocos:
+            valores = bloco["valores"]
+            if not valores.shape[1]:
+                continue
+
+            clientes = self._normalizar_clientes(bloco["clientes"])
+            colunas = ~pd.Series(clientes, dtype=object).str.contains("level", case=False, regex=False).to_numpy()
+            linhas = (bloco["mes"] != 0).to_numpy()
+            datas = pd.to_datetime(bloco["mes"][linhas], format="mixed", errors="coerce")
+            n_linhas, n_colunas = int(linhas.sum()), int(colunas.sum())
+
+            partes["Ocupação"].append(valores.to_numpy()[linhas][:, colunas].ravel())
+            partes["Cliente"].append(np.tile(clientes[colunas], n_linhas))
+            partes["Mês"].append(np.repeat(datas.dt.month.to_numpy(), n_colunas))
+            partes["Ano"].append(np.repeat(datas.dt.year.to_numpy(), n_colunas))
+            partes["Filial"].append(np.full(n_linhas * n_colunas, bloco["filial"], dtype=object))
+
+        if not partes["Ocupação"]:
+            return pd.DataFrame(columns=list(partes))
+        return pd.DataFrame({coluna: np.concatenate(valores) for coluna, valores in partes.items()})
@@ -0,0 +1,347 @@
+import numpy as np
+import pandas as pd
+from .ServicoClassificadorRazao import COLUNAS_SAIDA, SAIDA_PADRAO, identificador_sql, valor_sql
+from .ServicoEsquemaDimensoes import CHAVES_DE_PARA_RAZAO, COLUNAS_CONTAS_FALLBACK, categorizar
+from .ServicoIndiceDePara import obter_indice_de_para
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None # Sem o DuckDB, o Razão segue no motor pandas
+
+
+class ServicoMotorDuckDB:
+    """
+    Motor alternativo do Razão: os De-Paras (Centro de Custo, Item, Filial, Contas e fallback), o filtro
+    de depreciação e a classificação (regras de ServicoClassificadorRazao) em um único plano de consulta
+    do DuckDB, em processo (sem servidor). Joins, CASEs e agrupamentos rodam em paralelo em todos os
+    núcleos, sem processos ou threads do lado do Python.
+
+    O resultado é o mesmo do motor pandas, bit a bit:
+      - a consulta devolve a posição de cada linha em cada De-Para (IndiceDePara), a regra atribuída e o
+        grupo de saída (bloco + COLUNAS_SAIDA). O Razão enriquecido é montado dessas posições pelo mesmo
+        código do motor pandas (mesmos tipos e categorias);
+      - as somas de saldo ficam no pandas (soma compensada, na ordem das linhas), pois a ordem de soma
+        de um SUM paralelo não é determinística.
+    As regras são as mesmas Condicao do classificador, traduzidas para SQL com a mesma semântica de nulos.
+    """
+
+    # Apelido de cada tabela na consulta
+    APELIDOS = {"centro_custo": "cc", "item": "it", "filial": "fi", "contas": "ct", "contas_fallback": "fb"}
+
+    def __init__(self, threads=None):
+        """
+        :param threads: Threads do DuckDB. Se None, usa todos os núcleos da máquina.
+        """
+        if duckdb is None:
+            raise ValueError("Motor 'duckdb' indisponível: instale o pacote duckdb.")
+        self.threads = threads
+
+    @staticmethod
+    def disponivel():
+        return duckdb is not None
+
+    # ------------------------------------------------------------------
+    # Plano da consulta
+    # ------------------------------------------------------------------
+
+    def _juntar(self, indices, nome_indice, fontes, joins, chaves_join):
+        # Um De-Para: LEFT JOIN na tabela do índice (uma linha por chave), com os nomes de colunas de enriquecer()
+        indice, apelido = indices[nome_indice], self.APELIDOS[nome_indice]
+        chaves = CHAVES_DE_PARA_RAZAO[nome_indice]
+        condicao = " AND ".join(f"{self._expressao(fontes[esquerda])} = {apelido}.{identificador_sql(direita)}"
+                                for esquerda, direita in zip(chaves, indice.chaves))
+        joins.append(f"LEFT JOIN {identificador_sql(nome_indice)} {apelido} ON {condicao}")
+        chaves_join.extend([fontes[esquerda] for esquerda in chaves] + [(apelido, direita) for direita in indice.chaves])
+
+        renomear, destinos = indice.nomes_enriquecimento(list(fontes), chaves)
+        resultado = {renomear.get(nome, nome): fonte for nome, fonte in fontes.items()}
+        resultado.update({destino: (apelido, coluna) for coluna, destino in destinos.items()})
+        return resultado
+
+    @staticmethod
+    def _expressao(fonte):
+        apelido, coluna = fonte
+        return f"{apelido}.{identificador_sql(coluna)}"
+
+    def _plano(self, colunas_base, indices):
+        """
+        Joins e origem de cada coluna do Razão enriquecido, com os mesmos nomes de
+        ServicoRelatoriosDRE._enriquecer_razao (inclusive sufixos _x/_y).
+        :return: (joins, origens das chaves dos joins, {coluna: (fonte na chave composta, fonte no fallback)}),
+                 com fonte = (apelido da tabela, coluna) ou None (coluna nula naquela parte).
+        """
+        fontes = {coluna: ("r", coluna) for coluna in colunas_base}
+        joins, chaves_join = [], []
+        for nome_indice in ("centro_custo", "item", "filial"):
+            fontes = self._juntar(indices, nome_indice, fontes, joins, chaves_join)
+
+        # Chave composta: tabela (Conta, tipo_cc) -> Concat Razão calculada no pandas (mesmo texto do motor pandas)
+        joins.append(f'LEFT JOIN concat_razao k ON {self._expressao(fontes["Conta"])} IS NOT DISTINCT FROM k."Conta" '
+                     f'AND {self._expressao(fontes["tipo_cc"])} IS NOT DISTINCT FROM k."tipo_cc"')
+        chaves_join.extend([fontes["Conta"], fontes["tipo_cc"], ("k", "Conta"), ("k", "tipo_cc")])
+        fontes["Concat Razão"] = ("k", "Concat Razão")
+        composta = self._juntar(indices, "contas", fontes, joins, chaves_join)
+
+        # Fallback: linhas sem grupo financeiro na chave composta refazem o De-Para de Contas só pela Conta
+        fallback = {nome: fonte for nome, fonte in composta.items() if nome not in COLUNAS_CONTAS_FALLBACK}
+        fallback = self._juntar(indices, "contas_fallback", fallback, joins, chaves_join)
+
+        # Como no pd.concat das duas partes: colunas de uma parte só ficam nulas na outra
+        colunas = {nome: (composta.get(nome), fallback.get(nome))
+                   for nome in list(composta) + [nome for nome in fallback if nome not in composta]}
+        return joins, chaves_join, colunas
+
+    def _coluna_sql(self, colunas, nome):
+        direta, alternativa = colunas[nome]
+        if direta == alternativa:
+            return self._expressao(direta)
+        direta = self._expressao(direta) if direta else "NULL"
+        alternativa = self._expressao(alternativa) if alternativa else "NULL"
+        return f"CASE WHEN {self._fase(colunas)} THEN {alternativa} ELSE {direta} END"
+
+    def _fase(self, colunas):
+        # Verdadeira para as linhas do fallback (sem grupo financeiro na chave composta)
+        return f"({self._expressao(colunas['grupo_financeiro'][0])} IS NULL)"
+
+    @staticmethod
+    def _colunas_regras(classificador):
+        usadas = ["item"] # Chave do De-Para de depreciação
+        for regra in classificador.regras:
+            if regra["condicao"] is not None:
+                usadas.extend(regra["condicao"].colunas)
+            for fonte in {**SAIDA_PADRAO, **regra.get("saida", {})}.values():
+                usadas.extend(getattr(fonte, "colunas", []))
+        return list(dict.fromkeys(usadas))
+
+    @staticmethod
+    def _blocos_estaticos(classificador):
+        # Bloco de cada regra identificado pela primeira regra do bloco (-1 = descartada)
+        blocos, estaticos = {}, []
+        for indice, regra in enumerate(classificador.regras):
+            estaticos.append(-1 if regra.get("descartar") else blocos.setdefault(regra.get("bloco", regra["etapa"]), indice))
+        return estaticos
+
+    def _consulta_linhas(self, colunas, classificador, joins, total):
+        """
+        SQL da tabela 'linhas': uma linha por linha do Razão, com as posições nos De-Paras, a fase,
+        a regra, o bloco, as colunas de saída (s0..s6) e a sequência no Razão enriquecido.
+        :return: (SQL, {coluna de saída só com textos fixos: textos}); essas colunas saem como o número do texto.
+        """
+        usadas = self._colunas_regras(classificador)
+        apelidos = {nome: f"c{i}" for i, nome in enumerate(usadas)}
+        coluna_sql = apelidos.__getitem__
+
+        selecao = [f"COALESCE({apelido}._posicao, -1) AS _posicao_{nome}" for nome, apelido in self.APELIDOS.items()]
+        selecao += [f"{self._fase(colunas)} AS _fase"]
+        selecao += [f"{self._coluna_sql(colunas, nome)} AS {apelido}" for nome, apelido in apelidos.items()]
+
+        casos_regra, casos_bloco, casos_saida = [], [], {coluna: [] for coluna in COLUNAS_SAIDA}
+        estaticos = self._blocos_estaticos(classificador)
+        for indice, regra in enumerate(classificador.regras):
+            condicao = "TRUE" if regra["condicao"] is None else regra["condicao"].sql(coluna_sql)
+            casos_regra.append(f"WHEN {condicao} THEN {indice}")
+            if regra.get("descartar"):
+                continue
+            casos_bloco.append(f"WHEN {indice} THEN {estaticos[indice]}")
+            saida = {**SAIDA_PADRAO, **regra["saida"]}
+            for coluna in COLUNAS_SAIDA:
+                if coluna == "Filial UF" and regra.get("filial_por_depreciacao"):
+                    casos_saida[coluna].append((indice, None, f"dp.{identificador_sql('filial_uf')}"))
+                else:
+                    casos_saida[coluna].append((indice, saida[coluna], valor_sql(saida[coluna], coluna_sql)))
+
+        # Coluna com a mesma expressão em todas as regras (ex: Ano, Mês) dispensa o CASE, e coluna só com textos
+        # fixos (ex: Tabela) é agrupada pelo número do texto. Linhas descartadas ou sem regra têm _bloco nulo.
+        saidas, fixos = [], {}
+        for i, (coluna, casos) in enumerate(casos_saida.items()):
+            if len({expressao for _, _, expressao in casos}) == 1:
+                saidas.append(f"{casos[0][2]} AS s{i}")
+            elif all(isinstance(fonte, str) for _, fonte, _ in casos):
+                textos = list(dict.fromkeys(fonte for _, fonte, _ in casos))
+                fixos[coluna] = np.array(textos, dtype=object)
+                saidas.append(f"CASE _regra {' '.join(f'WHEN {indice} THEN {textos.index(fonte)}' for indice, fonte, _ in casos)} END AS s{i}")
+            else:
+                saidas.append(f"CASE _regra {' '.join(f'WHEN {indice} THEN {expressao}' for indice, _, expressao in casos)} END AS s{i}")
+        saidas = ", ".join(saidas)
+        return f"""
+            CREATE TEMP TABLE linhas AS
+            WITH enriquecido AS (
+                SELECT r._linha, r._desconsiderar, {", ".join(selecao)}
+                FROM razao r
+                {" ".join(joins)}
+            ), classificado AS (
+                SELECT *, CASE {" ".join(casos_regra)} ELSE -1 END AS _regra FROM enriquecido
+            )
+            SELECT _linha, _desconsiderar, {", ".join(f"_posicao_{nome}" for nome in self.APELIDOS)}, _fase, _regra,
+                   CASE _regra {" ".join(casos_bloco)} END AS _bloco,
+                   {saidas},
+                   CAST(_fase AS BIGINT) * {total} + _linha AS _sequencia
+            FROM classificado
+            LEFT JOIN depreciacao dp ON {coluna_sql("item")} = dp.{identificador_sql("item")}
+        """, fixos
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    def _fontes(self, base, indices, classificador):
+        # Plano da consulta e colunas usadas de cada tabela (joins e regras): {(apelido, coluna)}, ou None se
+        # alguma coluna das regras não existir no Razão enriquecido
+        joins, chaves_join, colunas = self._plano(list(base.columns), indices)
+        fontes = set(chaves_join) | {("dp", "item"), ("dp", "filial_uf")}
+        for nome in self._colunas_regras(classificador):
+            if nome not in colunas:
+                return joins, colunas, None
+            fontes.update(fonte for fonte in colunas[nome] if fonte is not None)
+        return joins, colunas, fontes
+
+    def _tabelas(self, base, indices, tabela_concat, mapeamentos):
+        tabelas = {apelido: indices[nome].tabela() for nome, apelido in self.APELIDOS.items()}
+        tabelas.update({"r": base, "k": tabela_concat,
+                        "dp": obter_indice_de_para(mapeamentos, "Item_De_Para_Filial_Depreciacao", ["item"]).tabela()})
+        return tabelas
+
+    @staticmethod
+    def _para_sql(df, colunas):
+        # Só as colunas usadas; textos como str puro (o DuckDB não lê subclasses, ex: numpy.str_)
+        convertidas = {}
+        for coluna in colunas:
+            serie = df[coluna]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                convertidas[coluna] = serie.cat.rename_categories(serie.cat.categories.map(str))
+            elif serie.dtype == object:
+                convertidas[coluna] = serie.map(str, na_action="ignore")
+            else:
+                convertidas[coluna] = serie
+        return pd.DataFrame(convertidas, index=df.index)
+
+    @staticmethod
+    def _texto(serie):
+        # Coluna só com textos (ou nulos): comparações e agrupamentos do SQL iguais aos do pandas
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            return pd.api.types.infer_dtype(serie.cat.categories, skipna=True) in ("string", "empty")
+        if serie.dtype == object:
+            return pd.api.types.infer_dtype(serie, skipna=True) in ("string", "empty")
+        return bool(serie.isna().all())
+
+    def suporta(self, base, indices, tabela_concat, classificador, mapeamentos):
+        """
+        Indica se o Razão e os De-Paras podem ir para o DuckDB: as colunas usadas nos joins e nas regras
+        só têm textos (ou nulos). Com outros tipos (ex: números misturados a textos), as comparações do
+        SQL não seriam as mesmas do pandas e o chamador usa o motor pandas.
+        """
+        _, _, fontes = self._fontes(base, indices, classificador)
+        if fontes is None:
+            return False
+        tabelas = self._tabelas(base, indices, tabela_concat, mapeamentos)
+        return all(self._texto(tabelas[apelido][coluna]) for apelido, coluna in fontes)
+
+    def executar(self, base, desconsiderar, indices, tabela_concat, classificador, mapeamentos):
+        """
+        Enriquece e classifica o Razão no DuckDB.
+
+        :param base: Razão lido (ServicoRelatoriosDRE._ler_razao, ou as linhas de um mês).
+        :param desconsiderar: Máscara das linhas retiradas pelo filtro de itens de depreciação (passo 9).
+        :param indices: IndiceDePara do Razão (ServicoRelatoriosDRE._indices_razao).
+        :param tabela_concat: Concat Razão de cada par (Conta, tipo_cc).
+        :return: dict com
+            "posicoes": {índice: posição de cada linha de base no De-Para (-1 = não encontrada)}, para enriquecer();
+            "regras": regra de cada linha do Razão enriquecido (chave composta, depois fallback; sem as desconsideradas);
+            "classificado": tabela classificada, como ServicoClassificadorRazao.classificar.
+        """
+        total = len(base)
+        joins, colunas, fontes = self._fontes(base, indices, classificador)
+        tabelas = self._tabelas(base, indices, tabela_concat, mapeamentos)
+        usadas = {apelido: [coluna for outro, coluna in sorted(fontes) if outro == apelido] for apelido in tabelas}
+        saidas = [f"s{i}" for i in range(len(COLUNAS_SAIDA))]
+
+        conexao = duckdb.connect(config={"threads": self.threads} if self.threads else {})
+        try:
+            # 1. Tabelas (só as colunas usadas): o Razão é lido direto do DataFrame; De-Paras já sem chaves repetidas
+            conexao.register("razao", self._para_sql(base, usadas["r"]).assign(
+                _linha=np.arange(total, dtype=np.int64), _desconsiderar=np.asarray(desconsiderar, dtype=bool)))
+            for nome_indice, apelido in self.APELIDOS.items():
+                tabela = self._para_sql(tabelas[apelido], usadas[apelido])
+                conexao.register(nome_indice, tabela.assign(_posicao=np.arange(len(tabela), dtype=np.int64)))
+            conexao.register("concat_razao", self._para_sql(tabelas["k"], usadas["k"]))
+            conexao.register("depreciacao", self._para_sql(tabelas["dp"], usadas["dp"]))
+
+            # 2. Enriquecimento + regras + colunas de saída, uma linha por linha do Razão
+            consulta, fixos = self._consulta_linhas(colunas, classificador, joins, total)
+            conexao.execute(consulta)
+
+            # 3. Grupos de saída (bloco + COLUNAS_SAIDA), com a primeira linha de cada um no Razão enriquecido
+            conexao.execute(f"""
+                CREATE TEMP TABLE grupos AS
+                SELECT *, CAST(row_number() OVER () - 1 AS BIGINT) AS _grupo FROM (
+                    SELECT _bloco, {", ".join(saidas)}, min(_sequencia) AS _primeira
+                    FROM linhas WHERE NOT _desconsiderar AND _bloco IS NOT NULL
+                    GROUP BY _bloco, {", ".join(saidas)}
+                )
+            """)
+            condicao = " AND ".join(["l._bloco = g._bloco"] + [f"l.{s} IS NOT DISTINCT FROM g.{s}" for s in saidas])
+            por_linha = conexao.execute(f"""
+                SELECT l._linha, {", ".join(f"l._posicao_{nome}" for nome in self.APELIDOS)}, l._fase, l._regra,
+                       COALESCE(g._grupo, -1) AS _grupo
+                FROM linhas l LEFT JOIN grupos g ON {condicao}
+            """).fetchnumpy()
+            grupos = conexao.execute(f"SELECT _grupo, _bloco, _primeira, {', '.join(saidas)} FROM grupos").df()
+        finally:
+            conexao.close()
+
+        # 4. De volta à ordem do Razão
+        linha = np.asarray(por_linha["_linha"])
+        def na_ordem(coluna, tipo=np.int64):
+            valores = np.empty(total, dtype=tipo)
+            valores[linha] = np.asarray(por_linha[coluna])
+            return valores
+        posicoes = {nome: na_ordem(f"_posicao_{nome}") for nome in self.APELIDOS}
+
+        # Razão enriquecido: linhas da chave composta, depois as do fallback (cada parte na ordem do arquivo)
+        fase = na_ordem("_fase", bool)
+        ordem = np.flatnonzero(~np.asarray(desconsiderar, dtype=bool))
+        ordem = ordem[np.lexsort((ordem, fase[ordem]))]
+        regras = na_ordem("_regra")[ordem]
+
+        # Valores de saída como no motor pandas: textos ('object'), com os textos fixos de volta no lugar dos números
+        grupos.columns = ["_grupo", "_bloco", "_primeira"] + COLUNAS_SAIDA
+        for coluna in COLUNAS_SAIDA:
+            if coluna in fixos:
+                grupos[coluna] = fixos[coluna][grupos[coluna].to_numpy()]
+            elif isinstance(grupos[coluna].dtype, pd.CategoricalDtype):
+                grupos[coluna] = grupos[coluna].astype(object)
+        classificado = self._totalizar(grupos, na_ordem("_grupo")[ordem], base["saldo"].to_numpy()[ordem],
+                                       regras, classificador)
+        return {"posicoes": posicoes, "regras": regras, "classificado": classificado}
+
+    def _totalizar(self, grupos, grupo_por_linha, saldo, regras, classificador):
+        """
+        Somas da classificação, na mesma ordem do motor pandas (ServicoClassificadorRazao.classificar):
+        parcial por bloco e chave (linhas na ordem do Razão enriquecido) e depois o total por chave.
+        """
+        # Categorias na ordem em que cada valor aparece pela primeira vez (como o categorizar da saída)
+        grupos = grupos.sort_values("_primeira", kind="mergesort").reset_index(drop=True)
+        chaves = categorizar(grupos[COLUNAS_SAIDA], COLUNAS_SAIDA)
+
+        # Como no groupby do pandas, grupos com alguma chave nula ficam de fora
+        validos = chaves.notna().all(axis=1).to_numpy()
+        posicao_grupo = np.empty(len(grupos), dtype=np.int64)
+        posicao_grupo[grupos["_grupo"].to_numpy()] = np.arange(len(grupos))
+        selecionadas = grupo_por_linha >= 0
+        selecionadas[selecionadas] = validos[posicao_grupo[grupo_por_linha[selecionadas]]]
+        somas = pd.Series(saldo[selecionadas]).groupby(posicao_grupo[grupo_por_linha[selecionadas]]).sum()
+
+        # Número do bloco como no motor pandas: primeira regra do bloco que tem linhas
+        numeros = classificador.numeros_blocos(regras)
+        blocos = np.full(len(classificador.regras), -1, dtype=np.int64)
+        for indice, estatico in enumerate(self._blocos_estaticos(classificador)):
+            if numeros[indice] >= 0:
+                blocos[estatico] = numeros[indice]
+
+        parciais = chaves.loc[validos, COLUNAS_SAIDA].assign(
+            bloco=blocos[grupos.loc[validos, "_bloco"].to_numpy(dtype=np.int64)],
+            saldo=somas.reindex(np.flatnonzero(validos)).to_numpy()
+        )
+        parciais = parciais.sort_values(["bloco"] + COLUNAS_SAIDA, kind="mergesort")
+        return classificador.totalizar(parciais[["bloco"] + COLUNAS_SAIDA + ["saldo"]].reset_index(drop=True))
@@ -0,0 +1,193 @@
+import os
+import glob
+import json
+import shutil
+import hashlib
+import threading
+from Config import PARTICOES_RAZAO
+from .ServicoCacheArquivos import gravar_dataframe_parquet, ler_dataframe_parquet
+
+
+class ServicoParticoesRazao:
+    """
+    Repositório local (Parquet) das saídas do Razão por partição (Ano, Mês).
+
+    Cada partição guarda o Razão enriquecido, a tabela classificada (agrupada) e os logs de
+    De-Para não encontrado daquele mês, em uma pasta identificada pela impressão digital da
+    partição (hash das linhas de entrada do mês + versão dos De-Paras e do código):
+
+        <diretorio>/<origem>/<Ano>_<Mês>_<digital>/<parte>.parquet
+
+    Meses fechados mantêm a mesma impressão digital e são lidos daqui; só os meses cujas linhas
+    mudaram são recalculados. Versões antigas de um mês são descartadas ao gravar a nova.
+    """
+
+    CHAVE_METADADOS = b"t_core_particao"
+
+    def __init__(self, diretorio, max_bytes=2 * 1024 ** 3):
+        """
+        :param diretorio: Pasta raiz das partições.
+        :param max_bytes: Tamanho máximo total. Acima disso, as partições usadas há mais tempo são removidas.
+        """
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+
+        # Contadores de uso (por processo)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Nomes
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _hash(valor):
+        return hashlib.sha256(json.dumps(valor, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+    def _pasta_origem(self, origem):
+        return os.path.join(self.diretorio, self._hash(os.path.abspath(origem)))
+
+    @staticmethod
+    def _prefixo(ano, mes):
+        # Ano/Mês vêm como texto ("2025", "3", ou "nan" para datas inválidas)
+        return f"{ano}_{mes}_".replace(os.sep, "-")
+
+    def _pasta_particao(self, origem, ano, mes, digital):
+        return os.path.join(self._pasta_origem(origem), f"{self._prefixo(ano, mes)}{digital}")
+
+    # ------------------------------------------------------------------
+    # Leitura e gravação
+    # ------------------------------------------------------------------
+
+    def ler(self, origem, ano, mes, digital):
+        """
+        Retorna {parte: DataFrame} da partição ou None se ela não existir (ou estiver corrompida).
+        """
+        pasta = self._pasta_particao(origem, ano, mes, digital)
+        if not os.path.isdir(pasta):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            partes = {os.path.basename(arquivo)[:-len(".parquet")]: ler_dataframe_parquet(arquivo, self.CHAVE_METADADOS)[0]
+                      for arquivo in glob.glob(os.path.join(pasta, "*.parquet"))}
+            os.utime(pasta) # Marca como usada recentemente (LRU)
+        except Exception as e:
+            print(f"AVISO: Partição do Razão inválida ({os.path.basename(pasta)}): {e}")
+            shutil.rmtree(pasta, ignore_errors=True)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return partes
+
+    def gravar(self, origem, ano, mes, digital, partes):
+        """
+        Grava as partes de uma partição (DataFrames vazios não são gravados) e descarta as versões antigas do mês.
+        """
+        pasta = self._pasta_particao(origem, ano, mes, digital)
+        temporaria = f"{pasta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(temporaria, exist_ok=True)
+            for nome, df in partes.items():
+                if df is not None and len(df):
+                    gravar_dataframe_parquet(df, os.path.join(temporaria, f"{nome}.parquet"), {"ano": ano, "mes": mes},
+                                             self.CHAVE_METADADOS)
+            # Troca atômica da pasta (se outro processo gravou a mesma partição antes, mantém a dele)
+            try:
+                os.rename(temporaria, pasta)
+            except OSError:
+                pass
+        except Exception as e:
+            print(f"AVISO: Não foi possível gravar a partição {ano}/{mes} do Razão: {e}")
+            return
+        finally:
+            shutil.rmtree(temporaria, ignore_errors=True)
+
+        for antiga in glob.glob(os.path.join(self._pasta_origem(origem), f"{glob.escape(self._prefixo(ano, mes))}*")):
+            if antiga != pasta and not antiga.endswith(".tmp"):
+                shutil.rmtree(antiga, ignore_errors=True)
+        self._aplicar_limite()
+
+    def descartar_ausentes(self, origem, chaves_atuais):
+        """
+        Remove as partições de meses que não existem mais na origem.
+        :param chaves_atuais: Conjunto de (Ano, Mês) presentes na leitura atual.
+        """
+        prefixos = {self._prefixo(ano, mes) for ano, mes in chaves_atuais}
+        for pasta in glob.glob(os.path.join(self._pasta_origem(origem), "*")):
+            nome = os.path.basename(pasta)
+            if not nome.endswith(".tmp") and nome[:-16] not in prefixos:
+                shutil.rmtree(pasta, ignore_errors=True)
+
+    # ------------------------------------------------------------------
+    # Limite de tamanho e invalidação
+    # ------------------------------------------------------------------
+
+    def _listar_particoes(self):
+        particoes = []
+        for pasta in glob.glob(os.path.join(self.diretorio, "*", "*")):
+            if pasta.endswith(".tmp"):
+                continue
+            try:
+                tamanho = sum(os.path.getsize(arquivo) for arquivo in glob.glob(os.path.join(pasta, "*.parquet")))
+                particoes.append((os.stat(pasta).st_mtime, tamanho, pasta))
+            except FileNotFoundError:
+                continue
+        return particoes
+
+    def _aplicar_limite(self):
+        """
+        Remove as partições usadas há mais tempo até o total ficar abaixo de max_bytes.
+        """
+        particoes = sorted(self._listar_particoes())
+        total = sum(tamanho for _, tamanho, _ in particoes)
+        for _, tamanho, pasta in particoes:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(pasta, ignore_errors=True)
+            print(f"  - Partições do Razão: removendo {os.path.basename(pasta)}")
+            total -= tamanho
+
+    def invalidar(self, origem=None):
+        """
+        Remove partições: só as da origem informada ou, se None, todas.
+        """
+        alvo = self._pasta_origem(origem) if origem else self.diretorio
+        shutil.rmtree(alvo, ignore_errors=True)
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def estatisticas(self):
+        particoes = self._listar_particoes()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "particoes": len(particoes),
+            "bytes": sum(tamanho for _, tamanho, _ in particoes),
+            "max_bytes": self.max_bytes,
+        }
+
+
+_repositorio_padrao = None
+_lock_repositorio_padrao = threading.Lock()
+
+
+def obter_particoes_razao():
+    """
+    Retorna a instância compartilhada do repositório, configurada por Config.PARTICOES_RAZAO
+    (None se o modo incremental estiver desligado).
+    """
+    global _repositorio_padrao
+    if not PARTICOES_RAZAO["ativo"]:
+        return None
+    with _lock_repositorio_padrao:
+        if _repositorio_padrao is None:
+            _repositorio_padrao = ServicoParticoesRazao(
+                PARTICOES_RAZAO["diretorio"],
+                max_bytes=PARTICOES_RAZAO["max_bytes"],
+            )
+        return _repositorio_padrao
@@ -0,0 +1,78 @@
+import os
+import uuid
+from .ServicoRelatoriosDRE import ServicoRelatoriosDRE
+from .ServicoRelatoriosRateio import ServicoRelatoriosRateio
+from .ServicoInstrumentacao import Instrumentacao
+from .ServicoExportacaoRelatorios import ServicoExportacaoRelatorios, FORMATOS_EXPORTACAO
+from .ServicoCacheResultados import obter_cache_resultados
+
+
+def executar_processamento_dre(progresso, mapeamentos, caminhos, diretorio_saida, formato="xlsx", compactar=True):
+    """
+    Trabalho completo de um "Processar": roda o consolidado e grava o arquivo de saída.
+    Executado pela fila de jobs (ServicoFilaJobs), fora da requisição HTTP.
+
+    :param progresso: Callback progresso(etapa, percentual) fornecido pela fila.
+    :param mapeamentos: Dicionário com os DataFrames De-Para (snapshot da requisição que criou o job).
+    :param caminhos: Config.CAMINHOS_ARQUIVOS.
+    :param diretorio_saida: Pasta de Downloads.
+    :param formato: Formato de saída (chave de FORMATOS_EXPORTACAO: "xlsx", "parquet", "csv.gz" ou "arrow").
+    :param compactar: Formatos colunares: True = um .zip; False = uma pasta com um arquivo por relatório.
+    :return: Dicionário com o nome do arquivo gerado (e os arquivos para download), as métricas por etapa
+             e o resumo da gravação (bytes/linhas por aba). Se as mesmas entradas já foram processadas
+             (ServicoCacheResultados), devolve o resultado anterior com "reaproveitado": True.
+    """
+    # 0. Resultado memoizado: mesmas entradas, mesmo snapshot de De-Paras e mesmo código
+    cache_resultados = obter_cache_resultados()
+    chave = None
+    if cache_resultados is not None:
+        try:
+            chave = cache_resultados.chave(caminhos, mapeamentos, formato, compactar)
+        except FileNotFoundError:
+            chave = None # A leitura abaixo reporta o arquivo ausente
+        reaproveitado = cache_resultados.obter(chave, diretorio_saida) if chave else None
+        if reaproveitado is not None:
+            progresso("Resultado reaproveitado (entradas sem alteração)", 100)
+            print(f"Entradas sem alteração: reaproveitando {reaproveitado['arquivo']} (gerado em {reaproveitado['gerado_em']}).")
+            return reaproveitado
+
+    # 1. Instancia os serviços (com um único coletor de métricas para o job inteiro)
+    instrumentacao = Instrumentacao()
+    rateio_service = ServicoRelatoriosRateio(mapeamentos, caminhos, instrumentacao=instrumentacao)
+    dre_service = ServicoRelatoriosDRE(mapeamentos, caminhos, instrumentacao=instrumentacao)
+
+    # 2. Executa a lógica principal
+    print("Iniciando processamento consolidado...")
+    relatorios = dre_service.consolidado(rateio_service, progresso=progresso)
+
+    # 3. Salva o arquivo físico
+    # Gera um nome aleatório (uuid) para evitar que dois usuários sobrescrevam o arquivo um do outro
+    etapa = f"Gerando {FORMATOS_EXPORTACAO[formato][0]}"
+    progresso(etapa, 90)
+    nome_base = f"DRE_Rentabilidade_{uuid.uuid4().hex[:8]}"
+    print(f"Salvando relatórios ({formato}) em: {os.path.join(diretorio_saida, nome_base)}")
+
+    # Excel em streaming (memória constante) ou um arquivo colunar por relatório
+    with instrumentacao.etapa(etapa) as registro:
+        registro.entrada(relatorios)
+        exportacao = ServicoExportacaoRelatorios().exportar(relatorios, diretorio_saida, nome_base, formato, compactar)
+    print(f"Relatórios gravados: {exportacao['linhas']} linhas, {exportacao['bytes'] / 1024 ** 2:.1f} MB em {exportacao['segundos']:.1f}s")
+
+    print(f"Processamento concluído. Arquivo gerado: {exportacao['arquivo']}")
+    resultado = {
+        "arquivo": exportacao["arquivo"],
+        "arquivos": exportacao["arquivos"],
+        "metricas": instrumentacao.resumo(),
+        "exportacao": exportacao,
+    }
+
+    # 4. Memoiza o resultado, desde que as entradas não tenham mudado durante o processamento
+    if chave:
+        try:
+            if cache_resultados.chave(caminhos, mapeamentos, formato, compactar) == chave:
+                cache_resultados.registrar(chave, resultado, diretorio_saida)
+            else:
+                print("AVISO: Arquivos de entrada alterados durante o processamento; resultado não memoizado.")
+        except OSError as e:
+            print(f"AVISO: Não foi possível memoizar o resultado: {e}")
+    return resultado
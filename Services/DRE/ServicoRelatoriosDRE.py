@@ -1,32 +1,71 @@
+import os
+import json
+import hashlib
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from .ServicoRelatoriosRateio import ServicoRelatoriosRateio
+from .ServicoCacheArquivos import obter_cache_arquivos
+from .ServicoClassificadorRazao import ServicoClassificadorRazao, COLUNAS_SAIDA
+from .ServicoEsquemaDimensoes import COLUNAS_DIMENSAO, COLUNAS_CATEGORICAS_RAZAO, CHAVES_DE_PARA_RAZAO, \
+    COLUNAS_CONTAS_FALLBACK, categorizar, unificar_categorias, por_valores_distintos, rotular
+from .ServicoCacheResultados import versao_codigo, versao_mapeamentos
+from .ServicoParticoesRazao import obter_particoes_razao
+from .ServicoIndiceDePara import obter_indice_de_para
+from .ServicoMotorDuckDB import ServicoMotorDuckDB
+from .ServicoDiagnosticoDePara import ServicoDiagnosticoDePara
+from .ServicoLeitorExcel import tipar_texto
+from .ServicoInstrumentacao import Instrumentacao, medir_etapa
+from Config import EXECUCAO
+
+# Carregadores do ServicoRelatoriosRateio, na ordem em que entram na consolidação
+ETAPAS_RATEIO = ["carregar_volume", "adequacao", "insumos", "faturamento", "ocupacao_armazem"]
+
+# De-Paras do Razão, na ordem em que são aplicados: {etapa: (descrição, colunas da chave no relatório de não encontrados)}
+ETAPAS_NAS_RAZAO = {
+    "centro_custo": ("Centro de Custo", ["Centro de Custo"]),
+    "item": ("Item", ["Item"]),
+    "filial": ("Filial", ["Filial"]),
+    "grupo": ("Grupo Contábil", ["Conta", "tipo_cc"]),
+}
+
+def _concat_razao(d):
+    """
+    Chave composta do De-Para de Contas: Conta + tipo_cc, como texto sem espaços nas pontas.
+    """
+    return (d["Conta"] + d["tipo_cc"]).astype(str).str.strip()
+
 
 class ServicoRelatoriosDRE:
     """
     Refatoração da classe Relatorios_DRE.
     Gerencia o processamento do Razão Contábil (DRE).
-    Mantém um 'estado' interno (self.Razao_Farma_Consolidado) que é modificado
-    destrutivamente conforme os métodos de recorte são chamados.
+    Mantém um 'estado' interno (self.Razao_Farma_Consolidado) com o Razão enriquecido,
+    que é classificado pelo motor de regras (ServicoClassificadorRazao).
     """
 
-    def __init__(self, mapeamentos, caminhos):
+    def __init__(self, mapeamentos, caminhos, cache_arquivos=None, instrumentacao=None):
         self.mapeamentos = mapeamentos
         self.caminhos = caminhos
+        self.cache_arquivos = cache_arquivos or obter_cache_arquivos() # Cache de ingestão (Parquet)
+        self.classificador = ServicoClassificadorRazao() # Regras de classificação do Razão
+        self.motor_duckdb = None # ServicoMotorDuckDB quando o motor do Razão é "duckdb" (definido em processar_razao)
+        self.instrumentacao = instrumentacao or Instrumentacao() # Métricas por etapa
         
         # Logs de erro
-        self.nas_de_para_razao = [] # Itens do Razão que não acharam De-Para
+        self.diagnostico = ServicoDiagnosticoDePara() # Itens do Razão que não acharam De-Para (contagem + amostra)
         self.nas_classificacao_razao = [] # Erros de lógica de classificação final
         self.alertas_tamanho = [] 
         
         self.razao_para_download = pd.DataFrame() # Cópia do DRE completo tratado
-        self.Razao_Farma_Consolidado = pd.DataFrame() # DRE de trabalho (será recortado)
+        self.Razao_Farma_Consolidado = pd.DataFrame() # DRE de trabalho (entrada da classificação)
 
         if not self.mapeamentos:
             raise ValueError("Mapeamentos (g.mapeamentos) não foram carregados.")
         if not self.caminhos:
             raise ValueError("Caminhos de arquivos (config.py) não foram carregados.")
 
+    @medir_etapa("Razão: tratar_razao", saida=lambda self: self.Razao_Farma_Consolidado)
     def tratar_razao(self):
         """
         ETAPA 1: CARGA E ENRIQUECIMENTO.
@@ -37,118 +76,120 @@ class ServicoRelatoriosDRE:
         4. Contas Contábeis (com lógica de Fallback)
         """
         print("Processando: Arquivo Razão (DRE)")
-        cfg = self.caminhos["DRE"]
-        Razao_Farma = pd.DataFrame()
+        Razao_Farma = self._ler_razao()
+
+        Razao_Farma = self._enriquecer_razao(Razao_Farma, self.diagnostico)
+        
+        # Salva o estado para uso nos próximos métodos
+        # (a classificação não altera o Razão, então não é preciso copiar)
+        self.razao_para_download = Razao_Farma
+        self.Razao_Farma_Consolidado = Razao_Farma
         
-        # 1. Leitura do Excel (pode ter múltiplas abas)
-        try:
-            excel_file = pd.ExcelFile(cfg["path"])
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Arquivo DRE não encontrado em: {cfg['path']}")
+        print("Processando: Arquivo Razão (DRE) - Finalizado")
 
+    def _ler_razao(self):
+        """
+        Passos 1 a 3 do tratar_razao: leitura das abas, limpeza de colunas, tipos e Ano/Mês (via Data).
+        """
+        cfg = self.caminhos["DRE"]
+        
+        # 1. Leitura do Excel (pode ter múltiplas abas), via cache, em streaming e só com as colunas do DRE
+        abas = []
         for i in cfg["sheet_name"]:
-            if i not in excel_file.sheet_names:
-                raise ValueError(f"Aba '{i}' não encontrada no arquivo DRE.")
             print(f"  - Lendo aba: {i}")
-            Razao = pd.read_excel(excel_file, sheet_name=i, header=cfg["header"])
-            Razao_Farma = pd.concat([Razao_Farma, Razao], ignore_index=True)
+            try:
+                abas.append(self.cache_arquivos.ler_excel(
+                    cfg["path"], sheet_name=i, header=cfg["header"], colunas=cfg.get("colunas_dre")
+                ))
+            except FileNotFoundError:
+                raise FileNotFoundError(f"Arquivo DRE não encontrado em: {cfg['path']}")
+        Razao_Farma = pd.concat(abas, ignore_index=True)
         
         # 2. Limpeza de Colunas
         Razao_Farma.columns = Razao_Farma.columns.astype(str).str.strip()
         if "Mês" in Razao_Farma.columns:
             Razao_Farma = Razao_Farma.drop(columns="Mês") # Recalcula mês via Data
-    
-        # Converte colunas chave para String para garantir merge correto
-        for coluna in cfg["colunas_str"]:
-            if coluna in Razao_Farma.columns:
-                Razao_Farma[coluna] = Razao_Farma[coluna].astype(str).str.strip()
 
-        Tamanho_Original = len(Razao_Farma)
-        
+        # Converte colunas chave para String para garantir merge correto (str + strip, categóricas).
+        # Depois do concat, como o tipo final da coluna: se uma aba tiver células vazias, o concat passa
+        # os números a float em todas ("10000" vira "10000.0") e as chaves têm que seguir o mesmo texto.
+        Razao_Farma = tipar_texto(Razao_Farma, cfg["colunas_str"])
+
         # 3. Conversão de Datas
         Razao_Farma["Data"] = pd.to_datetime(Razao_Farma["Data"], errors="coerce")
-        Razao_Farma["Ano"] = Razao_Farma["Data"].dt.year.astype(str)
-        Razao_Farma["Mês"] = Razao_Farma["Data"].dt.month.astype(str)
+        Razao_Farma["Ano"] = por_valores_distintos(Razao_Farma, ["Data"], lambda d: d["Data"].dt.year.astype(str))
+        Razao_Farma["Mês"] = por_valores_distintos(Razao_Farma, ["Data"], lambda d: d["Data"].dt.month.astype(str))
 
         # Remove coluna 'Grupo' se já vier no excel, pois vamos trazer do De-Para
         if "Grupo" in Razao_Farma.columns:
             Razao_Farma = Razao_Farma.drop(columns=["Grupo"])
 
+        # Demais colunas de texto repetitivas: categóricas desde a carga (menos memória; merges e regras usam os códigos)
+        return categorizar(Razao_Farma, COLUNAS_CATEGORICAS_RAZAO)
+
+    def _enriquecer_razao(self, Razao_Farma, diagnostico, posicoes=None):
+        """
+        Passos 4 a 9 do tratar_razao: De-Paras (Centro de Custo, Item, Filial, Contas) e filtro de depreciação.
+        Cada linha é tratada de forma independente das demais (por isso o Razão pode ser processado por mês).
+
+        :param Razao_Farma: Razão lido por _ler_razao (ou as linhas de um mês).
+        :param diagnostico: Coletor (ServicoDiagnosticoDePara) das linhas sem De-Para, por etapa (ETAPAS_NAS_RAZAO).
+        :param posicoes: Posições já calculadas nos De-Paras, {índice: array com uma posição por linha de Razao_Farma}
+                         (motor DuckDB). Se None, as chaves são buscadas aqui.
+        :return: Razão enriquecido, na ordem: linhas que casaram pela chave composta, depois as do fallback.
+        """
         # --- INÍCIO DOS MERGES (ENRIQUECIMENTO) ---
+        # Os De-Paras são índices de busca montados uma vez por snapshot (ServicoIndiceDePara):
+        # o enriquecimento não duplica linhas; chaves duplicadas são alertadas na construção.
+        
+        indices = self._indices_razao()
+        posicoes = posicoes or {}
         
         # 4. Merge: Centro de Custo
-        Razao_Farma = Razao_Farma.merge(
-            self.mapeamentos["DRE_De_Para_Centro_Custo"], 
-            how="left", left_on="Centro de Custo", right_on="centro_de_custo_id"
-        )
-        # Verifica duplicidade
-        if len(Razao_Farma) != Tamanho_Original:
-            self.alertas_tamanho.append(f"DRE_De_Para_Centro_Custo (Razão): alterou tamanho.")
+        Razao_Farma = indices["centro_custo"].enriquecer(Razao_Farma, CHAVES_DE_PARA_RAZAO["centro_custo"], categorico=True,
+                                                         posicoes=posicoes.get("centro_custo"))
         # Loga erros
         if Razao_Farma["centro_custo_desc"].isna().any():
-            self.nas_de_para_razao.append(Razao_Farma[Razao_Farma["centro_custo_desc"].isna()])
-            print(f"AVISO: {Razao_Farma['centro_custo_desc'].isna().sum()} linhas sem Centro de Custo.")
+            self._registrar_nas(diagnostico, "centro_custo", Razao_Farma, Razao_Farma["centro_custo_desc"].isna())
 
         # 5. Merge: Item Conta
-        Razao_Farma = Razao_Farma.merge(
-            self.mapeamentos["DRE_De_Para_Item_Conta"], 
-            how="left", left_on="Item", right_on="item"
-        )
-        if len(Razao_Farma) != Tamanho_Original:
-             self.alertas_tamanho.append(f"DRE_De_Para_Item_Conta (Razão): alterou tamanho.")
+        Razao_Farma = indices["item"].enriquecer(Razao_Farma, CHAVES_DE_PARA_RAZAO["item"], categorico=True,
+                                                 posicoes=posicoes.get("item"))
         if Razao_Farma["nome"].isna().any():
-            self.nas_de_para_razao.append(Razao_Farma[Razao_Farma["nome"].isna()])
-            print(f"AVISO: {Razao_Farma['nome'].isna().sum()} linhas sem Item.")
+            self._registrar_nas(diagnostico, "item", Razao_Farma, Razao_Farma["nome"].isna())
             
         # 6. Merge: Filial
-        Razao_Farma = Razao_Farma.merge(
-            self.mapeamentos["DRE_De_Para_Filial"], 
-            how="left", left_on="Filial", right_on="filial_nome"
-        )
-        if len(Razao_Farma) != Tamanho_Original:
-            self.alertas_tamanho.append(f"DRE_De_Para_Filial (Razão): alterou tamanho.")
+        Razao_Farma = indices["filial"].enriquecer(Razao_Farma, CHAVES_DE_PARA_RAZAO["filial"], categorico=True,
+                                                   posicoes=posicoes.get("filial"))
         if Razao_Farma["filial_uf"].isna().any():
-            self.nas_de_para_razao.append(Razao_Farma[Razao_Farma["filial_uf"].isna()])
-            print(f"AVISO: {Razao_Farma['filial_uf'].isna().sum()} linhas sem Filial.")
+            self._registrar_nas(diagnostico, "filial", Razao_Farma, Razao_Farma["filial_uf"].isna())
 
         # 7. Merge: Contas Contábeis (Lógica de Dupla Tentativa)
         # Tentativa 1: Chave Composta (Conta + TipoCC)
-        Razao_Farma["Concat Razão"] = (Razao_Farma["Conta"] + Razao_Farma["tipo_cc"]).astype(str).str.strip()
+        Razao_Farma["Concat Razão"] = por_valores_distintos(Razao_Farma, ["Conta", "tipo_cc"], _concat_razao)
         
-        Razao_Farma = Razao_Farma.merge(
-            self.mapeamentos["DRE_De_Para_Contas_Contabeis"], 
-            how='left',
-            left_on='Concat Razão',
-            right_on='concat_razao'
-        )
-        if len(Razao_Farma) != Tamanho_Original:
-            self.alertas_tamanho.append(f"DRE_De_Para_Contas_Contabeis (Razão): alterou tamanho.")
+        Razao_Farma = indices["contas"].enriquecer(Razao_Farma, CHAVES_DE_PARA_RAZAO["contas"], categorico=True,
+                                                   posicoes=posicoes.get("contas"))
 
         # Tentativa 2 (Fallback): Para quem não casou na chave composta, tenta só pela Conta.
-        # Pega o pedaço do De-Para que tem chave composta vazia (regra genérica)
-        fallback_merge = self.mapeamentos["DRE_De_Para_Contas_Contabeis"].loc[
-            self.mapeamentos["DRE_De_Para_Contas_Contabeis"]["concat_razao"].isna()
-        ]
+        # Usa o pedaço do De-Para que tem chave composta vazia (regra genérica)
         
         # Identifica linhas do Razão que falharam no primeiro merge (grupo_financeiro é vazio)
         sem_grupo = Razao_Farma["grupo_financeiro"].isna()
         
         # Separa e limpa colunas vazias do merge falho
-        df_sem_grupo = Razao_Farma[sem_grupo].drop(
-            columns=["conta", "descricao_completa", "descricao_resumida", "grupo", "grupo_financeiro"], 
-            errors="ignore"
-        )
+        df_sem_grupo = Razao_Farma[sem_grupo].drop(columns=COLUNAS_CONTAS_FALLBACK, errors="ignore")
         
-        # Reaplica merge só com a chave 'Conta'
-        df_sem_grupo = df_sem_grupo.merge(
-            fallback_merge, 
-            how="left", 
-            left_on="Conta", 
-            right_on="conta"
+        # Reaplica o De-Para só com a chave 'Conta'
+        posicoes_fallback = posicoes.get("contas_fallback")
+        df_sem_grupo = indices["contas_fallback"].enriquecer(
+            df_sem_grupo, CHAVES_DE_PARA_RAZAO["contas_fallback"], categorico=True,
+            posicoes=posicoes_fallback[sem_grupo.to_numpy()] if posicoes_fallback is not None else None
         )
         
         # Reintegra os dados (Sucesso da Tentativa 1 + Sucesso da Tentativa 2)
-        Razao_Farma = pd.concat([Razao_Farma[~sem_grupo], df_sem_grupo], ignore_index=True)
+        Razao_Farma = pd.concat(unificar_categorias([Razao_Farma[~sem_grupo], df_sem_grupo], COLUNAS_CATEGORICAS_RAZAO),
+                                ignore_index=True)
 
         # 8. Limpeza Pós-Merge (Remove colunas sujas _x, _y)
         colunas_para_remover = [
@@ -169,294 +210,400 @@ class ServicoRelatoriosDRE:
         Razao_Farma = Razao_Farma[colunas_finais]
 
         if Razao_Farma["grupo"].isna().any():
-            self.nas_de_para_razao.append(Razao_Farma[Razao_Farma["grupo"].isna()])
-            print(f"AVISO: {Razao_Farma['grupo'].isna().sum()} linhas sem Grupo Contábil.")
+            self._registrar_nas(diagnostico, "grupo", Razao_Farma, Razao_Farma["grupo"].isna())
 
         # 9. Filtro de Itens de Depreciação (Regra específica por UF)
-        Itens_Conta_Desconsiderar = self.mapeamentos["Item_De_Para_Filial_Depreciacao"].loc[
+        Razao_Farma = Razao_Farma.loc[~Razao_Farma["Item"].isin(self._itens_desconsiderar())]
+
+        return Razao_Farma
+
+    def _itens_desconsiderar(self):
+        """
+        Itens de depreciação retirados do Razão (filial_uf "DESC" em Item_De_Para_Filial_Depreciacao).
+        """
+        return self.mapeamentos["Item_De_Para_Filial_Depreciacao"].loc[
             self.mapeamentos["Item_De_Para_Filial_Depreciacao"]["filial_uf"] == "DESC", "item"
         ].unique()
-        
-        Razao_Farma = Razao_Farma.loc[~Razao_Farma["Item"].isin(Itens_Conta_Desconsiderar)]
-        
-        # Salva o estado para uso nos próximos métodos
-        self.razao_para_download = Razao_Farma.copy() 
-        self.Razao_Farma_Consolidado = Razao_Farma.copy()
-        
-        print("Processando: Arquivo Razão (DRE) - Finalizado")
 
-    def Embalagem_Adequa(self):
+    @staticmethod
+    def _registrar_nas(diagnostico, etapa, df, mascara):
+        descricao, chaves = ETAPAS_NAS_RAZAO[etapa]
+        linhas = diagnostico.registrar(f"Razão: {descricao}", df, mascara, chaves)
+        print(f"AVISO: {linhas} linhas sem {descricao}.")
+
+    def _indices_razao(self):
         """
-        ETAPA 2: RECORTE.
-        Identifica e remove do Razão linhas referentes a:
-        - Adequação (Folha)
-        - Embalagens
-        - Custos Financeiros / Depreciação
-        - Impostos (ISS, PIS, COFINS, etc)
-        - Taxas
-        
-        Retorna: Um DataFrame com todos esses itens formatados.
-        Efeito Colateral: Remove esses itens de self.Razao_Farma_Consolidado.
+        Índices De-Para usados no Razão (montados uma vez por snapshot), com alerta de chaves duplicadas.
         """
-        print("Processando: Recorte de Embalagem, Adequação, Financeiros, Impostos...")
-        
+        indices = {
+            "centro_custo": obter_indice_de_para(self.mapeamentos, "DRE_De_Para_Centro_Custo", ["centro_de_custo_id"]),
+            "item": obter_indice_de_para(self.mapeamentos, "DRE_De_Para_Item_Conta", ["item"]),
+            "filial": obter_indice_de_para(self.mapeamentos, "DRE_De_Para_Filial", ["filial_nome"]),
+            "contas": obter_indice_de_para(self.mapeamentos, "DRE_De_Para_Contas_Contabeis", ["concat_razao"]),
+            "contas_fallback": obter_indice_de_para(
+                self.mapeamentos, "DRE_De_Para_Contas_Contabeis", ["conta"],
+                filtro=lambda df: df["concat_razao"].isna(), variante="fallback"
+            ),
+        }
+        for indice in indices.values():
+            self._alertar_duplicadas(indice)
+        return indices
+
+    def _alertar_duplicadas(self, indice):
+        alerta = indice.alerta_duplicadas("Razão")
+        if alerta and alerta not in self.alertas_tamanho:
+            self.alertas_tamanho.append(alerta)
+            print(f"AVISO: {alerta}")
+
+    def _tabela_concat_razao(self, base, indice_centro_custo):
+        """
+        Chave composta (Concat Razão) de todos os pares (Conta, tipo_cc) possíveis, para o motor DuckDB:
+        Contas do Razão x tipos de centro de custo do De-Para (mais o nulo, das linhas sem De-Para).
+        """
+        contas = np.asarray(base["Conta"].unique(), dtype=object)
+        tipos = pd.unique(np.append(indice_centro_custo.tabela()["tipo_cc"].to_numpy(dtype=object), None))
+        pares = pd.DataFrame({"Conta": np.repeat(contas, len(tipos)), "tipo_cc": np.tile(tipos, len(contas))})
+        pares["Concat Razão"] = _concat_razao(pares)
+        return pares
+
+    def _enriquecer_e_classificar(self, base, diagnostico):
+        """
+        Passos 4 a 9 (_enriquecer_razao) e classificação de um Razão lido.
+        Com o motor DuckDB, joins e regras rodam no DuckDB e o Razão enriquecido é montado das posições
+        devolvidas; o motor pandas é usado se o DuckDB não suportar os tipos das colunas.
+        :return: (Razão enriquecido, tabela classificada, regra de cada linha do Razão enriquecido)
+        """
+        if self.motor_duckdb is not None:
+            indices = self._indices_razao()
+            tabela_concat = self._tabela_concat_razao(base, indices["centro_custo"])
+            if self.motor_duckdb.suporta(base, indices, tabela_concat, self.classificador, self.mapeamentos):
+                desconsiderar = base["Item"].isin(self._itens_desconsiderar()).to_numpy()
+                resultado = self.motor_duckdb.executar(base, desconsiderar, indices, tabela_concat,
+                                                       self.classificador, self.mapeamentos)
+                Razao_Farma = self._enriquecer_razao(base, diagnostico, resultado["posicoes"])
+                if len(Razao_Farma) != len(resultado["regras"]):
+                    raise RuntimeError("Motor DuckDB: número de linhas do Razão enriquecido diferente do classificado.")
+                return Razao_Farma, resultado["classificado"], resultado["regras"]
+            print("AVISO: Colunas do Razão ou dos De-Paras com valores que não são texto; usando o motor pandas.")
+            self.motor_duckdb = None # Demais meses (modo incremental) direto no pandas
+
+        Razao_Farma = self._enriquecer_razao(base, diagnostico)
+        df_classificado, regras_atribuidas = self.classificador.classificar(Razao_Farma, self.mapeamentos)
+        return Razao_Farma, df_classificado, regras_atribuidas
+
+    def _registrar_classificacao(self, df, regras_atribuidas):
+        # Linhas por etapa e 'Tabela Desconhecida' (logs da classificação)
+        for etapa, linhas in self.classificador.contagem_por_etapa(regras_atribuidas).items():
+            print(f"  - {etapa}: {linhas} linhas do Razão")
+
+        df_desconhecido = self._tabela_desconhecida(df, regras_atribuidas)
+        if df_desconhecido is not None:
+            self.nas_classificacao_razao.append(df_desconhecido)
+            print(f"AVISO: {len(df_desconhecido)} linhas não caíram em nenhuma regra e viraram 'Tabela Desconhecida'.")
+
+    @medir_etapa("Razão: classificar_razao", entrada=lambda self: self.Razao_Farma_Consolidado)
+    def classificar_razao(self):
+        """
+        ETAPAS 2 a 5: CLASSIFICAÇÃO DO RAZÃO (motor de regras).
+        Aplica em uma única passada a lista ordenada de regras de ServicoClassificadorRazao:
+        - Recortes (Adequação, Embalagens, Financeiros/Depreciação, Impostos, Taxas)
+        - Overhead e Indenizações
+        - Custos Alocados (Farma Direto/Indireto: Folha, Custos Operacionais, Temporários...)
+        Cada linha recebe a primeira regra verdadeira; o que não cai em nenhuma vira 'Tabela Desconhecida'.
+
+        Retorna: Um DataFrame agrupado com as tabelas de todas as etapas.
+        """
+        print("Processando: Classificação do Razão (motor de regras)...")
+
         if self.Razao_Farma_Consolidado.empty:
-            raise ValueError("O Razão (tratar_razao) deve ser executado antes de Embalagem_Adequa.")
-
-        df = self.Razao_Farma_Consolidado.copy()
-
-        # --- Adequação ---
-        # Regra: Item 10110 + Grupo PESSOAL OPER
-        mask_adeq = (df["Item"] == "10110") & (df["grupo"] == "PESSOAL OPER")
-        df_adequacao = df.loc[mask_adeq].copy()
-        df_adequacao["Tabela"] = "Folha Adequação"
-        df_adequacao = df_adequacao.rename(columns={"Título Conta": "Area", "grupo": "Grupo", "filial_uf": "Filial UF"})
-        df_adequacao = df_adequacao.groupby(["Tabela", "Ano", "Mês", "Filial UF", "Area", "Grupo", "Item"], as_index=False)["saldo"].sum()
-
-        # --- Embalagens ---
-        # Regra: Título Conta 'MATERIAL DE EMBALAGEM' (exceto se for adequação)
-        mask_embal = (df["Título Conta"] == "MATERIAL DE EMBALAGEM") & (~mask_adeq)
-        df_embalagens = df.loc[mask_embal].copy()
-        df_embalagens = df_embalagens.drop(columns={"grupo"}, errors='ignore')
-        df_embalagens["Tabela"] = "MATERIAL DE EMBALAGEM"
-        df_embalagens["Area"] = "Desconhecido"
-        df_embalagens = df_embalagens.rename(columns={"sigla": "Grupo", "filial_uf": "Filial UF"})
-        df_embalagens = df_embalagens.groupby(["Tabela", "Ano", "Mês", "Filial UF", "Area", "Grupo", "Item"], as_index=False)["saldo"].sum()
-
-        # --- Custos Financeiros e Depreciação ---
-        mask_fin = df["grupo_financeiro"].isin(["DEPREC/AMORT", "CUSTOS FINANCEIROS"]) & (~mask_adeq) & (~mask_embal)
-        df_fin = df.loc[mask_fin].copy()
-        df_fin = df_fin.drop(columns={"grupo"}, errors='ignore')
-        df_fin = df_fin.rename(columns={"Título Conta": "Area", "grupo_financeiro": "Grupo"})
-        df_fin["Tabela"] = "Custos Financeiros"
-
-        # Separa Depreciação para aplicar De-Para extra (Item -> Filial)
-        depre = df_fin[df_fin["Grupo"] == "DEPREC/AMORT"].copy().drop(columns=["filial_uf"])
-        depre["Item"] = depre["Item"].astype(str).str.strip()
-        depre = depre.merge(self.mapeamentos["Item_De_Para_Filial_Depreciacao"], how='left', on='item')
-        depre = depre.groupby(["Tabela", "Ano", "Mês", "filial_uf", "Grupo", "Area", "Item"], as_index=False)["saldo"].sum()
-        
-        outros_fin = df_fin[df_fin["Grupo"] != "DEPREC/AMORT"].copy()
-        outros_fin = outros_fin.groupby(["Tabela", "Ano", "Mês", "filial_uf", "Grupo", "Area", "Item"], as_index=False)["saldo"].sum()
-        
-        df_custos_fin = pd.concat([outros_fin, depre], ignore_index=True)
-        df_custos_fin = df_custos_fin.rename(columns={"filial_uf": "Filial UF"})
-
-        # --- ISS ---
-        mask_iss = (df["grupo"] == "ISS") & (~mask_adeq) & (~mask_embal) & (~mask_fin)
-        df_iss = df.loc[mask_iss].copy()
-        # Regra manual de De-Para para ISS (Item -> UF)
-        mapa_filial = {"10802": "GO", "10302": "SP", "10702": "RJ", "11002": "SC"}
-        df_iss["filial_uf_iss"] = df_iss["Item"].map(mapa_filial)
-        df_iss["filial_uf"] = df_iss["filial_uf_iss"].fillna(df_iss["filial_uf"])
-        df_iss["Tabela"] = "ISS"
-        df_iss["Area"] = "ISS"
-        df_iss = df_iss.rename(columns={"grupo": "Grupo", "filial_uf": "Filial UF"})
-        df_iss = df_iss.groupby(["Tabela", "Ano", "Mês", "Filial UF", "Area", "Grupo", "Item"], as_index=False)["saldo"].sum()
-
-        # --- Outros Impostos (PIS, COFINS, ICMS) ---
-        mask_outros_imp = df["grupo"].isin(["PIS", "COFINS", "ICMS"]) & (~mask_adeq) & (~mask_embal) & (~mask_fin) & (~mask_iss)
-        df_outros_imp = df.loc[mask_outros_imp].copy()
-        df_outros_imp["Tabela"] = "Outros Impostos"
-        df_outros_imp["Area"] = "Outros Impostos"
-        df_outros_imp = df_outros_imp.rename(columns={"grupo": "Grupo", "filial_uf": "Filial UF"})
-        df_outros_imp = df_outros_imp.groupby(["Tabela", "Ano", "Mês", "Filial UF", "Area", "Grupo", "Item"], as_index=False)["saldo"].sum()
-
-        # --- Taxas Operacionais ---
-        mask_taxas = (df["grupo"] == "IMPOSTOS OPER") & (~mask_adeq) & (~mask_embal) & (~mask_fin) & (~mask_iss) & (~mask_outros_imp)
-        df_taxas = df.loc[mask_taxas].copy()
-        # Classifica nome da tabela baseado no Centro de Custo e Sigla
-        df_taxas["Tabela"] = "Custos Operacionais Indiretos - Taxas"
-        df_taxas.loc[(df_taxas["centro_custo_desc"] == "Operação Armazenagem") & (df_taxas["sigla"] != "Desconhecido"), "Tabela"] = "Custos Operacionais - Taxas"
-        df_taxas.loc[(df_taxas["centro_custo_desc"] != "Operação Armazenagem") & (df_taxas["sigla"] != "Desconhecido"), "Tabela"] = "Custos Operacionais Outros - Taxas"
-        
-        df_taxas = df_taxas.drop(columns={"grupo"}, errors='ignore')
-        df_taxas = df_taxas.rename(columns={"sigla": "Grupo", "Título Conta": "Area", "filial_uf": "Filial UF"})
-        df_taxas = df_taxas.groupby(["Tabela", "Ano", "Mês", "Filial UF", "Area", "Grupo", "Item"], as_index=False)["saldo"].sum()
-        
-        # --- LÓGICA DESTRUTIVA: Atualiza o DataFrame principal ---
-        # Remove tudo que foi processado acima
-        self.Razao_Farma_Consolidado = df.loc[
-            ~mask_adeq & ~mask_embal & ~mask_fin & ~mask_iss & ~mask_outros_imp & ~mask_taxas
-        ].copy()
-        
-        print(f"Processando: Recortes 1 - Finalizado. {len(self.Razao_Farma_Consolidado)} linhas restantes no Razão.")
+            raise ValueError("O Razão (tratar_razao) deve ser executado antes da classificação.")
+
+        df = self.Razao_Farma_Consolidado
+        df_classificado, regras_atribuidas = self.classificador.classificar(df, self.mapeamentos)
 
-        # Retorna a união dos recortes
-        return pd.concat([df_adequacao, df_embalagens, df_custos_fin, df_iss, df_outros_imp, df_taxas], ignore_index=True)
+        # --- Contagem por etapa e Tratamento de Não Classificados ---
+        self._registrar_classificacao(df, regras_atribuidas)
 
-    def Overhead(self):
+        print("Processando: Classificação do Razão - Finalizado.")
+        return df_classificado
+
+    def _tabela_desconhecida(self, df, regras_atribuidas):
+        desconhecidas = regras_atribuidas == self.classificador.indice_regra("tabela_desconhecida")
+        if not desconhecidas.any():
+            return None
+        df_desconhecido = df.loc[desconhecidas].rename(columns={"grupo": "Area", "sigla": "Grupo", "filial_uf": "Filial UF"})
+        df_desconhecido["Tabela"] = "Tabela Desconhecida"
+        return df_desconhecido
+
+    @medir_etapa("Razão: carga, De-Paras e classificação (DuckDB)", saida=lambda self: self.Razao_Farma_Consolidado)
+    def processar_razao_duckdb(self):
         """
-        ETAPA 3: RECORTE DE OVERHEAD.
-        Separa custos não operacionais (Overhead) e Indenizações.
+        Mesmo resultado de tratar_razao + classificar_razao, com os De-Paras e as regras no motor DuckDB
+        (ServicoMotorDuckDB). A leitura do Excel e a montagem do Razão enriquecido continuam no pandas.
+        :return: Lista com o DataFrame classificado (como processar_razao).
         """
-        print("Processando: Recorte de Overhead...")
-        df = self.Razao_Farma_Consolidado.copy()
-        
-        # --- Overhead Não Operacional ---
-        # Regra: Tudo que não tiver TipoCC = "Oper"
-        mask_overhead = df["tipo_cc"] != "Oper"
-        df_overhead_nao_oper = df.loc[mask_overhead].copy()
-        df_overhead_nao_oper = df_overhead_nao_oper.rename(columns={"grupo": "Area", "filial_uf": "Filial UF"})
-        df_overhead_nao_oper[["Tabela", "Grupo", "Item"]] = "Overhead"
-        # Remove serviços (exceção específica)
-        df_overhead_nao_oper = df_overhead_nao_oper[df_overhead_nao_oper["Area"] != "SERVIÇOS"]
-        df_overhead_nao_oper = df_overhead_nao_oper.groupby(["Tabela", "Ano", "Mês", "Filial UF", "Area", "Grupo", "Item"], as_index=False)["saldo"].sum()
-        
-        # --- Indenização Trabalhista ---
-        # Regra: Conta específica '60301020108' que seja operacional
-        mask_indeniz = (df["Conta"] == "60301020108") & (df["tipo_cc"] == "Oper") & (~mask_overhead)
-        df_indenizacao = df.loc[mask_indeniz].copy()
-        df_indenizacao = df_indenizacao.rename(columns={"grupo": "Area", "filial_uf": "Filial UF"})
-        df_indenizacao[["Tabela", "Grupo", "Item"]] = "Overhead"
-        df_indenizacao = df_indenizacao.groupby(["Tabela", "Ano", "Mês", "Filial UF", "Area", "Grupo", "Item"], as_index=False)["saldo"].sum()
-        
-        # --- LÓGICA DESTRUTIVA ---
-        self.Razao_Farma_Consolidado = df.loc[~mask_overhead & ~mask_indeniz].copy()
-        
-        print(f"Processando: Overhead - Finalizado. {len(self.Razao_Farma_Consolidado)} linhas restantes no Razão.")
-        
-        return pd.concat([df_overhead_nao_oper, df_indenizacao], ignore_index=True)
+        print("Processando: Arquivo Razão (DRE) - motor DuckDB")
+        Razao_Farma, df_classificado, regras_atribuidas = self._enriquecer_e_classificar(self._ler_razao(), self.diagnostico)
+        self._registrar_classificacao(Razao_Farma, regras_atribuidas)
+
+        self.razao_para_download = Razao_Farma
+        self.Razao_Farma_Consolidado = Razao_Farma
+
+        print("Processando: Arquivo Razão (DRE) - Finalizado")
+        return [df_classificado]
+
+    # ------------------------------------------------------------------
+    # Modo incremental: Razão particionado por (Ano, Mês)
+    # ------------------------------------------------------------------
 
-    def farma_direto_indireto(self):
+    @medir_etapa("Razão: partições por mês (carga, De-Paras e classificação)", saida=lambda self: self.Razao_Farma_Consolidado)
+    def processar_razao_incremental(self, particoes):
         """
-        ETAPA 4: CLASSIFICAÇÃO INTERMÉDIA.
-        Marca nas linhas restantes se são 'Farma Direto' ou 'Farma Indireto'
-        baseado na coluna 'sigla' e 'centro_custo_desc'.
-        Esta marcação é temporária para uso no método 'custos_alocados'.
+        Mesmo resultado de tratar_razao + classificar_razao, recalculando só os meses alterados.
+
+        O enriquecimento e a classificação tratam cada linha de forma independente, e a classificação
+        agrupa por Ano/Mês; então o Razão pode ser dividido por (Ano, Mês) e cada mês processado sozinho.
+        A impressão digital de um mês é o hash das suas linhas de entrada (na ordem do arquivo) mais as
+        versões dos De-Paras e do código. Meses com a mesma impressão digital são lidos do repositório
+        (ServicoParticoesRazao); os demais são recalculados e gravados. Na montagem, as linhas voltam
+        para a ordem de uma execução completa (casadas pela chave composta, depois fallback; cada grupo
+        na ordem do arquivo) e a tabela classificada é reordenada pelas chaves, como no groupby.
+
+        :param particoes: Repositório de partições (ServicoParticoesRazao).
+        :return: Lista com o DataFrame classificado (como processar_razao).
         """
-        print("Processando: Classificação Farma Direto/Indireto...")
-        df = self.Razao_Farma_Consolidado # Modifica a referência direta
-        
-        df["Tabela_Consolidada"] = "Tabela" # Coluna temporária
-        
-        cond_direto = df["sigla"] != "Desconhecido"
-        cond_indireto = df["sigla"] == "Desconhecido"
-        cond_armazem = df["centro_custo_desc"] == "Operação Armazenagem"
-        cond_outros = df["centro_custo_desc"] != "Operação Armazenagem"
-
-        df.loc[cond_direto & cond_armazem, "Tabela_Consolidada"] = "Farma Direto"
-        df.loc[cond_direto & cond_outros, "Tabela_Consolidada"] = "Farma Direto"
-        df.loc[cond_indireto & cond_armazem, "Tabela_Consolidada"] = "Farma Indireto"
-        df.loc[cond_indireto & cond_outros, "Tabela_Consolidada"] = "Farma Indireto"
-
-        print("Processando: Classificação - Finalizado.")
-
-    def custos_alocados(self):
-        """
-        ETAPA 5: CUSTOS OPERACIONAIS FINAIS.
-        Classifica o que sobrou do Razão em tabelas finais:
-        - Folha Razão
-        - Custos Operacionais
-        - Temporários
-        - Indenizações / Descontos
-        """
-        print("Processando: Custos Alocados (restante do Razão)...")
-        df = self.Razao_Farma_Consolidado.copy()
-
-        # Definição das máscaras booleanas para facilitar leitura
-        cond_farma_direto = df["Tabela_Consolidada"] == "Farma Direto"
-        cond_farma_indireto = df["Tabela_Consolidada"] == "Farma Indireto"
-        cond_pessoal_oper = df["grupo"] == "PESSOAL OPER"
-        cond_oper_armazem = df["centro_custo_desc"] == "Operação Armazenagem"
-        cond_outros_armazem = df["centro_custo_desc"] != "Operação Armazenagem"
-
-        # Inicializa coluna Tabela para evitar warnings
-        df["Tabela"] = pd.Series(dtype='object') 
-
-        # --- Folha de Pagamento ---
-        df.loc[cond_farma_direto & cond_pessoal_oper & cond_oper_armazem, "Tabela"] = "Folha Razão"
-        df.loc[cond_farma_direto & cond_pessoal_oper & cond_outros_armazem, "Tabela"] = "Folha Razão Outros"
-        df.loc[cond_farma_indireto & cond_pessoal_oper, "Tabela"] = "Rateio Indiretos Operações"
-        
-        # --- Terceiros ---
-        cond_terceiros_oper = df["grupo"] == "TERCEIROS OPER"
-        cond_conta_temp = df["Conta"] == "60301020209" # Conta específica de temporários
-        df.loc[cond_farma_direto & cond_terceiros_oper, "Tabela"] = "Custos Operacionais"
-        df.loc[cond_farma_indireto & cond_conta_temp, "Tabela"] = "Custos Operacionais Indiretos"
-        df.loc[cond_farma_direto & cond_conta_temp, "Tabela"] = "Temporarios"
-        df.loc[cond_farma_indireto & cond_terceiros_oper, "Tabela"] = "Temporarios Indiretos"
-
-        # --- Informática, Armazenagem, Outros ---
-        cond_outros_grupos = df["grupo"].isin(["INFORMATICA OPER", "ARMAZENAGEM OPER", "OUTROS OPER"])
-        df.loc[cond_farma_direto & cond_outros_grupos & cond_oper_armazem, "Tabela"] = "Custos Operacionais"
-        df.loc[cond_farma_direto & cond_outros_grupos & cond_outros_armazem, "Tabela"] = "Custos Operacionais Outros"
-        df.loc[cond_farma_indireto & cond_outros_grupos, "Tabela"] = "Custos Operacionais Indiretos"
-
-        # --- Indenização / Descontos ---
-        cond_inden = df["grupo"] == "INDEN.MERCADORIAS"
-        df.loc[cond_farma_direto & cond_inden & cond_oper_armazem, "Tabela"] = "Indenização de Mercadorias"
-
-        cond_descontos = df["grupo"] == "DESCONTOS"
-        df.loc[cond_farma_direto & cond_descontos & cond_oper_armazem, "Tabela"] = "Descontos"
-
-        # --- Tratamento de Não Classificados ---
-        df = df.rename(columns={"grupo": "Area", "sigla": "Grupo", "filial_uf": "Filial UF"})
-        df["Tabela"] = df["Tabela"].fillna("Tabela Desconhecida")
-        
-        if "Tabela Desconhecida" in df["Tabela"].unique():
-            df_desconhecido = df[df["Tabela"] == "Tabela Desconhecida"]
-            if not df_desconhecido.empty:
-                self.nas_classificacao_razao.append(df_desconhecido)
-                print(f"AVISO: {len(df_desconhecido)} linhas não caíram em nenhuma regra e viraram 'Tabela Desconhecida'.")
-
-        # Agrupamento Final
-        df = df.groupby(["Tabela", "Ano", "Mês", "Filial UF", "Area", "Grupo", "Item"], as_index=False)["saldo"].sum()
-        
-        print("Processando: Custos Alocados - Finalizado.")
-        return df
+        print("Processando: Arquivo Razão (DRE) - modo incremental por mês")
+        origem = self.caminhos["DRE"]["path"]
+        base = self._ler_razao()
+        self._indices_razao() # Alertas de De-Para duplicado (mesmo sem nenhum mês recalculado)
+
+        contexto = {
+            "mapeamentos": versao_mapeamentos(self.mapeamentos),
+            "codigo": versao_codigo(),
+            "config": self.caminhos["DRE"],
+            "colunas": [f"{coluna}:{tipo}" for coluna, tipo in base.dtypes.items()],
+        }
+
+        grupos = base.groupby(["Ano", "Mês"], sort=False, observed=True).indices
+        saidas, recalculados = [], []
+        for (ano, mes), posicoes in grupos.items():
+            parte = base.iloc[posicoes].reset_index(drop=True)
+            digital = self._digital_particao(parte, contexto)
+            partes = particoes.ler(origem, ano, mes, digital)
+            if partes is None:
+                partes = self._calcular_particao(parte)
+                particoes.gravar(origem, ano, mes, digital, partes)
+                recalculados.append(f"{mes}/{ano}")
+            saidas.append((posicoes, partes))
+        particoes.descartar_ausentes(origem, set(grupos))
+        print(f"  - {len(grupos)} meses no Razão; recalculados: {', '.join(recalculados) if recalculados else 'nenhum'}")
+
+        # Montagem: Razão enriquecido e logs na ordem da execução completa
+        Razao_Farma = self._juntar_particoes(saidas, "razao")
+        for etapa, (descricao, chaves) in ETAPAS_NAS_RAZAO.items():
+            # Contagens somadas; amostras na ordem da execução completa (o coletor limita por chave)
+            amostra = self._juntar_particoes(saidas, f"nas_{etapa}")
+            if amostra is not None:
+                contagem = pd.concat([partes[f"contagem_{etapa}"] for _, partes in saidas if f"contagem_{etapa}" in partes],
+                                     ignore_index=True)
+                self.diagnostico.incorporar_etapa(f"Razão: {descricao}", chaves, contagem, amostra)
+                print(f"AVISO: {self.diagnostico.linhas(f'Razão: {descricao}')} linhas sem {descricao}.")
+        df_desconhecido = self._juntar_particoes(saidas, "desconhecidas")
+        if df_desconhecido is not None:
+            self.nas_classificacao_razao.append(df_desconhecido)
+            print(f"AVISO: {len(df_desconhecido)} linhas não caíram em nenhuma regra e viraram 'Tabela Desconhecida'.")
+
+        if Razao_Farma is None:
+            raise ValueError("O Razão não tem linhas após o tratamento.")
+        self.razao_para_download = Razao_Farma
+        self.Razao_Farma_Consolidado = Razao_Farma
+
+        # Tabela classificada: as chaves de meses diferentes nunca coincidem, basta reordenar
+        classificadas = [partes["classificado"] for _, partes in saidas if "classificado" in partes]
+        df_classificado = pd.concat(unificar_categorias(classificadas, COLUNAS_SAIDA), ignore_index=True)
+        df_classificado = df_classificado.sort_values(COLUNAS_SAIDA, kind="mergesort", ignore_index=True)
+
+        print("Processando: Arquivo Razão (DRE) - Finalizado")
+        return [df_classificado]
 
-    def consolidado(self, rateio_service: ServicoRelatoriosRateio):
+    @staticmethod
+    def _digital_particao(parte, contexto):
+        sha = hashlib.sha256(json.dumps(contexto, sort_keys=True, default=str).encode("utf-8"))
+        sha.update(pd.util.hash_pandas_object(parte, index=False).to_numpy().tobytes())
+        return sha.hexdigest()[:16]
+
+    def _calcular_particao(self, parte):
+        """
+        Enriquece e classifica as linhas de um mês.
+        As linhas levam '_ordem' (posição dentro do mês) e '_fase' (0 = chave composta, 1 = fallback)
+        para a montagem voltar à ordem da execução completa.
+        """
+        parte = parte.assign(_ordem=np.arange(len(parte)))
+        diagnostico = ServicoDiagnosticoDePara(self.diagnostico.amostras_por_chave)
+        Razao_Farma, df_classificado, regras_atribuidas = self._enriquecer_e_classificar(parte, diagnostico)
+
+        partes = {"razao": Razao_Farma, "classificado": df_classificado,
+                  "desconhecidas": self._tabela_desconhecida(Razao_Farma, regras_atribuidas)}
+        for etapa, (descricao, _) in ETAPAS_NAS_RAZAO.items():
+            registro = diagnostico.etapa(f"Razão: {descricao}")
+            if registro is not None:
+                partes[f"contagem_{etapa}"], partes[f"nas_{etapa}"] = registro[1], registro[2]
+
+        # Fase (só existe depois do merge de Contas): mesma regra do fallback em _enriquecer_razao
+        indice_contas = obter_indice_de_para(self.mapeamentos, "DRE_De_Para_Contas_Contabeis", ["concat_razao"])
+        for nome in ("razao", "nas_grupo", "desconhecidas"):
+            df = partes.get(nome)
+            if df is not None:
+                posicoes = indice_contas.posicoes(df, ["Concat Razão"])
+                partes[nome] = df.assign(_fase=pd.isna(indice_contas.valores("grupo_financeiro", posicoes)).astype(np.int8))
+        return partes
+
+    @staticmethod
+    def _juntar_particoes(saidas, nome):
+        """
+        Concatena uma parte de todos os meses na ordem da execução completa: (_fase, posição no arquivo).
+        Retorna None se nenhum mês tiver linhas nessa parte.
+        """
+        frames, ordem, fases = [], [], []
+        for posicoes, partes in saidas:
+            df = partes.get(nome)
+            if df is None or not len(df):
+                continue
+            frames.append(df)
+            ordem.append(posicoes[df["_ordem"].to_numpy()])
+            fases.append(df["_fase"].to_numpy() if "_fase" in df.columns else np.zeros(len(df), dtype=np.int8))
+        if not frames:
+            return None
+        df = pd.concat(unificar_categorias(frames, COLUNAS_CATEGORICAS_RAZAO), ignore_index=True)
+        df = df.take(np.lexsort((np.concatenate(ordem), np.concatenate(fases))))
+        return df.drop(columns=[coluna for coluna in ("_ordem", "_fase") if coluna in df.columns]).reset_index(drop=True)
+
+    @staticmethod
+    def _criar_motor(motor):
+        """
+        Motor do Razão: None (pandas) ou ServicoMotorDuckDB. Sem o pacote duckdb, segue no pandas.
+        """
+        motor = motor or EXECUCAO["motor_razao"]
+        if motor == "pandas":
+            return None
+        if motor != "duckdb":
+            raise ValueError(f"Motor do Razão inválido: '{motor}'. Use 'pandas' ou 'duckdb'.")
+        if not ServicoMotorDuckDB.disponivel():
+            print("AVISO: Motor 'duckdb' indisponível (pacote duckdb não instalado); usando o motor pandas.")
+            return None
+        return ServicoMotorDuckDB(threads=EXECUCAO["duckdb_threads"])
+
+    def processar_razao(self, progresso=None, motor=None):
+        """
+        Executa a cadeia completa do Razão (Carga -> Classificação).
+        Retorna a lista de DataFrames que entram na consolidação.
+        :param progresso: Callback opcional progresso(etapa, percentual), usado pela fila de jobs.
+        :param motor: "pandas" ou "duckdb" (De-Paras e regras). Se None, usa Config.EXECUCAO["motor_razao"].
+        """
+        progresso = progresso or _sem_progresso
+        self.motor_duckdb = self._criar_motor(motor)
+        particoes = obter_particoes_razao()
+        if particoes is not None:
+            progresso("Razão: partições por mês (carga, De-Paras e classificação)", 5)
+            return self.processar_razao_incremental(particoes)
+        if self.motor_duckdb is not None:
+            progresso("Razão: carga, De-Paras e classificação (DuckDB)", 5)
+            return self.processar_razao_duckdb()
+        progresso("Razão: carga e De-Paras", 5)
+        self.tratar_razao()
+        progresso("Razão: classificação (recortes, overhead e custos alocados)", 25)
+        return [self.classificar_razao()]
+
+    def _processar_em_paralelo(self, rateio_service, max_workers, progresso, motor=None):
+        """
+        Executa a cadeia do Razão e os 5 carregadores de Rateio em processos separados.
+        A leitura de Excel é CPU-bound (e segura o GIL), por isso processos e não threads.
+        Os logs de erro/alerta são reintegrados na mesma ordem da execução serial.
+        """
+        print(f"Processando em paralelo ({max_workers} processos)...")
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            instrumentar = self.instrumentacao.ativo
+            futuro_razao = executor.submit(_executar_cadeia_razao, self.mapeamentos, self.caminhos, instrumentar, motor)
+            futuros_rateio = [
+                executor.submit(_executar_carga_rateio, rateio_service.mapeamentos, rateio_service.caminhos, etapa, instrumentar)
+                for etapa in ETAPAS_RATEIO
+            ]
+
+            progresso("Razão e Rateios em paralelo", 5)
+
+            # Razão: restaura o estado do serviço como se tivesse rodado aqui
+            resultado_razao = futuro_razao.result()
+            progresso("Razão concluído", 35)
+            dfs_razao = resultado_razao.pop("dfs")
+            self.instrumentacao.incorporar(resultado_razao.pop("metricas"))
+            for atributo, valor in resultado_razao.items():
+                setattr(self, atributo, valor)
+
+            # Rateio: resultados e logs na ordem fixa de ETAPAS_RATEIO
+            dfs_rateio = []
+            for indice, (etapa, futuro) in enumerate(zip(ETAPAS_RATEIO, futuros_rateio)):
+                df, diagnostico, alertas, metricas = futuro.result()
+                progresso(f"Rateio: {etapa} concluído", 40 + 10 * indice)
+                dfs_rateio.append(df)
+                rateio_service.diagnostico.incorporar(diagnostico)
+                rateio_service.alertas_tamanho.extend(alertas)
+                self.instrumentacao.incorporar(metricas)
+
+        return dfs_razao, dfs_rateio
+
+    def consolidado(self, rateio_service: ServicoRelatoriosRateio, modo=None, max_workers=None, progresso=None, motor=None):
         """
         ETAPA FINAL: ORQUESTRAÇÃO.
         Chama todos os métodos na ordem correta, coleta os dataframes de Rateio
         e concatena tudo em um único resultado.
+        :param modo: "serial" ou "processos". Se None, usa Config.EXECUCAO["modo"].
+        :param max_workers: Nº máximo de processos no modo "processos". Se None, usa Config.EXECUCAO["max_workers"].
+        :param progresso: Callback opcional progresso(etapa, percentual), usado pela fila de jobs.
+        :param motor: Motor do Razão, "pandas" ou "duckdb". Se None, usa Config.EXECUCAO["motor_razao"].
         """
-        # 1. Processa o Razão (DRE) em etapas (Destrutivo)
-        self.tratar_razao()
-        df_recortes_1 = self.Embalagem_Adequa()
-        df_recortes_2 = self.Overhead()
-        self.farma_direto_indireto()
-        df_custos_finais = self.custos_alocados() # Processa o que sobrou
-
-        # 2. Processa os relatórios externos (via serviço injetado)
-        df_volumes = rateio_service.carregar_volume()
-        df_adequacao = rateio_service.adequacao()
-        df_insumos = rateio_service.insumos()
-        df_faturamento = rateio_service.faturamento()
-        df_ocupacao = rateio_service.ocupacao_armazem()
+        progresso = progresso or _sem_progresso
+        modo = modo or EXECUCAO["modo"]
+        max_workers = max_workers or EXECUCAO["max_workers"] or os.cpu_count()
+
+        if modo == "processos" and max_workers > 1:
+            # 1+2. Razão e Rateios ao mesmo tempo (tempo total ~ o do arquivo mais lento)
+            dfs_razao, dfs_rateio = self._processar_em_paralelo(rateio_service, max_workers, progresso, motor)
+        else:
+            # 1. Processa o Razão (DRE): carga + classificação por regras
+            dfs_razao = self.processar_razao(progresso, motor)
+
+            # 2. Processa os relatórios externos (via serviço injetado)
+            dfs_rateio = []
+            for indice, etapa in enumerate(ETAPAS_RATEIO):
+                progresso(f"Rateio: {etapa}", 40 + 10 * indice)
+                dfs_rateio.append(getattr(rateio_service, etapa)())
 
         # 3. Lista de todos os DataFrames a serem consolidados
-        dfs_finais = [
-            df_recortes_1,
-            df_recortes_2,
-            df_custos_finais,
-            df_volumes,
-            df_adequacao,
-            df_insumos,
-            df_faturamento,
-            df_ocupacao
-        ]
+        # (Razão classificado, Volumes, Adequação, Insumos, Faturamento, Ocupação)
+        dfs_finais = dfs_razao + dfs_rateio
 
         # 4. Concatena tudo (Union)
-        resultado_final = pd.concat(dfs_finais, ignore_index=True)
-
-        # 5. Tratamento final de Nulos e Agrupamento
-        cols_para_agrupar = ["Tabela", "Ano", "Mês", "Filial UF", "Grupo", "Area", "Item"]
-        for col in cols_para_agrupar:
-             if col in resultado_final.columns:
-                resultado_final[col] = resultado_final[col].astype(str).replace('nan', 'N/A').replace('None', 'N/A')
-             else:
-                raise ValueError(f"Coluna de agrupamento '{col}' ausente no DataFrame final.")
-
-        resultado_final = resultado_final.groupby(cols_para_agrupar, as_index=False)["saldo"].sum()
+        progresso("Consolidação final", 85)
+        with self.instrumentacao.etapa("Consolidação final") as registro:
+            registro.entrada(dfs_finais)
+            # Mesmas categorias em todas as tabelas: o concat continua categórico
+            resultado_final = pd.concat(unificar_categorias(dfs_finais, COLUNAS_DIMENSAO), ignore_index=True)
+
+            # 5. Tratamento final de Nulos e Agrupamento
+            # (rótulos de texto, nulos como 'N/A' e categorias em ordem alfabética: mesma ordem do groupby sobre texto)
+            for col in COLUNAS_DIMENSAO:
+                 if col in resultado_final.columns:
+                    resultado_final[col] = rotular(resultado_final[col])
+                 else:
+                    raise ValueError(f"Coluna de agrupamento '{col}' ausente no DataFrame final.")
+
+            resultado_final = resultado_final.groupby(COLUNAS_DIMENSAO, as_index=False, observed=True)["saldo"].sum()
+            registro.saida(resultado_final)
         
         print("CONSOLIDAÇÃO FINAL COMPLETA.")
 
         # 6. Prepara os relatórios de erro (para abas extras no Excel)
-        df_nas_depara_razao = pd.DataFrame()
-        if self.nas_de_para_razao:
-            df_nas_depara_razao = pd.concat(self.nas_de_para_razao, ignore_index=True).drop_duplicates()
+        df_nas_depara_razao = self.diagnostico.relatorio()
 
         # (Opcional) df_nas_classificacao_razao poderia ser exportado aqui também
         # df_nas_classificacao_razao = pd.concat(self.nas_classificacao_razao, ...)
@@ -469,4 +616,37 @@ class ServicoRelatoriosDRE:
             "Consolidado_DRE": self.razao_para_download,
             "De_Paras_Não_Encontrados": df_nas_depara_razao,
             "De_Paras_Rateio_Não_Encontrados": df_nas_depara_rateio
-        }
\ No newline at end of file
+        }
+
+
+def _sem_progresso(etapa, percentual):
+    pass
+
+
+# --- Funções de nível de módulo (precisam ser "picklable" para o ProcessPoolExecutor) ---
+
+def _executar_cadeia_razao(mapeamentos, caminhos, instrumentar=False, motor=None):
+    """
+    Roda a cadeia do Razão em um processo filho e devolve os DataFrames e o estado
+    que o processo pai precisa (Consolidado_DRE, logs de erro e métricas).
+    """
+    servico = ServicoRelatoriosDRE(mapeamentos, caminhos, instrumentacao=Instrumentacao(instrumentar))
+    dfs = servico.processar_razao(motor=motor)
+    return {
+        "dfs": dfs,
+        "razao_para_download": servico.razao_para_download,
+        "diagnostico": servico.diagnostico,
+        "nas_classificacao_razao": servico.nas_classificacao_razao,
+        "alertas_tamanho": servico.alertas_tamanho,
+        "metricas": servico.instrumentacao.resumo(),
+    }
+
+
+def _executar_carga_rateio(mapeamentos, caminhos, etapa, instrumentar=False):
+    """
+    Roda um único carregador de Rateio em um processo filho.
+    Retorna (DataFrame, diagnóstico de De-Para, alertas_tamanho, métricas).
+    """
+    servico = ServicoRelatoriosRateio(mapeamentos, caminhos, instrumentacao=Instrumentacao(instrumentar))
+    df = getattr(servico, etapa)()
+    return df, servico.diagnostico, servico.alertas_tamanho, servico.instrumentacao.resumo()
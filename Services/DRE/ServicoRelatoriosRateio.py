@@ -1,5 +1,9 @@
 import pandas as pd
-import re
+from .ServicoCacheArquivos import obter_cache_arquivos
+from .ServicoIndiceDePara import obter_indice_de_para
+from .ServicoInstrumentacao import Instrumentacao, medir_etapa
+from .ServicoLeitorOcupacao import ServicoLeitorOcupacao
+from .ServicoDiagnosticoDePara import ServicoDiagnosticoDePara
 
 class ServicoRelatoriosRateio:
     """
@@ -8,18 +12,22 @@ class ServicoRelatoriosRateio:
     nos arquivos auxiliares: Volumes, Adequação, Insumos, Faturamento e Ocupação.
     """
     
-    def __init__(self, mapeamentos, caminhos):
+    def __init__(self, mapeamentos, caminhos, cache_arquivos=None, instrumentacao=None):
         """
         Inicializa o serviço.
         :param mapeamentos: Dicionário com DataFrames das tabelas do banco de dados (De-Para).
         :param caminhos: Dicionário de configuração (Config.py) com caminhos dos arquivos Excel.
+        :param cache_arquivos: Cache de ingestão (ServicoCacheArquivos). Se None, usa o cache padrão do Config.py.
+        :param instrumentacao: Coletor de métricas por etapa (Instrumentacao). Se None, cria um conforme o Config.py.
         """
         self.mapeamentos = mapeamentos
         self.caminhos = caminhos
+        self.cache_arquivos = cache_arquivos or obter_cache_arquivos()
+        self.instrumentacao = instrumentacao or Instrumentacao()
         
         # Listas para acumular logs de erros e alertas durante o processamento
-        self.nas_de_para_rateio = []  # Registra linhas que não encontraram correspondência no De-Para
-        self.alertas_tamanho = []     # Registra se um merge duplicou linhas inesperadamente
+        self.diagnostico = ServicoDiagnosticoDePara() # Linhas que não encontraram correspondência no De-Para (contagem + amostra)
+        self.alertas_tamanho = []     # Registra chaves duplicadas nos De-Paras (ignoradas no enriquecimento)
 
         # Validação inicial para garantir que as dependências existem
         if not self.mapeamentos:
@@ -60,6 +68,19 @@ class ServicoRelatoriosRateio:
         # Retorna o DF com colunas corrigidas e a lista de colunas que devem ser mantidas
         return df, colunas_padrao_para_retornar
 
+    def _enriquecer(self, df, nome_tabela, chaves_tabela, chaves_df, colunas, contexto):
+        """
+        Método auxiliar que aplica um De-Para (equivalente a um merge left), trazendo só as colunas usadas.
+        Usa o índice de busca do snapshot de mapeamentos (montado uma vez, sem duplicar linhas).
+        """
+        indice = obter_indice_de_para(self.mapeamentos, nome_tabela, chaves_tabela)
+        alerta = indice.alerta_duplicadas(contexto)
+        if alerta:
+            self.alertas_tamanho.append(alerta)
+            print(f"AVISO: {alerta}")
+        return indice.enriquecer(df, chaves_df, colunas=colunas)
+
+    @medir_etapa("Rateio: carregar_volume")
     def carregar_volume(self):
         """
         Processa o arquivo 'Volumes - Base.xlsx'.
@@ -68,9 +89,9 @@ class ServicoRelatoriosRateio:
         print("Processando: Volumes Base")
         cfg = self.caminhos["Volumes_Base"]
         
-        # 1. Leitura do arquivo
+        # 1. Leitura do arquivo (via cache, apenas com as colunas configuradas)
         try:
-            df = pd.read_excel(cfg["path"])
+            df = self.cache_arquivos.ler_excel(cfg["path"], colunas=cfg["columns"])
         except FileNotFoundError:
             raise FileNotFoundError(f"Arquivo de Volumes Base não encontrado em: {cfg['path']}")
         
@@ -100,20 +121,10 @@ class ServicoRelatoriosRateio:
 
         # 5. Aplicação de De-Para (Cliente -> Grupo)
         # Filtra volumes zerados antes do merge para performance
-        df_filtrado = df[df["VOLUMES"] != 0].copy()
-        tamanho_antes = len(df_filtrado)
-        
-        # Merge Left Join com a tabela de abreviação
-        df = df_filtrado.merge(
-            self.mapeamentos["Volumes_De_Para_Abreviacao"],
-            how="left", left_on="CLIENTE", right_on="area"
-        ).drop(columns="area") # Remove coluna duplicada do merge
+        df_filtrado = df[df["VOLUMES"] != 0]
         
-        tamanho_depois = len(df)
-        
-        # Verifica se o merge duplicou registros (sinal de chave duplicada no De-Para)
-        if tamanho_antes != tamanho_depois:
-            self.alertas_tamanho.append(f"Volumes_De_Para_Abreviacao (em Volumes): {tamanho_antes} linhas antes vs {tamanho_depois} depois.")
+        # De-Para com a tabela de abreviação (traz só o 'grupo')
+        df = self._enriquecer(df_filtrado, "Volumes_De_Para_Abreviacao", ["area"], ["CLIENTE"], ["grupo"], "Volumes")
 
         # 6. Renomeação Final para o padrão do DRE Consolidado
         df = df.rename(columns={
@@ -123,8 +134,8 @@ class ServicoRelatoriosRateio:
 
         # 7. Log de Erros (Quem ficou sem Grupo?)
         if df["Grupo"].isna().any():
-            self.nas_de_para_rateio.append(df[df["Grupo"].isna()])
-            print(f"AVISO: {df['Grupo'].isna().sum()} linhas em Volumes não encontraram 'Grupo' no De-Para.")
+            linhas = self.diagnostico.registrar("Volumes: Grupo", df, df["Grupo"].isna(), ["Area"])
+            print(f"AVISO: {linhas} linhas em Volumes não encontraram 'Grupo' no De-Para.")
 
         # 8. Agrupamento (Soma dos Saldos)
         df = df.groupby(["Tabela", "Ano", "Mês", "Filial UF", "Area", "Grupo", "Item"], as_index=False)[["saldo"]].sum()
@@ -135,6 +146,7 @@ class ServicoRelatoriosRateio:
         print("Processando: Volumes Base - Finalizado")
         return df
     
+    @medir_etapa("Rateio: adequacao")
     def adequacao(self):
         """
         Processa o arquivo 'Quantidade - Adequação.xlsx'.
@@ -144,7 +156,7 @@ class ServicoRelatoriosRateio:
         cfg = self.caminhos["Adequacao"]
 
         try:
-            df = pd.read_excel(cfg["path"])
+            df = self.cache_arquivos.ler_excel(cfg["path"], colunas=cfg["columns"])
         except FileNotFoundError:
             raise FileNotFoundError(f"Arquivo de Adequação não encontrado em: {cfg['path']}")
             
@@ -167,19 +179,11 @@ class ServicoRelatoriosRateio:
         df["Tabela"] = "Relatório de Adequação"
 
         # De-Para (Cliente -> Grupo)
-        tamanho_antes = len(df)
-        df = df.merge(
-            self.mapeamentos["Volumes_De_Para_Abreviacao"], 
-            how="left", left_on="Cliente", right_on="area"
-        ).drop(columns="area")
-        tamanho_depois = len(df)
-        
-        if tamanho_antes != tamanho_depois:
-            self.alertas_tamanho.append(f"Volumes_De_Para_Abreviacao (em Adequação): {tamanho_antes} linhas antes vs {tamanho_depois} depois.")
+        df = self._enriquecer(df, "Volumes_De_Para_Abreviacao", ["area"], ["Cliente"], ["grupo"], "Adequação")
 
         if df["grupo"].isna().any():
-            self.nas_de_para_rateio.append(df[df["grupo"].isna()])
-            print(f"AVISO: {df['grupo'].isna().sum()} linhas em Adequação não encontraram 'Grupo' no De-Para.")
+            linhas = self.diagnostico.registrar("Adequação: Grupo", df, df["grupo"].isna(), ["Cliente"])
+            print(f"AVISO: {linhas} linhas em Adequação não encontraram 'Grupo' no De-Para.")
 
         # Renomeação e Agrupamento
         df = df.rename(columns={
@@ -191,6 +195,7 @@ class ServicoRelatoriosRateio:
         print("Processando: Adequação - Finalizado")
         return df
 
+    @medir_etapa("Rateio: insumos")
     def insumos(self):
         """
         Processa o arquivo 'Insumos.xlsx'.
@@ -200,7 +205,7 @@ class ServicoRelatoriosRateio:
         cfg = self.caminhos["Insumos"]
         
         try:
-            df = pd.read_excel(cfg["path"])
+            df = self.cache_arquivos.ler_excel(cfg["path"], colunas=cfg["columns"])
         except FileNotFoundError:
             raise FileNotFoundError(f"Arquivo de Insumos não encontrado em: {cfg['path']}")
 
@@ -212,31 +217,18 @@ class ServicoRelatoriosRateio:
         df["Ano"] = df["ID"].str[:4] # Extrai Ano dos primeiros 4 dígitos do ID
 
         # --- MERGE 1: CLIENTES (Para descobrir a Filial UF) ---
-        tamanho_antes = len(df)
-        df = df.merge(
-            self.mapeamentos["Embalagens_De_Para_Clientes"], 
-            how='left', left_on='NOMECLI', right_on='nome_cliente'
-        )
-        if len(df) != tamanho_antes:
-            self.alertas_tamanho.append(f"Embalagens_De_Para_Clientes (em Insumos): alterou tamanho.")
+        df = self._enriquecer(df, "Embalagens_De_Para_Clientes", ["nome_cliente"], ["NOMECLI"], ["filial_uf"], "Insumos")
             
         if df["filial_uf"].isna().any():
-            self.nas_de_para_rateio.append(df[df["filial_uf"].isna()])
-            print(f"AVISO: {df['filial_uf'].isna().sum()} linhas em Insumos não encontraram 'Filial UF'.")
+            linhas = self.diagnostico.registrar("Insumos: Filial UF", df, df["filial_uf"].isna(), ["NOMECLI"])
+            print(f"AVISO: {linhas} linhas em Insumos não encontraram 'Filial UF'.")
 
         # --- MERGE 2: VOLUMES/ABREVIAÇÃO (Para descobrir o Grupo) ---
-        tamanho_antes = len(df)
-        df = df.merge(
-            self.mapeamentos["Volumes_De_Para_Abreviacao"], 
-            how='left', left_on='Depositante', right_on='area'
-        ).drop(columns="area")
-        
-        if len(df) != tamanho_antes:
-            self.alertas_tamanho.append(f"Volumes_De_Para_Abreviacao (em Insumos): alterou tamanho.")
+        df = self._enriquecer(df, "Volumes_De_Para_Abreviacao", ["area"], ["Depositante"], ["grupo"], "Insumos")
 
         if df["grupo"].isna().any():
-            self.nas_de_para_rateio.append(df[df["grupo"].isna()])
-            print(f"AVISO: {df['grupo'].isna().sum()} linhas em Insumos não encontraram 'Grupo'.")
+            linhas = self.diagnostico.registrar("Insumos: Grupo", df, df["grupo"].isna(), ["Depositante"])
+            print(f"AVISO: {linhas} linhas em Insumos não encontraram 'Grupo'.")
 
         # Renomeação e Agrupamento
         df = df.rename(columns={
@@ -251,6 +243,7 @@ class ServicoRelatoriosRateio:
         print("Processando: Insumos - Finalizado")
         return df
 
+    @medir_etapa("Rateio: faturamento")
     def faturamento(self):
         """
         Processa o arquivo 'Faturamento 2025.xlsx'.
@@ -259,10 +252,11 @@ class ServicoRelatoriosRateio:
         cfg = self.caminhos["Faturamento"]
         
         try:
-            df = pd.read_excel(
+            df = self.cache_arquivos.ler_excel(
                 cfg["path"],
                 sheet_name=cfg["sheet_name"],
-                header=cfg["header"]
+                header=cfg["header"],
+                colunas=cfg["columns"]
             )
         except FileNotFoundError:
             raise FileNotFoundError(f"Arquivo de Faturamento não encontrado em: {cfg['path']}")
@@ -289,17 +283,11 @@ class ServicoRelatoriosRateio:
         df["ANO"] = df["ANO"].astype(str).str.split(r'[. ]').str[0]
 
         # De-Para (Filial Nome -> Filial UF)
-        tamanho_antes = len(df)
-        df = df.merge(
-            self.mapeamentos["DRE_De_Para_Filial"], 
-            how='left', left_on="FILIAL", right_on="filial_nome"
-        )
-        if len(df) != tamanho_antes:
-             self.alertas_tamanho.append(f"DRE_De_Para_Filial (em Faturamento): alterou tamanho.")
+        df = self._enriquecer(df, "DRE_De_Para_Filial", ["filial_nome"], ["FILIAL"], ["filial_uf"], "Faturamento")
         
         if df["filial_uf"].isna().any():
-            self.nas_de_para_rateio.append(df[df["filial_uf"].isna()])
-            print(f"AVISO: {df['filial_uf'].isna().sum()} linhas em Faturamento não encontraram 'Filial UF'.")
+            linhas = self.diagnostico.registrar("Faturamento: Filial UF", df, df["filial_uf"].isna(), ["FILIAL"])
+            print(f"AVISO: {linhas} linhas em Faturamento não encontraram 'Filial UF'.")
 
         # Padronização Final
         df["Tabela"] = "Faturamento"
@@ -313,182 +301,40 @@ class ServicoRelatoriosRateio:
         print("Processando: Faturamento - Finalizado")
         return df
 
+    @medir_etapa("Rateio: ocupacao_armazem")
     def ocupacao_armazem(self):
         """
         Processa o arquivo 'Acompanhamento Pallets'.
-        Lógica COMPLEXA devido ao formato 'pivotado' e multi-header do Excel original.
-        As colunas são datas dinâmicas e há colunas de totais que precisam ser ignoradas.
+        O Excel original é 'pivotado' (clientes nas colunas, meses nas linhas) e tem cabeçalho em duas linhas,
+        com colunas de totais. A interpretação do layout fica no ServicoLeitorOcupacao.
         """
         print("Processando: Ocupação Armazém")
         cfg = self.caminhos["Ocupacao_Armazem"]
-        abas = cfg["sheet_name"]
-        df_final_ocupacao = pd.DataFrame()
-        
-        try:
-            excel_file = pd.ExcelFile(cfg["path"])
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Arquivo de Ocupação não encontrado em: {cfg['path']}")
+        leitor = ServicoLeitorOcupacao(cfg["escrita_mes"])
+
+        # Classifica as colunas de cada aba (SP, SC, RJ, GO) pelo cabeçalho
+        blocos = []
+        for aba in cfg["sheet_name"]:
+            print(f"  - Processando aba: {aba}")
+            # Lê com MultiIndex (Header nas linhas 4 e 5), via cache
+            try:
+                planilha = self.cache_arquivos.ler_excel(cfg["path"], sheet_name=aba, header=cfg["header"])
+            except FileNotFoundError:
+                raise FileNotFoundError(f"Arquivo de Ocupação não encontrado em: {cfg['path']}")
+            blocos.extend(leitor.desmontar(planilha, aba))
+
+        # Unpivot (Mês x Cliente -> linhas) de todas as abas de uma vez
+        df = leitor.empilhar(blocos)
 
-        for i in abas:
-            print(f"  - Processando aba: {i}")
-            if i not in excel_file.sheet_names:
-                raise ValueError(f"Aba '{i}' não encontrada no arquivo Ocupação Armazém.")
-            
-            # Lê com MultiIndex (Header nas linhas 4 e 5)
-            Ocupacao_Armazem = pd.read_excel(excel_file, sheet_name=i, header=cfg["header"])
-            month = cfg["escrita_mes"] # String usada para identificar colunas de mês
-            
-            Posicao_Palet_SP_Alterado = Ocupacao_Armazem.copy().fillna(0)
-            
-            # --- Limpeza: Remove colunas onde a soma é 0 ---
-            colunas_para_remover = []
-            for col in Posicao_Palet_SP_Alterado.columns:
-                try:
-                    if pd.api.types.is_numeric_dtype(Posicao_Palet_SP_Alterado[col]):
-                        if Posicao_Palet_SP_Alterado[col].sum() == 0:
-                            colunas_para_remover.append(col)
-                except (TypeError, ValueError):
-                    pass
-            Posicao_Palet_SP_Alterado = Posicao_Palet_SP_Alterado.drop(columns=colunas_para_remover)
-
-            # --- Normalização dos Nomes de Clientes no Header ---
-            Clientes_2 = []
-            for column in Posicao_Palet_SP_Alterado.columns:
-                # Trata tuplas do MultiIndex ou strings simples
-                novo_nome = column[0].replace("  ", " ").strip() if isinstance(column, tuple) else column.replace("  ", " ").strip()
-                Clientes_2.append(novo_nome)
-            
-            # Separa o DataFrame em duas partes: Dados detalhados e Totais
-            Colunas = Posicao_Palet_SP_Alterado.columns
-            Registros_Totais = pd.DataFrame()
-            Posicao_Pallet = pd.DataFrame()
-
-            for outro in Colunas:
-                df_subset = Posicao_Palet_SP_Alterado[outro[0]]
-                # Lógica para decidir se coluna vai para 'Registros_Totais' ou 'Posicao_Pallet'
-                if isinstance(df_subset, pd.DataFrame):
-                    if len(df_subset.columns.values) > 1:
-                        Registros_Totais[outro] = Posicao_Palet_SP_Alterado[outro]
-                    else:
-                        Posicao_Pallet[outro] = Posicao_Palet_SP_Alterado[outro]
-                else:
-                    Posicao_Pallet[outro] = Posicao_Palet_SP_Alterado[outro]
-
-            # --- Processamento da parte 'Posicao_Pallet' (Unpivot/Stack) ---
-            if not Posicao_Pallet.empty:
-                renomear = []
-                for column in Posicao_Pallet.columns.values:
-                    if isinstance(column, tuple):
-                        name1, name2 = column
-                        renomear.append(name2 if name2 == "Mês" else name1)
-                    else:
-                        renomear.append(column) 
-                Posicao_Pallet.columns = renomear
-
-                # Transforma Colunas em Linhas (Melt/Stack)
-                Posicao_Pallet = (Posicao_Pallet.set_index(["Mês"])
-                                        .stack()
-                                        .reset_index(name='Ocupação')
-                                        .rename(columns={'level_1':'Cliente'}))
-                Posicao_Pallet["Filial"] = i
-
-            # --- Processamento da parte 'Registros_Totais' ---
-            if not Registros_Totais.empty:
-                # Normaliza headers para conseguir filtrar 'TOTAL'
-                Registros_Totais.columns = Registros_Totais.columns.map(lambda x: str(x).upper())
-                
-                # Separa o que NÃO é TOTAL (Clientes Sem Total)
-                Clientes_Sem_Total = Registros_Totais.loc[:, ~Registros_Totais.columns.str.contains("TOTAL", case=False, na=False)]
-                if not Clientes_Sem_Total.empty:
-                    # Agrupa duplicatas
-                    Clientes_Sem_Total = Clientes_Sem_Total.T.groupby(level=0).sum().T
-                
-                # Separa o que É TOTAL
-                Registros_Totais = Registros_Totais.loc[:, Registros_Totais.columns.str.contains("TOTAL", case=False, na=False)]
-                # Limpa caracteres indesejados dos nomes
-                Registros_Totais.columns = [str(col).replace("(", "").replace(")", "").replace("'", "") for col in Registros_Totais.columns]
-                Registros_Totais.columns = [tuple(col.split(',')) for col in Registros_Totais.columns]
-                
-                renomear = [str(col[0]).strip() for col in Registros_Totais.columns]
-                Registros_Totais.columns = renomear
-
-                # Reintegra Clientes Sem Total se houver
-                if not Clientes_Sem_Total.empty:
-                    for col_total in Registros_Totais.columns.values:
-                        Clientes_Sem_Total = Clientes_Sem_Total.loc[:, ~Clientes_Sem_Total.columns.str.contains(col_total, case=False, na=False)]
-                    
-                    # ... (Mais limpeza de string) ...
-                    Clientes_Sem_Total.columns = [str(col).replace("(", "").replace(")", "").replace("'", "") for col in Clientes_Sem_Total.columns]
-                    Clientes_Sem_Total.columns = [tuple(col.split(',')) for col in Clientes_Sem_Total.columns]
-                    renomear = [str(col[0]).strip() for col in Clientes_Sem_Total.columns]
-                    Clientes_Sem_Total.columns = renomear
-                    
-                    Clientes_Sem_Total = Clientes_Sem_Total.T.groupby(level=0).sum().T
-                    Registros_Totais = pd.concat([Registros_Totais, Clientes_Sem_Total], axis=1)
-
-                # Tenta recuperar a coluna 'Mês' do outro dataframe se faltar aqui
-                if not Posicao_Pallet.empty and "Mês" in Posicao_Pallet.columns:
-                     Registros_Totais["Mês"] = list(Posicao_Pallet["Mês"].unique())
-                else:
-                     # Fallback
-                     col_mes_fallback = [col for col in Posicao_Palet_SP_Alterado.columns if 'Mês' in str(col[0]) or 'Mês' in str(col[1])]
-                     if col_mes_fallback:
-                         Registros_Totais["Mês"] = Posicao_Palet_SP_Alterado[col_mes_fallback[0]].values
-                     else:
-                         raise ValueError("Não foi possível encontrar a coluna 'Mês' para o pivot.")
-
-                # Unpivot/Stack dos Totais
-                Registros_Totais = (Registros_Totais.set_index(["Mês"])
-                                        .stack()
-                                        .reset_index(name='Ocupação')
-                                        .rename(columns={'level_1':'Cliente'}))
-                Registros_Totais["Filial"] = i
-
-            # Concatena as duas partes processadas (Normal + Totais)
-            if not Posicao_Pallet.empty and not Registros_Totais.empty:
-                Posicao_Palet_SP_Alterado = pd.concat([Posicao_Pallet, Registros_Totais])
-            elif Posicao_Pallet.empty and not Registros_Totais.empty:
-                Posicao_Palet_SP_Alterado = Registros_Totais.copy()
-            elif not Posicao_Pallet.empty and Registros_Totais.empty:
-                Posicao_Palet_SP_Alterado = Posicao_Pallet.copy()
-            else:
-                Posicao_Palet_SP_Alterado = pd.DataFrame(columns=["Mês", "Cliente", "Ocupação", "Filial"])
-
-            # Limpeza Final dos Dados Empilhados
-            Posicao_Palet_SP_Alterado.dropna(subset="Mês", inplace=True)
-            Posicao_Palet_SP_Alterado["Cliente"] = Posicao_Palet_SP_Alterado["Cliente"].str.strip()
-            # Regex para limpar espaços múltiplos
-            Posicao_Palet_SP_Alterado["Cliente"] = [re.sub(r"\s+", " ", str(cliente)).strip() for cliente in Posicao_Palet_SP_Alterado["Cliente"]]
-            
-            # Remove linhas de lixo (índices do Pandas 'level')
-            filtro = ~Posicao_Palet_SP_Alterado["Cliente"].str.contains("level", case=False, na=False, regex=True)
-            Consolidar_SP = Posicao_Palet_SP_Alterado.loc[(Posicao_Palet_SP_Alterado["Mês"] != 0) & filtro].copy()
-            
-            # Extração de Data
-            Consolidar_SP["Mês"] = pd.to_datetime(Consolidar_SP["Mês"], format="mixed", errors="coerce")
-            Consolidar_SP["Ano"] = Consolidar_SP["Mês"].dt.year
-            Consolidar_SP["Mês"] = Consolidar_SP["Mês"].dt.month
-            
-            # Adiciona ao acumulador geral
-            df_final_ocupacao = pd.concat([df_final_ocupacao, Consolidar_SP], ignore_index=True)
-                
-        df = df_final_ocupacao.copy()
-        
         # Padronização de Colunas Finais
         df, cols = self._validar_e_renomear_colunas(df, cfg["columns"], "Ocupacao_Armazem (processado)")
         df = df[cols]
 
         # De-Para (Cliente/Filial -> Grupo)
-        tamanho_antes = len(df)
-        df = df.merge(
-            self.mapeamentos["De_Para_Grupos_Ocupacao"],
-            how="left", left_on=["Cliente", "Filial"], right_on=["cliente", "filial"]
-        )
-        if len(df) != tamanho_antes:
-            self.alertas_tamanho.append(f"De_Para_Grupos_Ocupacao (em Ocupação): alterou tamanho.")
+        df = self._enriquecer(df, "De_Para_Grupos_Ocupacao", ["cliente", "filial"], ["Cliente", "Filial"], ["area", "grupo", "item"], "Ocupação")
         if df["grupo"].isna().any():
-            self.nas_de_para_rateio.append(df[df["grupo"].isna()])
-            print(f"AVISO: {df['grupo'].isna().sum()} linhas em Ocupação não encontraram 'Grupo' no De-Para.")
+            linhas = self.diagnostico.registrar("Ocupação: Grupo", df, df["grupo"].isna(), ["Cliente", "Filial"])
+            print(f"AVISO: {linhas} linhas em Ocupação não encontraram 'Grupo' no De-Para.")
 
         # Formatação Final
         df["Tabela"] = "Ocupação Armazenagem"
@@ -509,8 +355,6 @@ class ServicoRelatoriosRateio:
     def get_erros_de_para(self):
         """
         Retorna um DataFrame consolidado de todos os erros de De-Para encontrados
-        durante o processamento dos 5 arquivos.
+        durante o processamento dos 5 arquivos (amostra por chave, com o total de linhas de cada chave).
         """
-        if not self.nas_de_para_rateio:
-            return pd.DataFrame()
-        return pd.concat(self.nas_de_para_rateio, ignore_index=True).drop_duplicates()
\ No newline at end of file
+        return self.diagnostico.relatorio()
\ No newline at end of file
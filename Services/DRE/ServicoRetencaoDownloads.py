@@ -0,0 +1,366 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import shutil
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+
+class ServicoRetencaoDownloads:
+    """
+    Ciclo de vida dos arquivos gerados na pasta de Downloads.
+
+    Cada item da pasta (um .xlsx/.zip, ou uma pasta com um arquivo por relatório) é um artefato.
+    Uma varredura periódica (thread em segundo plano) remove:
+      1. os artefatos criados há mais de 'max_idade' segundos;
+      2. se o total ainda passar de 'max_bytes', os acessados há mais tempo (LRU).
+    Nunca são removidos artefatos com download em andamento nem os criados há menos de
+    'idade_minima' segundos (job ainda gravando, ou o usuário ainda não clicou no link).
+
+    Data de criação = mtime; último acesso = atime, atualizado explicitamente a cada download
+    (não depende da montagem do disco registrar atime).
+
+    O estado é compartilhado entre os processos do servidor pela própria pasta:
+      - <artefato>.<id>.uso: um por download em andamento (em qualquer worker);
+      - .varredura.trava: trava entre processos; só o worker que a detém faz a varredura;
+      - .removidos.json: artefatos removidos recentemente (mensagem de link expirado em qualquer worker).
+    """
+
+    MARCADOR_USO = ".uso"
+    TRAVA = ".varredura.trava"
+    REMOVIDOS = ".removidos.json"
+
+    def __init__(self, diretorio, max_idade=72 * 3600, max_bytes=10 * 1024 ** 3, idade_minima=600, intervalo=600,
+                 validade_uso=6 * 3600):
+        """
+        :param diretorio: Pasta de Downloads.
+        :param max_idade: Idade máxima (segundos) de um artefato. None = sem limite de idade.
+        :param max_bytes: Tamanho máximo da pasta. None = sem limite de tamanho.
+        :param idade_minima: Artefatos mais novos que isso (segundos) nunca são removidos.
+        :param intervalo: Segundos entre varreduras da thread em segundo plano (None = sem thread).
+        :param validade_uso: Marcadores de download mais velhos que isso (segundos) são considerados
+                             abandonados (worker morto no meio do envio) e removidos.
+        """
+        self.diretorio = diretorio
+        self.max_idade = max_idade
+        self.max_bytes = max_bytes
+        self.idade_minima = idade_minima
+        self.intervalo = intervalo
+        self.validade_uso = validade_uso
+
+        self._lock = threading.Lock()
+        self._removidos = OrderedDict() # artefato -> {"removido_em", "motivo"} (últimos 1000, para mensagens de link expirado)
+        self._parar = threading.Event()
+        self._thread = None
+        self._dono_varredura = False
+
+        # Métricas
+        self.varreduras = 0
+        self.removidos_idade = 0
+        self.removidos_espaco = 0
+        self.ultima_varredura = None
+
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Thread de varredura
+    # ------------------------------------------------------------------
+
+    def iniciar(self):
+        """
+        Inicia a thread de varredura deste processo (uma vez por instância; chamadas seguintes não fazem nada).
+        Em cada ciclo, a thread só varre se este processo detiver a trava de varredura: com vários
+        workers, um único varre e os demais assumem se ele parar (trava sem renovação por 3 intervalos).
+        """
+        with self._lock:
+            if self.intervalo is None or self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="retencao_downloads", daemon=True)
+        atexit.register(self.parar)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._liberar_varredura()
+
+    def _loop(self):
+        while not self._parar.is_set():
+            try:
+                if self._assumir_varredura():
+                    self.varrer()
+            except Exception as e:
+                print(f"ERRO na varredura de Downloads: {e}")
+            self._parar.wait(self.intervalo)
+
+    # ------------------------------------------------------------------
+    # Trava entre processos
+    # ------------------------------------------------------------------
+
+    def _assumir_varredura(self):
+        """
+        Tenta obter (ou renova) a trava de varredura.
+        :return: True se este processo é o responsável pela varredura.
+        """
+        caminho = os.path.join(self.diretorio, self.TRAVA)
+        if self._dono_varredura:
+            try:
+                with open(caminho, encoding="ascii") as f:
+                    if f.read().strip() == str(os.getpid()):
+                        os.utime(caminho)
+                        return True
+            except FileNotFoundError:
+                pass
+            self._dono_varredura = False # Trava removida ou assumida por outro processo
+
+        try:
+            if time.time() - os.path.getmtime(caminho) > 3 * self.intervalo:
+                print("AVISO: Trava de varredura de Downloads abandonada; removendo.")
+                os.remove(caminho)
+        except FileNotFoundError:
+            pass
+        try:
+            descritor = os.open(caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        os.write(descritor, str(os.getpid()).encode("ascii"))
+        os.close(descritor)
+        self._dono_varredura = True
+        return True
+
+    def _liberar_varredura(self):
+        if not self._dono_varredura:
+            return
+        self._dono_varredura = False
+        try:
+            os.remove(os.path.join(self.diretorio, self.TRAVA))
+        except FileNotFoundError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Artefatos
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _artefato(caminho_relativo):
+        # "DRE_x/Consolidado_DRE.parquet" -> "DRE_x": a pasta inteira é um artefato
+        return caminho_relativo.replace("\\", "/").split("/", 1)[0]
+
+    def _tamanho(self, caminho):
+        if not os.path.isdir(caminho):
+            return os.path.getsize(caminho)
+        total = 0
+        for raiz, _, arquivos in os.walk(caminho):
+            for arquivo in arquivos:
+                try:
+                    total += os.path.getsize(os.path.join(raiz, arquivo))
+                except FileNotFoundError:
+                    pass
+        return total
+
+    def _em_uso(self, nomes):
+        """
+        Conta os marcadores de download de cada artefato; remove os abandonados.
+        :return: {artefato: nº de downloads em andamento}.
+        """
+        em_uso = {}
+        agora = time.time()
+        for nome in nomes:
+            if not nome.endswith(self.MARCADOR_USO):
+                continue
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                if agora - os.path.getmtime(caminho) > self.validade_uso:
+                    os.remove(caminho)
+                    continue
+            except FileNotFoundError:
+                continue
+            artefato = nome.rsplit(".", 2)[0] # "<artefato>.<id>.uso"
+            em_uso[artefato] = em_uso.get(artefato, 0) + 1
+        return em_uso
+
+    def _listar(self):
+        artefatos = []
+        agora = time.time()
+        nomes = os.listdir(self.diretorio)
+        em_uso = self._em_uso(nomes)
+        for nome in nomes:
+            caminho = os.path.join(self.diretorio, nome)
+            if nome.startswith(".") or nome.endswith(".tmp") or nome.endswith(self.MARCADOR_USO):
+                continue
+            try:
+                stat = os.stat(caminho)
+                tamanho = self._tamanho(caminho)
+            except FileNotFoundError:
+                continue
+            criado = stat.st_mtime
+            artefatos.append({
+                "nome": nome,
+                "pasta": os.path.isdir(caminho),
+                "bytes": tamanho,
+                "criado": criado,
+                "acessado": max(stat.st_atime, criado),
+                "idade": agora - criado,
+                "em_uso": em_uso.get(nome, 0) > 0,
+            })
+        return artefatos
+
+    def _protegido(self, artefato):
+        return artefato["em_uso"] or artefato["idade"] < self.idade_minima
+
+    def _remover(self, nome, motivo):
+        caminho = os.path.join(self.diretorio, nome)
+        try:
+            if os.path.isdir(caminho):
+                shutil.rmtree(caminho)
+            else:
+                os.remove(caminho)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            # Arquivo aberto por outro processo (Windows), sem permissão etc.: fica para a próxima varredura
+            print(f"AVISO: Não foi possível remover {nome} de Downloads ({e}).")
+            return False
+        with self._lock:
+            self._removidos[nome] = {"removido_em": datetime.now().isoformat(timespec="seconds"), "motivo": motivo}
+            while len(self._removidos) > 1000:
+                self._removidos.popitem(last=False)
+        print(f"  - Downloads: removido {nome} ({motivo})")
+        return True
+
+    def _ler_removidos(self):
+        try:
+            with open(os.path.join(self.diretorio, self.REMOVIDOS), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _publicar_removidos(self):
+        # Mantém o que um responsável anterior pela varredura publicou. Troca atômica (os.replace):
+        # os demais workers leem a lista anterior inteira ou a nova inteira.
+        destino = os.path.join(self.diretorio, self.REMOVIDOS)
+        temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+        removidos = self._ler_removidos()
+        with self._lock:
+            removidos.update(self._removidos)
+        removidos = dict(list(removidos.items())[-1000:])
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(removidos, f, ensure_ascii=False)
+        os.replace(temporario, destino)
+
+    def varrer(self):
+        """
+        Aplica a idade máxima e o limite de tamanho.
+        :return: {"removidos_idade", "removidos_espaco", "bytes_liberados", "bytes_restantes"}.
+        """
+        artefatos = self._listar()
+        removidos_idade, removidos_espaco, liberados = 0, 0, 0
+
+        # 1. Idade máxima
+        restantes = []
+        for artefato in artefatos:
+            if self.max_idade is not None and artefato["idade"] > self.max_idade and not self._protegido(artefato):
+                if self._remover(artefato["nome"], "expirado"):
+                    removidos_idade += 1
+                    liberados += artefato["bytes"]
+                continue
+            restantes.append(artefato)
+
+        # 2. Limite de tamanho: remove os acessados há mais tempo
+        total = sum(artefato["bytes"] for artefato in restantes)
+        if self.max_bytes is not None and total > self.max_bytes:
+            for artefato in sorted(restantes, key=lambda a: a["acessado"]):
+                if total <= self.max_bytes:
+                    break
+                if self._protegido(artefato):
+                    continue
+                if self._remover(artefato["nome"], "limite de espaço"):
+                    removidos_espaco += 1
+                    liberados += artefato["bytes"]
+                    total -= artefato["bytes"]
+
+        if removidos_idade or removidos_espaco:
+            self._publicar_removidos()
+        with self._lock:
+            self.varreduras += 1
+            self.removidos_idade += removidos_idade
+            self.removidos_espaco += removidos_espaco
+            self.ultima_varredura = datetime.now().isoformat(timespec="seconds")
+        return {"removidos_idade": removidos_idade, "removidos_espaco": removidos_espaco,
+                "bytes_liberados": liberados, "bytes_restantes": total}
+
+    # ------------------------------------------------------------------
+    # Integração com a rota de download
+    # ------------------------------------------------------------------
+
+    def verificar(self, caminho_relativo):
+        """
+        Verifica se o arquivo pode ser baixado.
+        :return: None se o arquivo existe; caso contrário, a mensagem de erro para o usuário.
+        """
+        if os.path.isfile(os.path.join(self.diretorio, caminho_relativo)):
+            return None
+        removido = self._ler_removidos().get(self._artefato(caminho_relativo))
+        if removido:
+            return (f"O link expirou: o arquivo '{caminho_relativo}' foi removido em {removido['removido_em']} "
+                    f"({removido['motivo']}). Processe o relatório novamente.")
+        return f"Arquivo '{caminho_relativo}' não encontrado no servidor (pode ter expirado). Processe o relatório novamente."
+
+    def iniciar_download(self, caminho_relativo):
+        """
+        Marca o artefato como em uso (não será removido por nenhum processo) e registra o acesso (LRU).
+        :return: O marcador do download, a ser passado a finalizar_download() quando o envio terminar.
+        """
+        nome = self._artefato(caminho_relativo)
+        marcador = os.path.join(self.diretorio, f"{nome}.{os.getpid()}-{uuid.uuid4().hex[:8]}{self.MARCADOR_USO}")
+        open(marcador, "wb").close()
+        caminho = os.path.join(self.diretorio, nome)
+        try:
+            os.utime(caminho, (time.time(), os.stat(caminho).st_mtime)) # atime = agora; mtime (criação) mantido
+        except FileNotFoundError:
+            pass
+        return marcador
+
+    def finalizar_download(self, marcador):
+        try:
+            os.remove(marcador)
+        except FileNotFoundError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Inventário
+    # ------------------------------------------------------------------
+
+    def inventario(self):
+        """
+        Lista os artefatos (mais recentes primeiro) com tamanho, criação, último acesso e expiração.
+        """
+        artefatos = sorted(self._listar(), key=lambda a: a["criado"], reverse=True)
+        formatar = lambda instante: datetime.fromtimestamp(instante).isoformat(timespec="seconds")
+        itens = [{
+            "nome": artefato["nome"],
+            "pasta": artefato["pasta"],
+            "bytes": artefato["bytes"],
+            "criado_em": formatar(artefato["criado"]),
+            "ultimo_acesso": formatar(artefato["acessado"]),
+            "expira_em": formatar(artefato["criado"] + self.max_idade) if self.max_idade is not None else None,
+            "em_uso": artefato["em_uso"],
+        } for artefato in artefatos]
+        with self._lock:
+            resumo = {
+                "varreduras": self.varreduras,
+                "removidos_idade": self.removidos_idade,
+                "removidos_espaco": self.removidos_espaco,
+                "ultima_varredura": self.ultima_varredura,
+            }
+        return {
+            "diretorio": self.diretorio,
+            "artefatos": itens,
+            "total_artefatos": len(itens),
+            "total_bytes": sum(item["bytes"] for item in itens),
+            "max_bytes": self.max_bytes,
+            "max_idade_segundos": self.max_idade,
+            **resumo,
+        }
@@ -0,0 +1,137 @@
+"""
+Fila de jobs (Services/DRE/ServicoFilaJobs.py) no modo "inline": o job roda dentro de enfileirar().
+
+Uso (a partir da raiz do projeto):
+    python -m pytest Tests
+    python Tests/test_fila_jobs.py
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_PROJETO)
+
+from Services.DRE.ServicoFilaJobs import ServicoFilaJobs
+
+
+class TestFilaJobsInline(unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp(prefix="fila_jobs_")
+        self.fila = ServicoFilaJobs(self.diretorio, max_fila=2, modo="inline")
+
+    def tearDown(self):
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def test_progresso_e_resultado(self):
+        def processar(progresso, valor, fator=1):
+            progresso("Lendo", 10)
+            progresso("Calculando", 60)
+            return {"total": valor * fator}
+
+        job_id = self.fila.enfileirar(processar, 21, descricao="teste", fator=2)
+        job = self.fila.status(job_id)
+
+        self.assertEqual(job["estado"], ServicoFilaJobs.CONCLUIDO)
+        self.assertEqual(job["resultado"], {"total": 42})
+        self.assertEqual(job["percentual"], 100)
+        self.assertEqual(job["descricao"], "teste")
+        self.assertEqual([etapa["nome"] for etapa in job["etapas"]], ["Lendo", "Calculando"])
+        self.assertTrue(all(etapa["fim"] for etapa in job["etapas"]))
+        self.assertEqual(self.fila.pendentes(), 0)
+        self.assertEqual([j["id"] for j in self.fila.listar()], [job_id])
+
+    def test_progresso_gravado_durante_a_execucao(self):
+        estados = []
+
+        def processar(progresso):
+            progresso("Lendo", 10)
+            estados.append(self.fila.listar()[0])
+            return {}
+
+        self.fila.enfileirar(processar)
+        self.assertEqual(estados[0]["estado"], ServicoFilaJobs.EXECUTANDO)
+        self.assertEqual((estados[0]["etapa"], estados[0]["percentual"]), ("Lendo", 10))
+
+    def test_erro(self):
+        def processar(progresso):
+            raise ValueError("arquivo inválido")
+
+        job = self.fila.status(self.fila.enfileirar(processar))
+        self.assertEqual(job["estado"], ServicoFilaJobs.ERRO)
+        self.assertEqual(job["erro"], "arquivo inválido")
+        self.assertEqual(self.fila.pendentes(), 0)
+
+    def test_mesma_chave_reaproveita_o_job_pendente(self):
+        repetidos = []
+
+        def processar(progresso):
+            # Enquanto este job está pendente, o mesmo pedido aponta para ele
+            repetidos.append(self.fila.enfileirar(processar, chave="entradas"))
+            return {"ok": True}
+
+        job_id = self.fila.enfileirar(processar, chave="entradas")
+        self.assertEqual(repetidos, [job_id])
+        self.assertEqual(len(self.fila.listar()), 1)
+
+        # Depois de concluído, a mesma chave cria um job novo
+        novo = self.fila.enfileirar(lambda progresso: {}, chave="entradas")
+        self.assertNotEqual(novo, job_id)
+
+    def test_fila_cheia_recusa(self):
+        recusas = []
+
+        def interno(progresso):
+            try:
+                self.fila.enfileirar(lambda p: {}, chave="terceiro")
+            except RuntimeError as e:
+                recusas.append(str(e))
+            return {}
+
+        def externo(progresso):
+            self.fila.enfileirar(interno, chave="segundo")
+            return {}
+
+        self.fila.enfileirar(externo, chave="primeiro") # max_fila=2: o terceiro pendente é recusado
+        self.assertEqual(len(recusas), 1)
+        self.assertIn("Fila de processamento cheia", recusas[0])
+        self.assertEqual(len(self.fila.listar()), 2)
+        self.assertEqual(self.fila.pendentes(), 0)
+
+    def test_jobs_interrompidos_ao_reiniciar(self):
+        # PID de um processo que já terminou
+        morto = subprocess.Popen([sys.executable, "-c", "pass"])
+        morto.wait()
+
+        def gravar(job_id, estado, pid):
+            with open(os.path.join(self.diretorio, f"{job_id}.json"), "w", encoding="utf-8") as f:
+                json.dump({"id": job_id, "estado": estado, "pid": pid, "criado_em": "2025-01-01T00:00:00"}, f)
+
+        gravar("aaaa00000001", ServicoFilaJobs.EXECUTANDO, morto.pid)
+        gravar("aaaa00000002", ServicoFilaJobs.NA_FILA, morto.pid)
+        gravar("aaaa00000003", ServicoFilaJobs.EXECUTANDO, os.getpid()) # Outro worker ainda vivo
+        gravar("aaaa00000004", ServicoFilaJobs.CONCLUIDO, morto.pid)
+
+        fila = ServicoFilaJobs(self.diretorio, modo="inline")
+        estados = {job_id: fila.status(job_id)["estado"] for job_id in
+                   ("aaaa00000001", "aaaa00000002", "aaaa00000003", "aaaa00000004")}
+        self.assertEqual(estados, {
+            "aaaa00000001": ServicoFilaJobs.ERRO,
+            "aaaa00000002": ServicoFilaJobs.ERRO,
+            "aaaa00000003": ServicoFilaJobs.EXECUTANDO,
+            "aaaa00000004": ServicoFilaJobs.CONCLUIDO,
+        })
+        self.assertIn("interrompido", fila.status("aaaa00000001")["erro"])
+
+    def test_status_aceita_apenas_ids_gerados(self):
+        self.assertIsNone(self.fila.status("../Config"))
+        self.assertIsNone(self.fila.status(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Caminhos da sincronização incremental dos De-Paras (Db/SincronizacaoDePara.py) contra um SQLite temporário.
+
+Uso (a partir da raiz do projeto):
+    python -m pytest Tests
+    python Tests/test_sincronizacao_de_para.py
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import timedelta
+
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_PROJETO)
+
+from sqlalchemy import create_engine, text
+from Db.SincronizacaoDePara import SincronizadorDePara
+
+
+class TestSincronizacaoDePara(unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp(prefix="sync_de_para_")
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.diretorio, 'de_para.db')}")
+        self.executar(
+            "CREATE TABLE contas (id INTEGER PRIMARY KEY, grupo TEXT, updated_at TIMESTAMP)",
+            "INSERT INTO contas VALUES (1, 'A', '2025-01-01 10:00:00'), (2, 'B', '2025-01-02 10:00:00')",
+        )
+        # margem_versao=0: a marca d'água é o próprio máximo (relê só os empates)
+        self.sincronizador = SincronizadorDePara(lambda: self.engine, {"contas": '"contas"'}, recarga_completa_a_cada=0,
+                                                 max_workers=1, margem_versao=timedelta(0))
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def executar(self, *comandos):
+        with self.engine.begin() as conn:
+            for comando in comandos:
+                conn.execute(text(comando))
+
+    def carregar(self):
+        df = self.sincronizador.carregar()["contas"]
+        return df, self.sincronizador.ultima_sincronizacao["contas"]["modo"]
+
+    def registros(self, df):
+        return sorted((int(linha.id), linha.grupo) for linha in df.itertuples())
+
+    def test_primeira_carga_completa(self):
+        df, modo = self.carregar()
+        self.assertEqual(modo, "completa")
+        self.assertEqual(self.registros(df), [(1, "A"), (2, "B")])
+
+    def test_sem_alteracoes_mantem_o_mesmo_dataframe(self):
+        anterior, _ = self.carregar()
+        df, modo = self.carregar()
+        self.assertEqual(modo, "sem alterações")
+        self.assertIs(df, anterior)
+
+    def test_atualizacao_com_versao_empatada(self):
+        anterior, _ = self.carregar()
+        # Mesma data do máximo lido: só é vista porque a marca d'água relê os empates (>=)
+        self.executar("UPDATE contas SET grupo = 'A2', updated_at = '2025-01-02 10:00:00' WHERE id = 1")
+        df, modo = self.carregar()
+        self.assertEqual(modo, "incremental")
+        self.assertIsNot(df, anterior)
+        self.assertEqual(self.registros(df), [(1, "A2"), (2, "B")])
+        self.assertEqual(self.registros(anterior), [(1, "A"), (2, "B")]) # DataFrame publicado não é alterado
+
+    def test_insercao(self):
+        self.carregar()
+        self.executar("INSERT INTO contas VALUES (3, 'C', '2025-01-03 10:00:00')")
+        df, modo = self.carregar()
+        self.assertEqual(modo, "incremental")
+        self.assertEqual(self.registros(df), [(1, "A"), (2, "B"), (3, "C")])
+
+    def test_exclusao(self):
+        self.carregar()
+        # Linha fora do máximo de updated_at (excluir a mais recente faz a versão "regredir": recarga completa)
+        self.executar("DELETE FROM contas WHERE id = 1")
+        df, modo = self.carregar()
+        self.assertEqual(modo, "incremental")
+        self.assertEqual(self.registros(df), [(2, "B")])
+
+    def test_insercao_e_exclusao_juntas(self):
+        self.carregar()
+        # A contagem fecha (2 linhas), mas a chave 2 sumiu: só as chaves do banco revelam a exclusão
+        self.executar("INSERT INTO contas VALUES (3, 'C', '2025-01-03 10:00:00')", "DELETE FROM contas WHERE id = 2")
+        df, modo = self.carregar()
+        self.assertEqual(modo, "incremental")
+        self.assertEqual(self.registros(df), [(1, "A"), (3, "C")])
+
+    def test_versao_regrediu_recarrega_tudo(self):
+        self.carregar()
+        self.executar("UPDATE contas SET grupo = 'X', updated_at = '2024-01-01 10:00:00'")
+        df, modo = self.carregar()
+        self.assertEqual(modo, "completa")
+        self.assertEqual(self.registros(df), [(1, "X"), (2, "X")])
+
+    def test_exclusao_da_linha_mais_recente_recarrega_tudo(self):
+        self.carregar()
+        self.executar("DELETE FROM contas WHERE id = 2")
+        df, modo = self.carregar()
+        self.assertEqual(modo, "completa")
+        self.assertEqual(self.registros(df), [(1, "A")])
+
+    def test_contagem_divergente_recarrega_tudo(self):
+        self.carregar()
+        self.executar("INSERT INTO contas VALUES (3, 'C', '2025-01-03 10:00:00')")
+        # Simula uma aplicação que não fecha com a contagem do banco (ex: alteração concorrente)
+        aplicar = self.sincronizador._aplicar_alteracoes
+        self.sincronizador._aplicar_alteracoes = lambda *args: aplicar(*args).iloc[:-1]
+        df, modo = self.carregar()
+        self.assertEqual(modo, "completa")
+        self.assertEqual(self.registros(df), [(1, "A"), (2, "B"), (3, "C")])
+
+    def test_tabela_sem_chave_primaria_sempre_completa(self):
+        self.executar("CREATE TABLE livre (grupo TEXT)", "INSERT INTO livre VALUES ('A')")
+        sincronizador = SincronizadorDePara(lambda: self.engine, {"livre": '"livre"'}, recarga_completa_a_cada=0, max_workers=1)
+        for _ in range(2):
+            df = sincronizador.carregar()["livre"]
+            self.assertEqual(sincronizador.ultima_sincronizacao["livre"]["modo"], "completa")
+        self.assertEqual(df["grupo"].tolist(), ["A"])
+
+    def test_recarga_completa_periodica_e_esquecer(self):
+        sincronizador = SincronizadorDePara(lambda: self.engine, {"contas": '"contas"'}, recarga_completa_a_cada=3, max_workers=1)
+        modos = []
+        for _ in range(3):
+            sincronizador.carregar()
+            modos.append(sincronizador.ultima_sincronizacao["contas"]["modo"])
+        self.assertEqual(modos, ["completa", "sem alterações", "completa"])
+        sincronizador.esquecer("contas")
+        sincronizador.carregar()
+        self.assertEqual(sincronizador.ultima_sincronizacao["contas"]["modo"], "completa")
+
+
+if __name__ == "__main__":
+    unittest.main()